@@ -31,8 +31,11 @@ setup(
     python_requires=">=3.8",
     install_requires=[
         "PyQt6>=6.4.0",
-        "pymodbus>=3.0.0",
+        # Internos do pymodbus 3.6 sobrescritos em modbus_handler e fast_rtu (ver requirements.txt)
+        "pymodbus>=3.6,<3.7",
         "pyserial>=3.5",
+        # Geradores de sinal no processo servidor (signal_engine), como no requirements.txt
+        "numpy>=1.17.0",
     ],
     entry_points={
         "console_scripts": [
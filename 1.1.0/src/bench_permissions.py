@@ -0,0 +1,97 @@
+"""Microbenchmark da validação de requisições: FunctionCodeTable, PermissionTable e BoundsTable
+
+Uso: python bench_permissions.py [repetições]
+
+Mede µs por requisição das verificações que o EmulatorRequestHandler faz
+antes do datastore, no pior caso de um mapa grande:
+  - FC03 de 125 registradores (FunctionCodeTable com bitmap de FCs negados);
+  - FC16 de 123 registradores (FCs + permissões + limites Intervalo);
+  - DeviceRules.check() completo para as duas.
+O mapa tem 2000 HR com a coluna FCs preenchida (os 100 últimos só com FC06)
+e limites em todos, então nenhuma verificação passa pelo atalho "tabela sem
+restrição".
+Antes de medir confere os códigos de exceção esperados.
+"""
+import sys
+import time
+
+from pymodbus.pdu import ModbusExceptions
+from pymodbus.register_read_message import ReadHoldingRegistersRequest
+from pymodbus.register_write_message import WriteMultipleRegistersRequest
+
+from permissions import DeviceRules, request_span
+from segmented_store import SegmentLayout
+
+REGISTERS = 2000
+
+
+def sample_rules():
+    """DeviceRules de um mapa com 2000 HR (os 100 últimos somente leitura e só com FC06)"""
+    addresses = range(1, REGISTERS + 1)
+    layouts = {name: SegmentLayout.from_addresses([1]) for name in ('coils', 'di', 'ir')}
+    layouts['hr'] = SegmentLayout.from_addresses(addresses)
+    last = REGISTERS - 100
+    perms = {'hr': {addr: 'R/W' if addr <= last else 'R' for addr in addresses}}
+    fcs = {'hr': {addr: '3/6/16' if addr <= last else '6' for addr in addresses}}
+    bounds = {addr: (0, 30000) for addr in addresses}
+    return DeviceRules.compile(layouts, perms, fcs, bounds)
+
+
+def sample_requests():
+    read = ReadHoldingRegistersRequest(0, 125, slave=1)
+    write = WriteMultipleRegistersRequest(200, list(range(123)), slave=1)
+    return read, write
+
+
+def verify(rules, read, write):
+    """Requisições do benchmark passam; as mesmas faixas no trecho restrito são recusadas"""
+    assert rules.check(read) is None
+    assert rules.check(write) is None
+    denied = WriteMultipleRegistersRequest(REGISTERS - 50, [0] * 10, slave=1)
+    assert rules.allowed_fcs.check(denied) == ModbusExceptions.IllegalFunction
+    address, count = request_span(denied)
+    assert rules.permissions['hr'].check_write(address, count) == ModbusExceptions.IllegalAddress
+    address, _ = request_span(write)
+    assert rules.bounds['hr'].check_values(address, [30001] * 123) == ModbusExceptions.IllegalValue
+
+
+def measure(func, loops, repeat):
+    """Melhor de `repeat` execuções de `loops` chamadas -> µs/chamada"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(loops):
+            func()
+        best = min(best, time.perf_counter() - start)
+    return best / loops * 1e6
+
+
+def main(repeat=5):
+    rules = sample_rules()
+    read, write = sample_requests()
+    verify(rules, read, write)
+
+    fc_table = rules.allowed_fcs
+    permissions = rules.permissions['hr']
+    bounds = rules.bounds['hr']
+    write_address, write_count = request_span(write)
+
+    cases = [
+        ("FC03 x125 FCs", lambda: fc_table.check(read)),
+        ("FC03 x125 check()", lambda: rules.check(read)),
+        ("FC16 x123 FCs", lambda: fc_table.check(write)),
+        ("FC16 x123 permissões", lambda: permissions.check_write(write_address, write_count)),
+        ("FC16 x123 limites", lambda: bounds.check_values(write_address, write.values)),
+        ("FC16 x123 check()", lambda: rules.check(write)),
+    ]
+
+    loops = 20000
+    print(f"📊 Validação de requisições - melhor de {repeat} x {loops} chamadas | {REGISTERS} HR no mapa")
+    print(f"{'caso':<24} {'µs/req':>8} {'req/s':>12}")
+    for name, func in cases:
+        us = measure(func, loops, repeat)
+        print(f"{name:<24} {us:>8.2f} {1e6 / us:>12,.0f}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5)
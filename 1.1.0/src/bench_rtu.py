@@ -0,0 +1,123 @@
+"""Microbenchmark do framing RTU: FastRtuFramer x ModbusRtuFramer (pymodbus)
+
+Uso: python bench_rtu.py [repetições]
+
+Mede, para cada framer, quadros/s e µs por quadro em:
+  - decode de requisições típicas (FC01/03/06/16), um quadro por leitura;
+  - decode de um fluxo com vários quadros colados numa leitura só;
+  - decode de quadros chegando em pedaços (como a serial entrega);
+  - montagem de respostas (buildPacket) de FC03 com 125 registradores.
+Antes de medir confere que os dois framers produzem as mesmas requisições
+e os mesmos bytes de resposta.
+"""
+import sys
+import time
+
+from pymodbus.bit_read_message import ReadCoilsRequest
+from pymodbus.factory import ServerDecoder
+from pymodbus.register_read_message import ReadHoldingRegistersRequest, ReadHoldingRegistersResponse
+from pymodbus.register_write_message import WriteMultipleRegistersRequest, WriteSingleRegisterRequest
+from pymodbus.transaction import ModbusRtuFramer
+
+from fast_rtu import FastRtuFramer, crc16
+
+SLAVES = [1]
+
+
+def sample_requests():
+    """Quadros RTU de requisições típicas de um mestre"""
+    builder = ModbusRtuFramer(ServerDecoder())
+    requests = [
+        ReadHoldingRegistersRequest(0, 10, slave=1),
+        ReadHoldingRegistersRequest(100, 125, slave=1),
+        ReadCoilsRequest(0, 64, slave=1),
+        WriteSingleRegisterRequest(5, 1234, slave=1),
+        WriteMultipleRegistersRequest(200, list(range(123)), slave=1),
+    ]
+    return [builder.buildPacket(request) for request in requests]
+
+
+def sample_responses():
+    return [ReadHoldingRegistersResponse(list(range(125)), slave=1) for _ in range(4)]
+
+
+def decode_all(framer_class, frames, chunk=None):
+    """Decodifica `frames` (lista de leituras) e devolve as requisições"""
+    framer = framer_class(ServerDecoder())
+    results = []
+    for data in frames:
+        if chunk:
+            for i in range(0, len(data), chunk):
+                framer.processIncomingPacket(data[i:i + chunk], results.append, SLAVES)
+        else:
+            framer.processIncomingPacket(data, results.append, SLAVES)
+    return results
+
+
+def signature(request):
+    return (request.slave_id, request.function_code, request.address,
+            getattr(request, 'count', None), getattr(request, 'value', None),
+            tuple(getattr(request, 'values', None) or ()))
+
+
+def verify(frames):
+    """Os dois framers precisam concordar antes de comparar tempos"""
+    stream = [b''.join(frames) * 4]
+    for reads, chunk in ((frames, None), (stream, None), (frames, 7)):
+        stock = [signature(r) for r in decode_all(ModbusRtuFramer, reads, chunk)]
+        fast = [signature(r) for r in decode_all(FastRtuFramer, reads, chunk)]
+        assert stock == fast, "framers divergiram no decode"
+    # Lixo + quadro com CRC errado + quadro bom: só o bom é aceito
+    bad = bytearray(frames[0])
+    bad[-1] ^= 0xFF
+    noisy = [b'\xff\x00' + bytes(bad) + frames[0]]
+    assert [signature(r) for r in decode_all(FastRtuFramer, noisy)] == \
+           [signature(r) for r in decode_all(ModbusRtuFramer, noisy)]
+    for response in sample_responses()[:1]:
+        assert FastRtuFramer(ServerDecoder()).buildPacket(response) == \
+               ModbusRtuFramer(ServerDecoder()).buildPacket(response), "framers divergiram no buildPacket"
+    data = frames[-1][:-2]
+    assert crc16(data).to_bytes(2, 'little') == frames[-1][-2:]
+
+
+def measure(func, count, repeat):
+    """Melhor de `repeat` execuções -> (quadros/s, µs/quadro)"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return count / best, best / count * 1e6
+
+
+def main(repeat=5):
+    frames = sample_requests()
+    verify(frames)
+
+    loops = 400
+    single = frames * loops
+    stream = [b''.join(frames) * 50] * (loops // 50)
+    responses = sample_responses() * (loops // 4)
+
+    def build(framer_class):
+        framer = framer_class(ServerDecoder())
+        return lambda: [framer.buildPacket(response) for response in responses]
+
+    cases = [
+        ("decode 1 quadro/leitura", len(single), lambda cls: lambda: decode_all(cls, single)),
+        ("decode fluxo colado", len(frames) * loops, lambda cls: lambda: decode_all(cls, stream)),
+        ("decode em pedaços de 8 B", len(single), lambda cls: lambda: decode_all(cls, single, 8)),
+        ("buildPacket FC03 x125", len(responses), build),
+    ]
+
+    print(f"📊 Framing RTU - melhor de {repeat} | pymodbus x fast")
+    print(f"{'caso':<26} {'pymodbus q/s':>13} {'µs/q':>8} {'fast q/s':>11} {'µs/q':>8} {'ganho':>7}")
+    for name, count, factory in cases:
+        stock_rate, stock_us = measure(factory(ModbusRtuFramer), count, repeat)
+        fast_rate, fast_us = measure(factory(FastRtuFramer), count, repeat)
+        print(f"{name:<26} {stock_rate:>13,.0f} {stock_us:>8.2f} {fast_rate:>11,.0f} {fast_us:>8.2f} "
+              f"{stock_us / fast_us:>6.1f}x")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5)
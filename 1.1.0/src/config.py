@@ -15,7 +15,25 @@ class Config:
             "bytesize": 8,
             "parity": "None",
             "stopbits": 1,
-            "slave_id": 1
+            "slave_id": 1,
+            "guard_band": 16,
+            "word_order": "big",
+            "byte_order": "big",
+            "transport": "rtu",
+            "tcp_host": "127.0.0.1",
+            "tcp_port": 5020,
+            "devices": [],
+            "pty_pacing": True,
+            "rtu_framer": "fast",
+            "turnaround_mode": "min",
+            "turnaround_ms": 0.0,
+            "turnaround_jitter_ms": 0.0,
+            "turnaround_spin_ms": 0.0,
+            "metrics_host": "127.0.0.1",
+            "metrics_port": 0,
+            "warm_standby": True,
+            "reject_unmapped_writes": True,
+            "signal_rate_hz": 10
         }
         self.settings = self.load()
     
@@ -0,0 +1,175 @@
+"""Contadores de requisições em shared memory - por function code e por endereço de cada tabela
+
+O processo servidor incrementa no caminho da requisição; GUI e dump leem.
+"""
+import csv
+import json
+import time
+from itertools import accumulate
+from multiprocessing import shared_memory
+
+TABLES = ('coils', 'di', 'ir', 'hr')
+
+MAGIC = 0x434E5431  # 'CNT1'
+_DEVICE_FIELDS = 1 + len(TABLES)  # slave_id + tamanho de cada tabela
+
+
+class RequestCounters:
+    """Requisições/respostas/exceções por FC + acessos por posição de cada tabela de cada slave ID
+
+    Os acessos por endereço são guardados como array de diferenças ('q', tamanho
+    + 1) sobre o buffer compacto do SegmentLayout: uma leitura de 125
+    registradores custa dois incrementos (`hits[pos] += 1`, `hits[pos + n] -= 1`)
+    em vez de 125. `access_counts()` faz a soma acumulada na leitura.
+
+    O bloco guarda os slave IDs e tamanhos no cabeçalho, então quem conecta
+    pelo nome (processo servidor, ferramenta de análise) reconstrói o layout.
+    """
+
+    def __init__(self, sizes=None, name=None):
+        if name is None:
+            # sizes: {slave_id: {tabela: posições}}
+            devices = [(sid, [sizes[sid].get(table, 0) for table in TABLES]) for sid in sorted(sizes)]
+            header_words = 2 + _DEVICE_FIELDS * len(devices)
+            nbytes = self._nbytes(header_words, devices)
+            self.shm = shared_memory.SharedMemory(create=True, size=nbytes)
+            self.owner = True
+            self.shm.buf[:nbytes] = bytes(nbytes)
+            header = self.shm.buf[:header_words * 8].cast('Q')
+            header[0] = MAGIC
+            header[1] = len(devices)
+            for i, (sid, table_sizes) in enumerate(devices):
+                header[2 + i * _DEVICE_FIELDS] = sid
+                for j, size in enumerate(table_sizes):
+                    header[3 + i * _DEVICE_FIELDS + j] = size
+            header.release()
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+            self.owner = False
+
+        head = self.shm.buf[:16].cast('Q')
+        if head[0] != MAGIC:
+            head.release()
+            raise ValueError(f"{self.shm.name} não é um bloco de contadores do emulador")
+        count = head[1]
+        head.release()
+        header_words = 2 + _DEVICE_FIELDS * count
+        header = self.shm.buf[:header_words * 8].cast('Q')
+        devices = []
+        for i in range(count):
+            base = 2 + i * _DEVICE_FIELDS
+            devices.append((header[base], list(header[base + 1:base + _DEVICE_FIELDS])))
+        header.release()
+        self.sizes = {sid: dict(zip(TABLES, table_sizes)) for sid, table_sizes in devices}
+
+        offset = header_words * 8
+        fc_block = self.shm.buf[offset:offset + 3 * 256 * 8].cast('Q')
+        self.requests = fc_block[:256]
+        self.responses = fc_block[256:512]
+        self.exceptions = fc_block[512:]
+        self._views = [self.requests, self.responses, self.exceptions, fc_block]
+        offset += 3 * 256 * 8
+        self.data_offset = header_words * 8
+        self.nbytes = self._nbytes(header_words, devices)
+
+        self.hits = {}
+        for sid, table_sizes in devices:
+            for table, size in zip(TABLES, table_sizes):
+                view = self.shm.buf[offset:offset + (size + 1) * 8].cast('q')
+                self.hits[sid, table] = view
+                self._views.append(view)
+                offset += (size + 1) * 8
+
+    @staticmethod
+    def _nbytes(header_words, devices):
+        return 8 * (header_words + 3 * 256 + sum(size + 1 for _, sizes in devices for size in sizes))
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def __reduce__(self):
+        return (self.__class__, (None, self.shm.name))
+
+    def table(self, slave_id, table):
+        """Array de diferenças de acessos da tabela (para o SharedDataBlock incrementar)"""
+        return self.hits.get((slave_id, table))
+
+    def access_counts(self, slave_id, table):
+        """Acessos acumulados por posição do buffer compacto da tabela"""
+        hits = self.hits.get((slave_id, table))
+        if hits is None:
+            return []
+        return list(accumulate(hits[:len(hits) - 1].tolist()))
+
+    def fc_counts(self):
+        """{fc: {'requests', 'responses', 'exceptions'}} dos FCs que apareceram"""
+        requests, responses, exceptions = self.requests.tolist(), self.responses.tolist(), self.exceptions.tolist()
+        return {fc: {'requests': requests[fc], 'responses': responses[fc], 'exceptions': exceptions[fc]}
+                for fc in range(256) if requests[fc] or responses[fc]}
+
+    def copy_from(self, other, tables=()):
+        """Copia os contadores por FC de `other` e os acessos das (slave_id, tabela) em `tables`
+
+        Para quando o bloco é recriado com outros tamanhos (recarga do mapa): só
+        vale copiar os acessos das tabelas com o mesmo layout nos dois blocos.
+        """
+        self.requests[:] = other.requests
+        self.responses[:] = other.responses
+        self.exceptions[:] = other.exceptions
+        for key in tables:
+            mine, theirs = self.hits.get(key), other.hits.get(key)
+            if mine is not None and theirs is not None and len(mine) == len(theirs):
+                mine[:] = theirs
+
+    def reset(self):
+        """Zera tudo (o servidor pode incrementar no meio - é só estatística)"""
+        self.shm.buf[self.data_offset:self.nbytes] = bytes(self.nbytes - self.data_offset)
+
+    def close(self):
+        for view in self._views:
+            view.release()
+        self._views = []
+        self.hits = {}
+        self.shm.close()
+        if self.owner:
+            try:
+                self.shm.unlink()
+            except FileNotFoundError:
+                pass
+
+
+def count_access(hits, pieces):
+    """Marca um acesso em cada trecho (rel, pos, n) de SegmentLayout.pieces()"""
+    for _, pos, n in pieces:
+        hits[pos] += 1
+        hits[pos + n] -= 1
+
+
+def dump(counters, layouts, path=None):
+    """Snapshot para análise offline: FCs + {slave_id: {tabela: {base0: acessos}}}
+
+    `layouts` é {slave_id: {tabela: SegmentLayout}}. Com `path` grava também:
+    .csv -> uma linha por endereço (slave_id, tabela, base0, acessos); outro -> JSON.
+    """
+    devices = {}
+    for sid, tables in layouts.items():
+        devices[sid] = {}
+        for table, layout in tables.items():
+            counts = counters.access_counts(sid, table)
+            devices[sid][table] = {layout.address_of(pos) - 1: n for pos, n in enumerate(counts) if n}
+    data = {'timestamp': time.time(), 'function_codes': counters.fc_counts(), 'devices': devices}
+
+    if path:
+        if str(path).lower().endswith('.csv'):
+            with open(path, 'w', newline='', encoding='utf-8') as f:
+                writer = csv.writer(f)
+                writer.writerow(['slave_id', 'tabela', 'base0', 'acessos'])
+                for sid, tables in devices.items():
+                    for table, counts in tables.items():
+                        for addr, n in sorted(counts.items()):
+                            writer.writerow([sid, table, addr, n])
+        else:
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, indent=2)
+    return data
@@ -1,5 +1,28 @@
 """Parser do CSV para construir mapa de memória"""
 import csv
+import re
+
+# "min-max" aceitando negativos e decimais: "-40-85", "0 - 247", "1.5-3"
+_RANGE_RE = re.compile(r'^\s*(-?\d+(?:\.\d+)?)\s*(?:-|a|\.\.|;)\s*(-?\d+(?:\.\d+)?)\s*$')
+
+
+def _to_number(text):
+    """Converte '10' -> 10, '1.5' -> 1.5, '' -> None"""
+    text = (text or '').strip().replace(',', '.')
+    if not text:
+        return None
+    value = float(text)
+    return int(value) if value.is_integer() else value
+
+
+def parse_bounds(intervalo='', minimo='', maximo=''):
+    """Compila Intervalo OU Minimo/Maximo em (min, max) numéricos - None onde não há limite"""
+    if minimo or maximo:
+        return _to_number(minimo), _to_number(maximo)
+    match = _RANGE_RE.match(intervalo or '')
+    if match:
+        return _to_number(match.group(1)), _to_number(match.group(2))
+    return None, None
 
 class MemoryMapParser:
     def __init__(self, csv_path):
@@ -12,15 +35,28 @@ class MemoryMapParser:
     def parse(self):
         """Lê o CSV e organiza por função Modbus"""
         with open(self.csv_path, 'r', encoding='utf-8-sig') as f:
-            # Detectar delimitador automaticamente
-            sample = f.read(1024)
+            # Detectar delimitador automaticamente pelo cabeçalho (linhas com colunas
+            # a mais confundiriam o Sniffer e são recusadas abaixo com o número da linha)
+            header = f.readline()
             f.seek(0)
             sniffer = csv.Sniffer()
-            delimiter = sniffer.sniff(sample).delimiter
+            delimiter = sniffer.sniff(header, delimiters=',;\t').delimiter
             
             reader = csv.DictReader(f, delimiter=delimiter)
             
             for row in reader:
+                # Campo com o delimitador sem aspas (ex.: Sinal "sine(mean=220, amp=5)")
+                # empurra o resto da linha para as colunas seguintes - recusar em vez de
+                # carregar valores trocados
+                extra = [value for value in row.get(None) or [] if value.strip()]
+                if extra:
+                    raise ValueError(f"{self.csv_path} linha {reader.line_num}: {len(extra)} coluna(s) além do "
+                                     f"cabeçalho ({delimiter.join(extra)!r}) - use aspas no campo que contém "
+                                     f"'{delimiter}' (ex.: Sinal) ou o arquivo .sinais.json")
+                sinal = (row.get('Sinal') or '').strip()
+                if sinal.count('(') != sinal.count(')'):
+                    raise ValueError(f"{self.csv_path} linha {reader.line_num}: Sinal {sinal!r} com parênteses "
+                                     f"desbalanceados - use aspas no campo que contém '{delimiter}' ou o arquivo .sinais.json")
                 try:
                     tipo = row.get('Tipo', '').strip()
                     base0 = row.get('RegBase0', '').strip()
@@ -29,14 +65,19 @@ class MemoryMapParser:
                     objeto = row.get('Objeto', '').strip()
                     unidade = row.get('Unidade', '').strip()
                     resolucao = row.get('Resolucao', '').strip()
+                    offset = (row.get('Offset') or '').strip()
                     permissao = row.get('Permissao', '').strip()
                     fcs = row.get('FCs', '').strip()
                     
                     # Suportar ambos os formatos: Intervalo OU Minimo/Maximo
                     intervalo = row.get('Intervalo', '').strip()
+                    minimo = (row.get('Minimo') or '').strip()
+                    maximo = (row.get('Maximo') or '').strip()
+                    try:
+                        limite_min, limite_max = parse_bounds(intervalo, minimo, maximo)
+                    except ValueError:
+                        limite_min, limite_max = None, None
                     if not intervalo:
-                        minimo = row.get('Minimo', '').strip()
-                        maximo = row.get('Maximo', '').strip()
                         if minimo and maximo:
                             intervalo = f"{minimo}-{maximo}"
                         elif minimo:
@@ -46,6 +87,8 @@ class MemoryMapParser:
                     
                     valor_inicial = row.get('ValorInicial', '').strip()
                     descricao = row.get('Descricao', '').strip()
+                    # Gerador de sinal opcional (ver signal_engine): "sine(mean=220, amp=5, period=60)",
+                    # entre aspas quando o delimitador é vírgula - lido e conferido acima
                     
                     # Ignorar linhas vazias
                     if not tipo or not base0 or not base1 or not objeto:
@@ -62,8 +105,14 @@ class MemoryMapParser:
                     elif valor_inicial.upper() == 'OFF':
                         val_inicial = 0
                         pass # print(f"DEBUG PARSER: {tipo} {addr_base0} = OFF → 0")
-                    elif valor_inicial:
+                    elif valor_inicial and tipo in ('COIL', 'DISC'):
                         val_inicial = int(valor_inicial)
+                    elif valor_inicial:
+                        # Registradores: numérico (int ou float) ou texto para Tipo_de_Dados string
+                        try:
+                            val_inicial = _to_number(valor_inicial)
+                        except ValueError:
+                            val_inicial = valor_inicial
                         pass # print(f"DEBUG PARSER: {tipo} {addr_base0} = {valor_inicial} → {val_inicial}")
                     else:
                         val_inicial = 0
@@ -78,11 +127,15 @@ class MemoryMapParser:
                         'nome': objeto,
                         'unidade': unidade,
                         'resolucao': resolucao,
+                        'offset': offset,
                         'permissao': permissao,
                         'fcs': fcs,
                         'intervalo': intervalo,
+                        'minimo': limite_min,
+                        'maximo': limite_max,
                         'valor_inicial': val_inicial,
-                        'descricao': descricao
+                        'descricao': descricao,
+                        'sinal': sinal
                     }
                     
                     # Classificar por tipo
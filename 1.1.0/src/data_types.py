@@ -0,0 +1,312 @@
+"""Codecs dos tipos de dados (coluna Tipo_de_Dados) sobre registradores de 16 bits"""
+import re
+import struct
+from array import array
+from decimal import Decimal, InvalidOperation
+
+# Tipo -> (formato struct, registradores ocupados)
+DATA_TYPES = {
+    'int16': ('h', 1),
+    'uint16': ('H', 1),
+    'int32': ('i', 2),
+    'uint32': ('I', 2),
+    'float32': ('f', 2),
+    'float64': ('d', 4),
+    # Sem tipo declarado: 16 bits crus, aceita de -32768 a 65535 como o mapa sempre aceitou
+    'word': ('H', 1),
+}
+
+# Nomes alternativos aceitos na coluna Tipo_de_Dados
+ALIASES = {
+    'bool': 'uint16', 'u16': 'uint16', 'unsigned': 'uint16',
+    'int': 'int16', 's16': 'int16', 'i16': 'int16', 'short': 'int16', 'signed': 'int16',
+    'u32': 'uint32', 'dword': 'uint32', 'udint': 'uint32',
+    's32': 'int32', 'i32': 'int32', 'dint': 'int32', 'long': 'int32',
+    'float': 'float32', 'real': 'float32', 'f32': 'float32',
+    'double': 'float64', 'lreal': 'float64', 'f64': 'float64',
+}
+
+# "string10", "STRING[10]", "string(10)" -> 10 caracteres (2 por registrador)
+_STRING_RE = re.compile(r'^(?:string|str|ascii)\s*[\[(]?\s*(\d*)\s*[\])]?$')
+
+ORDERS = ('big', 'little')
+
+
+class RegisterCodec:
+    """Converte um valor tipado <-> lista de words uint16 (como trafegam no Modbus)
+
+    A ordem dos bytes no fio é obtida com um único struct: a ordem das words
+    define o endianness do struct e, quando a ordem dos bytes dentro da word
+    difere, cada word é invertida (ABCD, DCBA, CDAB e BADC).
+    """
+
+    def __init__(self, kind, count, fmt, word_order='big', byte_order='big'):
+        if word_order not in ORDERS or byte_order not in ORDERS:
+            raise ValueError(f"Ordem inválida: word_order={word_order} byte_order={byte_order}")
+        self.kind = kind
+        self.count = count
+        self.fmt = fmt
+        self.word_order = word_order
+        self.byte_order = byte_order
+        self.swap_bytes = word_order != byte_order
+        self.endian = '>' if word_order == 'big' else '<'
+        self._value = struct.Struct(self.endian + fmt)
+        # Words lidas do buffer já com a troca de bytes aplicada
+        self._words = struct.Struct(('<' if self.swap_bytes else '>') + 'H' * count)
+
+    @property
+    def is_string(self):
+        return self.kind == 'string'
+
+    @property
+    def is_float(self):
+        return self.fmt in ('f', 'd')
+
+    def encode(self, value):
+        """Valor -> [word, ...] (ValueError/struct.error se não couber no tipo)"""
+        if self.is_string:
+            value = str(value).encode('ascii', 'replace')
+        elif self.kind == 'word':
+            value = int(value) & 0xFFFF
+        return list(self._words.unpack(self._value.pack(value)))
+
+    def decode(self, words):
+        """[word, ...] -> valor"""
+        value = self._value.unpack(self._words.pack(*(w & 0xFFFF for w in words)))[0]
+        if self.is_string:
+            return value.split(b'\x00', 1)[0].decode('ascii', 'replace')
+        return value
+
+    def from_engineering(self, value, resolucao=1.0, offset=0.0):
+        """Valor de engenharia (UI) -> valor bruto do tipo (arredondado para tipos inteiros)"""
+        if self.is_string:
+            return value
+        raw = (float(str(value).replace(',', '.')) - offset) / resolucao
+        return raw if self.is_float else int(round(raw))
+
+    def to_engineering(self, raw, resolucao=1.0, offset=0.0):
+        """Valor bruto do tipo -> valor de engenharia (UI)"""
+        if self.is_string:
+            return raw
+        return raw * resolucao + offset
+
+
+_cache = {}
+
+
+def codec_for(tipo_dados, word_order='big', byte_order='big'):
+    """RegisterCodec para o texto da coluna Tipo_de_Dados (instâncias compartilhadas)"""
+    key = ((tipo_dados or '').strip().lower(), word_order, byte_order)
+    codec = _cache.get(key)
+    if codec is not None:
+        return codec
+
+    name = ALIASES.get(key[0], key[0])
+    if name in DATA_TYPES:
+        fmt, count = DATA_TYPES[name]
+        codec = RegisterCodec(name, count, fmt, word_order, byte_order)
+    else:
+        match = _STRING_RE.match(name)
+        if not match:
+            raise ValueError(f"Tipo_de_Dados desconhecido: {tipo_dados}")
+        length = int(match.group(1) or 2)
+        count = (length + 1) // 2
+        codec = RegisterCodec('string', count, f'{count * 2}s', word_order, byte_order)
+
+    _cache[key] = codec
+    return codec
+
+
+class BlockCodec:
+    """Codifica/decodifica todos os registradores tipados de uma tabela com um único struct
+
+    `entries` é {endereço: RegisterCodec}. As posições sem registrador viram
+    padding no formato, então uma leitura contígua da tabela inteira
+    (get_values) é decodificada com um struct.unpack só.
+    """
+
+    def __init__(self, entries, word_order='big', byte_order='big'):
+        self.addresses = sorted(entries)
+        self.codecs = [entries[addr] for addr in self.addresses]
+        self.start = self.addresses[0] if self.addresses else 0
+
+        # Offsets (relativos a start) das words que pertencem a algum registrador
+        self.covered = []
+        fmt = ['>' if word_order == 'big' else '<']
+        cursor = self.start
+        for addr, codec in zip(self.addresses, self.codecs):
+            if addr < cursor:
+                raise ValueError(f"Registrador {addr} sobrepõe o anterior")
+            if addr > cursor:
+                fmt.append(f'{(addr - cursor) * 2}x')
+            fmt.append(codec.fmt)
+            self.covered.extend(range(addr - self.start, addr - self.start + codec.count))
+            cursor = addr + codec.count
+        self.count = cursor - self.start
+        self._struct = struct.Struct(''.join(fmt))
+        # Troca de bytes por word quando ordem das words != ordem dos bytes
+        swap = word_order != byte_order
+        self._word_endian = '<' if swap else '>'
+
+    def _to_bytes(self, words):
+        return struct.pack(f'{self._word_endian}{len(words)}H', *(w & 0xFFFF for w in words))
+
+    def _to_words(self, data):
+        return list(struct.unpack(f'{self._word_endian}{len(data) // 2}H', data))
+
+    def decode(self, words):
+        """words[start:start+count] -> {endereço: valor}"""
+        values = self._struct.unpack(self._to_bytes(words))
+        result = {}
+        for addr, codec, value in zip(self.addresses, self.codecs, values):
+            if codec.is_string:
+                value = value.split(b'\x00', 1)[0].decode('ascii', 'replace')
+            result[addr] = value
+        return result
+
+    def encode(self, values):
+        """{endereço: valor} -> {endereço: word} das words cobertas (padding não aparece)"""
+        args = []
+        for addr, codec in zip(self.addresses, self.codecs):
+            value = values.get(addr, '' if codec.is_string else 0)
+            if codec.is_string:
+                value = str(value).encode('ascii', 'replace')
+            elif codec.kind == 'word':
+                value = int(value) & 0xFFFF
+            args.append(value)
+        words = self._to_words(self._struct.pack(*args))
+        return {self.start + i: words[i] for i in self.covered}
+
+
+def parse_resolution(text):
+    """'0.01' -> (0.01, 2) - resolução e casas decimais (vazio/inválido = 1, 0 casas)"""
+    try:
+        value = Decimal(str(text).strip().replace(',', '.'))
+    except InvalidOperation:
+        return 1.0, 0
+    if not value.is_finite() or value == 0:
+        return 1.0, 0
+    return float(value), max(0, -value.normalize().as_tuple().exponent)
+
+
+def _to_float(text, default=0.0):
+    try:
+        return float(str(text).strip().replace(',', '.'))
+    except ValueError:
+        return default
+
+
+_formatters = {}
+
+
+def formatter_for(codec, decimals):
+    """Função valor -> texto do campo (compartilhada por tipo e casas decimais)"""
+    key = ('s' if codec.is_string else 'g' if codec.is_float else decimals)
+    fmt = _formatters.get(key)
+    if fmt is None:
+        if codec.is_string:
+            fmt = str
+        elif codec.is_float:
+            fmt = '{:.6g}'.format
+        else:
+            fmt = f'{{:.{decimals}f}}'.format
+        _formatters[key] = fmt
+    return fmt
+
+
+def register_codec(reg, word_order='big', byte_order='big'):
+    """Codec de um registrador do mapa - sem Tipo_de_Dados vale word (int16 se o mínimo for negativo)"""
+    tipo_dados = reg.get('tipo_dados', '')
+    if not (tipo_dados or '').strip():
+        minimo = reg.get('minimo')
+        tipo_dados = 'int16' if minimo is not None and minimo < 0 else 'word'
+    return codec_for(tipo_dados, word_order, byte_order)
+
+
+class TypedTable:
+    """Codecs de uma tabela de registradores (IR ou HR) compilados no carregamento do mapa
+
+    `codecs` é {base0: RegisterCodec}; `owners` leva cada word de um registrador
+    multi-word ao seu base0, para que uma escrita em qualquer metade seja
+    redecodificada como o valor inteiro.
+
+    Resolucao/Offset são lidos uma vez para arrays `scale`/`offset` indexados
+    por `slot[base0]`, junto com o formatador de cada registrador (casas
+    decimais derivadas da resolução) - a atualização da tela não faz parsing.
+    """
+
+    def __init__(self, reg_map, word_order='big', byte_order='big'):
+        self.codecs = {addr: register_codec(reg, word_order, byte_order) for addr, reg in reg_map.items()}
+        self.owners = {}
+        for addr, codec in self.codecs.items():
+            for i in range(1, codec.count):
+                self.owners[addr + i] = addr
+        # Endereços de datastore são base0 + 1
+        self.block = BlockCodec({addr + 1: codec for addr, codec in self.codecs.items()}, word_order, byte_order)
+
+        self.addresses = sorted(reg_map)
+        self.slot = {addr: i for i, addr in enumerate(self.addresses)}
+        self.scale = array('d')
+        self.offset = array('d')
+        self.numeric = bytearray()
+        self.formatters = []
+        for addr in self.addresses:
+            reg = reg_map[addr]
+            codec = self.codecs[addr]
+            scale, decimals = parse_resolution(reg.get('resolucao', 1))
+            self.scale.append(scale)
+            self.offset.append(_to_float(reg.get('offset', 0)))
+            self.numeric.append(0 if codec.is_string else 1)
+            self.formatters.append(formatter_for(codec, decimals))
+
+    def initial_value(self, addr, reg):
+        """ValorInicial convertido para o tipo do registrador (bruto, sem resolução)"""
+        codec = self.codecs[addr]
+        value = reg.get('valor_inicial', 0)
+        if codec.is_string:
+            return str(value)
+        try:
+            return float(value) if codec.is_float else int(round(float(value)))
+        except ValueError:
+            print(f"⚠️ ValorInicial inválido para {codec.kind} em {addr}: {value!r} - usando 0")
+            return 0
+
+    def initial_words(self, reg_map):
+        """{endereço datastore: word} com os ValorInicial já codificados"""
+        return self.block.encode({addr + 1: self.initial_value(addr, reg_map[addr]) for addr in self.codecs})
+
+    def expand(self, per_register):
+        """{base0: x} -> {endereço datastore: x} repetido em todas as words do registrador"""
+        result = {}
+        for addr, value in per_register.items():
+            codec = self.codecs.get(addr)
+            for i in range(codec.count if codec else 1):
+                result[addr + 1 + i] = value
+        return result
+
+    def format(self, addr, raw):
+        """Valor bruto decodificado -> texto em unidade de engenharia"""
+        i = self.slot[addr]
+        if self.numeric[i]:
+            raw = raw * self.scale[i] + self.offset[i]
+        return self.formatters[i](raw)
+
+    def format_batch(self, values):
+        """[(base0, valor bruto)] -> [(base0, texto)] numa passada só sobre os arrays"""
+        slot, scale, offset, numeric, formatters = self.slot, self.scale, self.offset, self.numeric, self.formatters
+        result = []
+        for addr, raw in values:
+            i = slot[addr]
+            result.append((addr, formatters[i](raw * scale[i] + offset[i] if numeric[i] else raw)))
+        return result
+
+    def encode_text(self, addr, text):
+        """Texto digitado na UI -> words do registrador (ValueError/struct.error se inválido)"""
+        i = self.slot[addr]
+        codec = self.codecs[addr]
+        raw = codec.from_engineering(text, self.scale[i], self.offset[i])
+        return codec.encode(raw)
+
+    def owner(self, addr):
+        """base0 do registrador que contém a word `addr` (ela mesma se não for multi-word)"""
+        return self.owners.get(addr, addr)
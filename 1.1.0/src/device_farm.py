@@ -0,0 +1,323 @@
+"""Fazenda de dispositivos sem GUI - centenas de slave IDs emulados para teste de carga de mestres
+
+Uso: python device_farm.py fazenda.json [intervalo_status_s]
+
+A descrição (JSON) lista barramentos; caminhos de CSV são relativos ao arquivo:
+
+{
+  "guard_band": 16, "word_order": "big", "byte_order": "big",
+  "metrics_port": 9100,
+  "buses": [
+    {"transport": "rtu", "port": "pty", "baudrate": 19200,
+     "devices": [{"slave_ids": "1-100", "csv": "mapa.csv"}]},
+    {"transport": "tcp", "host": "127.0.0.1", "port": 5020, "processes": "auto",
+     "devices": [{"slave_ids": "1-247", "csv": "mapa.csv"}]}
+  ]
+}
+
+Uma linha RTU é um meio só: o barramento inteiro fica num processo servidor
+("pty" = loopback pty, senão o nome da porta serial). Um barramento TCP pode
+ser dividido em `processes` processos ("auto" = núcleos disponíveis), cada um
+numa porta a partir de `port` ("rtu+tcp" usa `port` para a serial e
+`tcp_port` para o TCP). Cada CSV é compilado uma vez: slave IDs com o
+mesmo mapa compartilham layouts e regras (um pickle por processo) e só têm
+tabelas de valores próprias. Com `metrics_port` cada processo expõe /metrics
+na porta seguinte. Geradores de sinal dos mapas (coluna Sinal ou
+<mapa>.sinais.json) rodam a `signal_rate_hz` ticks por segundo em cada
+processo, para todos os dispositivos dele de uma vez.
+"""
+import json
+import os
+import signal
+import sys
+import time
+
+from device_map import DeviceMap
+from modbus_server_multiprocess import ModbusServerMultiprocess
+from virtual_serial import PTY_PORT
+
+MAX_SLAVE_ID = 247
+BUS_DEFAULTS = {
+    'transport': 'rtu',
+    'port': 'pty',
+    'host': '127.0.0.1',
+    'baudrate': 19200,
+    'bytesize': 8,
+    'parity': 'N',
+    'stopbits': 1,
+    'pty_pacing': True,
+    'rtu_framer': 'fast',
+    'turnaround_mode': 'min',
+    'turnaround_ms': 0.0,
+    'turnaround_spin_ms': 0.0,
+    'processes': 1,
+    'signal_rate_hz': 10,
+    'reject_unmapped_writes': True,
+}
+
+
+def parse_slave_ids(spec):
+    """"1-10,15" / [1, 2, "20-30"] / 5 -> lista ordenada de slave IDs (1..247)"""
+    items = spec if isinstance(spec, list) else str(spec).split(',')
+    ids = set()
+    for item in items:
+        text = str(item).strip()
+        if '-' in text:
+            first, last = (int(part) for part in text.split('-', 1))
+            ids.update(range(first, last + 1))
+        elif text:
+            ids.add(int(text))
+    invalid = [sid for sid in ids if not 1 <= sid <= MAX_SLAVE_ID]
+    if invalid:
+        raise ValueError(f"slave ID fora de 1..{MAX_SLAVE_ID}: {sorted(invalid)[:5]}")
+    return sorted(ids)
+
+
+def raise_fd_limit():
+    """Sobe o limite soft de descritores até o hard
+
+    Os dispositivos de um processo servidor dividem uma SharedArena (um bloco
+    para as tabelas de todos), mas este processo segura ao mesmo tempo os
+    blocos, pipes, sockets e ptys de todos os processos da fazenda.
+    """
+    try:
+        import resource
+    except ImportError:
+        return  # Windows: sem limite de descritores por processo a ajustar
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft != hard:
+        try:
+            resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+        except (ValueError, OSError) as e:
+            print(f"⚠️ Não foi possível subir o limite de descritores de {soft} para {hard} ({e}) - "
+                  f"fazendas grandes podem falhar com 'Too many open files'")
+
+
+class FarmGroup:
+    """Um processo servidor da fazenda: um barramento (ou fatia de um barramento TCP) e seus dispositivos
+
+    `devices` é [(slave_id, DeviceMap)]; o primeiro é o principal do
+    ModbusServerMultiprocess e os demais viram clones do mesmo DeviceMap.
+    """
+
+    def __init__(self, label, bus, devices, tcp_port=None, metrics_port=None):
+        self.label = label
+        self.bus = bus
+        self.devices = devices
+        self.tcp_port = tcp_port
+        self.metrics_port = metrics_port
+        self.server = ModbusServerMultiprocess()
+        # Sem processo reserva: numa fazenda ele dobraria o número de processos
+        self.server.warm_standby = False
+        self.server.reject_unmapped_writes = bus['reject_unmapped_writes']
+        self.endpoint = None
+        self.error = None
+        self.started_at = None
+        self.ready_ms = None
+
+    def configure(self):
+        templates = {}
+        for sid, device in self.devices:
+            if not templates:
+                self.server.create_datastore(**device.datastore_kwargs())
+                templates[id(device)] = None
+            elif id(device) in templates:
+                self.server.clone_device(sid, templates[id(device)])
+            else:
+                self.server.add_device(sid, **device.datastore_kwargs())
+                templates[id(device)] = sid
+
+    def start(self):
+        """Dispara o processo sem esperar as portas (ver wait())"""
+        bus = self.bus
+        self.error = None
+        self.configure()
+        rtu = 'rtu' in bus['transport']
+        port = PTY_PORT if rtu and bus['port'] == 'pty' else (bus['port'] if rtu else None)
+        metrics = (bus['host'], self.metrics_port) if self.metrics_port else None
+        self.started_at = time.perf_counter()
+        ok, message = self.server.start(
+            port, bus['baudrate'], bus['bytesize'], bus['parity'], bus['stopbits'], self.devices[0][0],
+            transport=bus['transport'], tcp_address=(bus['host'], self.tcp_port or 5020),
+            pty_pacing=bus['pty_pacing'], rtu_framer=bus['rtu_framer'],
+            turnaround_mode=bus['turnaround_mode'], turnaround_ms=bus['turnaround_ms'],
+            turnaround_spin_ms=bus['turnaround_spin_ms'],
+            metrics_address=metrics, signal_rate=bus['signal_rate_hz'])
+        if not ok:
+            self.error = message
+        return ok
+
+    def wait(self, timeout=10.0):
+        if self.error is not None:
+            return False
+        ok, message = self.server.wait_ready(timeout)
+        if not ok:
+            self.error = message
+            return False
+        self.ready_ms = (time.perf_counter() - self.started_at) * 1000
+        endpoints = []
+        if self.server.client_port():
+            endpoints.append(f"pty {self.server.client_port()}")
+        elif 'rtu' in self.bus['transport']:
+            endpoints.append(self.bus['port'])
+        if 'tcp' in self.bus['transport']:
+            endpoints.append(f"tcp {self.bus['host']}:{self.tcp_port}")
+        self.endpoint = ' + '.join(endpoints)
+        return True
+
+    def stop(self):
+        self.server.shutdown()
+
+    def status(self):
+        """Saúde e totais do processo: estado, requisições, exceções, conexões e bytes"""
+        server = self.server
+        if self.error is not None:
+            state = 'erro'
+        elif not server.running:
+            state = 'parado'
+        elif not server.process.is_alive():
+            state = 'morto'
+        else:
+            state = 'rodando' if server.ready else 'iniciando'
+        counts = server.fc_counts().values() if state in ('rodando', 'iniciando') else []
+        connections = server.connection_stats() if state == 'rodando' else []
+        return {
+            'label': self.label,
+            'endpoint': self.endpoint or '-',
+            'devices': len(self.devices),
+            'state': state,
+            'pid': server.process.pid if server.process is not None else None,
+            'requests': sum(c['requests'] for c in counts),
+            'exceptions': sum(c['exceptions'] for c in counts),
+            'connections': sum(1 for stats in connections if stats['active']),
+            'bytes_in': sum(stats['bytes_in'] for stats in connections),
+            'bytes_out': sum(stats['bytes_out'] for stats in connections),
+            'error': self.error,
+        }
+
+
+class DeviceFarm:
+    """Barramentos da descrição divididos em FarmGroup (um processo servidor cada)"""
+
+    def __init__(self, description, base_dir='.'):
+        self.description = description
+        self.base_dir = base_dir
+        self.maps = {}
+        self.groups = []
+        cores = os.cpu_count() or 1
+        metrics_port = description.get('metrics_port')
+        for number, entry in enumerate(description.get('buses', []), 1):
+            bus = {**BUS_DEFAULTS, **entry}
+            devices = self._bus_devices(bus, number)
+            if not devices:
+                continue
+            slices = 1
+            if bus['transport'] == 'tcp':
+                slices = cores if bus['processes'] == 'auto' else int(bus['processes'])
+                slices = max(1, min(slices, len(devices)))
+            size = (len(devices) + slices - 1) // slices
+            tcp_base = entry.get('tcp_port', entry.get('port', 5020) if bus['transport'] == 'tcp' else 5020)
+            for i in range(slices):
+                part = devices[i * size:(i + 1) * size]
+                if not part:
+                    continue
+                label = f"bus{number}" if slices == 1 else f"bus{number}.{i + 1}"
+                port = metrics_port + len(self.groups) if metrics_port else None
+                self.groups.append(FarmGroup(label, bus, part, tcp_base + i, port))
+
+    @classmethod
+    def from_file(cls, path):
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls(json.load(f), os.path.dirname(os.path.abspath(path)))
+
+    def _map(self, csv_path):
+        """DeviceMap compilado uma vez por CSV (o mesmo objeto para todos os slave IDs que o usam)"""
+        path = os.path.normpath(os.path.join(self.base_dir, csv_path))
+        if path not in self.maps:
+            self.maps[path] = DeviceMap.from_csv(path, self.description)
+        return self.maps[path]
+
+    def _bus_devices(self, bus, number):
+        devices = {}
+        for entry in bus.get('devices', []):
+            device = self._map(entry['csv'])
+            for sid in parse_slave_ids(entry['slave_ids']):
+                if sid in devices:
+                    raise ValueError(f"barramento {number}: slave ID {sid} repetido")
+                devices[sid] = device
+        return sorted(devices.items())
+
+    @property
+    def device_count(self):
+        return sum(len(group.devices) for group in self.groups)
+
+    def start(self, timeout=10.0):
+        """Dispara todos os processos e depois espera as portas - o total fica perto do mais lento
+
+        Retorna a lista de grupos que falharam (vazia = tudo rodando).
+        """
+        raise_fd_limit()
+        for group in self.groups:
+            group.start()
+        return [group for group in self.groups if not group.wait(timeout)]
+
+    def stop(self):
+        for group in self.groups:
+            group.stop()
+
+    def status(self):
+        return [group.status() for group in self.groups]
+
+
+def format_status(rows):
+    """Tabela de texto dos status dos grupos + linha de totais"""
+    lines = [f"{'grupo':<9} {'estado':<9} {'IDs':>4} {'PID':>7} {'conex':>5} {'req':>10} {'exc':>8} "
+             f"{'B in':>11} {'B out':>11}  endpoint"]
+    for row in rows:
+        lines.append(f"{row['label']:<9} {row['state']:<9} {row['devices']:>4} {row['pid'] or '-':>7} "
+                     f"{row['connections']:>5} {row['requests']:>10} {row['exceptions']:>8} "
+                     f"{row['bytes_in']:>11} {row['bytes_out']:>11}  {row['error'] or row['endpoint']}")
+    totals = {key: sum(row[key] for row in rows)
+              for key in ('devices', 'connections', 'requests', 'exceptions', 'bytes_in', 'bytes_out')}
+    running = sum(1 for row in rows if row['state'] == 'rodando')
+    lines.append(f"{'total':<9} {f'{running}/{len(rows)}':<9} {totals['devices']:>4} {'':>7} "
+                 f"{totals['connections']:>5} {totals['requests']:>10} {totals['exceptions']:>8} "
+                 f"{totals['bytes_in']:>11} {totals['bytes_out']:>11}")
+    return '\n'.join(lines)
+
+
+def _terminate(signum, frame):
+    raise KeyboardInterrupt
+
+
+def main(path, interval=5.0):
+    # SIGTERM (systemd, CI) para a fazenda como Ctrl+C, com os processos e a shared memory liberados
+    signal.signal(signal.SIGTERM, _terminate)
+    farm = DeviceFarm.from_file(path)
+    print(f"🚜 Fazenda: {farm.device_count} dispositivo(s) em {len(farm.groups)} processo(s) | "
+          f"{len(farm.maps)} mapa(s) | {os.cpu_count()} núcleo(s)")
+    started = time.perf_counter()
+    try:
+        failed = farm.start()
+        print(f"✅ {len(farm.groups) - len(failed)}/{len(farm.groups)} processo(s) prontos em "
+              f"{(time.perf_counter() - started) * 1000:.0f} ms")
+        for group in failed:
+            print(f"❌ {group.label}: {group.error}")
+        print(format_status(farm.status()))
+        while True:
+            time.sleep(interval)
+            print()
+            print(format_status(farm.status()))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        started = time.perf_counter()
+        farm.stop()
+        print(f"🛑 Fazenda parada em {(time.perf_counter() - started) * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(1)
+    main(sys.argv[1], float(sys.argv[2]) if len(sys.argv) > 2 else 5.0)
@@ -0,0 +1,101 @@
+"""Mapa de memória de um dispositivo - CSV parseado e compilado para o datastore"""
+import logging
+
+from csv_parser import MemoryMapParser
+from data_types import TypedTable
+from segmented_store import SegmentedTable, DEFAULT_GUARD
+from signal_engine import compile_signals, load_sidecar, signal_specs
+
+log = logging.getLogger(__name__)
+
+
+class DeviceMap:
+    """Mapas do CSV + tudo que o servidor precisa (tabelas segmentadas, permissões, FCs, limites)
+
+    Os endereços do datastore são base0 + 1. Uma instância é imutável depois de
+    construída, então vários slave IDs clonados do mesmo mapa compartilham o
+    mesmo DeviceMap.
+    """
+
+    def __init__(self, coils_map, di_map, ir_map, hr_map,
+                 guard=DEFAULT_GUARD, word_order='big', byte_order='big', sidecar=None):
+        self.coils_map = coils_map
+        self.di_map = di_map
+        self.ir_map = ir_map
+        self.hr_map = hr_map
+
+        # Codecs por Tipo_de_Dados (valores de 32/64 bits e strings ocupam várias words)
+        self.ir_types = TypedTable(ir_map, word_order, byte_order)
+        self.hr_types = TypedTable(hr_map, word_order, byte_order)
+
+        # Tabelas segmentadas apenas com as faixas mapeadas
+        self.tables = {
+            'coils': SegmentedTable.from_values({addr + 1: reg['valor_inicial'] for addr, reg in coils_map.items()}, guard),
+            'di': SegmentedTable.from_values({addr + 1: reg['valor_inicial'] for addr, reg in di_map.items()}, guard),
+            'ir': SegmentedTable.from_values(self.ir_types.initial_words(ir_map), guard),
+            'hr': SegmentedTable.from_values(self.hr_types.initial_words(hr_map), guard),
+        }
+
+        # Permissões - registradores multi-word: a permissão vale para todas as suas words
+        self.permissions = {
+            'coils': {addr + 1: reg.get('permissao', 'R/W') for addr, reg in coils_map.items()},
+            'di': {addr + 1: reg.get('permissao', 'R') for addr, reg in di_map.items()},
+            'ir': self.ir_types.expand({addr: reg.get('permissao', 'R') for addr, reg in ir_map.items()}),
+            'hr': self.hr_types.expand({addr: reg.get('permissao', 'R/W') for addr, reg in hr_map.items()}),
+        }
+
+        # Function codes aceitos por registrador (coluna FCs)
+        self.fcs = {
+            'coils': {addr + 1: reg.get('fcs', '') for addr, reg in coils_map.items()},
+            'di': {addr + 1: reg.get('fcs', '') for addr, reg in di_map.items()},
+            'ir': self.ir_types.expand({addr: reg.get('fcs', '') for addr, reg in ir_map.items()}),
+            'hr': self.hr_types.expand({addr: reg.get('fcs', '') for addr, reg in hr_map.items()}),
+        }
+
+        # Limites (Intervalo ou Minimo/Maximo) dos holding registers de uma word. A
+        # validação compara cada word do PDU; o limite de um valor multi-word vale
+        # para o valor decodificado, então fica sem efeito e o carregamento avisa
+        self.hr_bounds = {}
+        multiword = []
+        for addr, reg in hr_map.items():
+            if reg.get('minimo') is None and reg.get('maximo') is None:
+                continue
+            if self.hr_types.codecs[addr].count == 1:
+                self.hr_bounds[addr + 1] = (reg.get('minimo'), reg.get('maximo'))
+            else:
+                multiword.append(addr)
+        if multiword:
+            log.warning("Intervalo ignorado em %d HR multi-word (RegBase0 %s): limites só valem para registradores de uma word",
+                        len(multiword), ', '.join(map(str, sorted(multiword))))
+
+        # Geradores de sinal (coluna Sinal + <mapa>.sinais.json) compilados para o processo servidor
+        self.signal_specs = signal_specs({'coils': coils_map, 'di': di_map, 'ir': ir_map, 'hr': hr_map}, sidecar)
+        self.signals = compile_signals(self, self.signal_specs)
+
+    @classmethod
+    def from_csv(cls, csv_path, config=None):
+        """Parseia o CSV (e o arquivo de sinais ao lado) e compila com guard_band/word_order/byte_order da configuração"""
+        get = config.get if config is not None else (lambda key, default=None: default)
+        coils_map, di_map, ir_map, hr_map = MemoryMapParser(csv_path).parse()
+        return cls(coils_map, di_map, ir_map, hr_map,
+                   guard=get('guard_band', DEFAULT_GUARD),
+                   word_order=get('word_order', 'big'),
+                   byte_order=get('byte_order', 'big'),
+                   sidecar=load_sidecar(csv_path))
+
+    @property
+    def total(self):
+        return len(self.coils_map) + len(self.di_map) + len(self.ir_map) + len(self.hr_map)
+
+    def datastore_kwargs(self):
+        """Argumentos nomeados para create_datastore()/add_device() do servidor"""
+        return {
+            'coils_data': self.tables['coils'], 'di_data': self.tables['di'],
+            'ir_data': self.tables['ir'], 'hr_data': self.tables['hr'],
+            'coils_perm': self.permissions['coils'], 'di_perm': self.permissions['di'],
+            'ir_perm': self.permissions['ir'], 'hr_perm': self.permissions['hr'],
+            'coils_fcs': self.fcs['coils'], 'di_fcs': self.fcs['di'],
+            'ir_fcs': self.fcs['ir'], 'hr_fcs': self.fcs['hr'],
+            'hr_bounds': self.hr_bounds,
+            'signals': self.signals,
+        }
@@ -0,0 +1,177 @@
+"""Framer RTU do emulador - CRC por tabela e detecção de quadros sem cópias por byte"""
+import sys
+
+from pymodbus.exceptions import ModbusIOException
+from pymodbus.transaction import ModbusRtuFramer
+
+# Maior ADU RTU: endereço + PDU (253) + CRC
+MAX_RTU_FRAME = 256
+
+
+def _crc16_table():
+    """Tabela do CRC-16/MODBUS (polinômio 0xA001 refletido), calculada uma vez"""
+    table = []
+    for byte in range(256):
+        crc = byte
+        for _ in range(8):
+            crc = (crc >> 1) ^ 0xA001 if crc & 1 else crc >> 1
+        table.append(crc)
+    return table
+
+
+CRC16_TABLE = _crc16_table()
+
+# Tabela de 16 bits (65536 entradas, ~15 ms para montar): duas posições do
+# quadro por consulta, lidas como words little-endian de um memoryview.
+# Só vale em máquinas little-endian; nas outras fica o laço por byte.
+CRC16_WORD_TABLE = [
+    CRC16_TABLE[(CRC16_TABLE[x & 0xFF] ^ (x >> 8)) & 0xFF] ^ (CRC16_TABLE[x & 0xFF] >> 8)
+    for x in range(65536)
+] if sys.byteorder == 'little' else None
+
+# Abaixo disso o memoryview.cast custa mais do que economiza
+_WORD_MIN = 16
+
+
+def crc16(data, table=CRC16_TABLE, words=CRC16_WORD_TABLE):
+    """CRC-16/MODBUS de bytes/bytearray/memoryview - byte baixo vai primeiro no fio"""
+    crc = 0xFFFF
+    size = len(data)
+    if words is None or size < _WORD_MIN:
+        for byte in data:
+            crc = (crc >> 8) ^ table[(crc ^ byte) & 0xFF]
+        return crc
+    even = size & ~1
+    view = memoryview(data)
+    for word in view[:even].cast('H'):
+        crc = words[crc ^ word]
+    if even != size:
+        crc = (crc >> 8) ^ table[(crc ^ view[even]) & 0xFF]
+    return crc
+
+
+def frame_sizes(decoder):
+    """Tabela function code -> (tamanho fixo, posição do byte count) para 256 FCs
+
+    Lida uma vez dos atributos _rtu_frame_size/_rtu_byte_count_pos das PDUs do
+    decoder; FCs com o bit 0x80 são respostas de exceção (5 bytes). None marca
+    um byte que não pode ser function code (o quadro não começa ali).
+    """
+    sizes = [None] * 256
+    lookup = decoder.lookup if decoder else {}
+    for fc, pdu_class in lookup.items():
+        if not 0 < fc < 0x80:
+            continue
+        fixed = getattr(pdu_class, '_rtu_frame_size', 0)
+        pos = getattr(pdu_class, '_rtu_byte_count_pos', 0)
+        if fixed or pos:
+            sizes[fc] = (fixed, pos)
+        sizes[fc | 0x80] = (5, 0)
+    return sizes
+
+
+class FastRtuFramer(ModbusRtuFramer):
+    """ModbusRtuFramer com o mesmo comportamento e menos trabalho por quadro
+
+    - o buffer de entrada é um bytearray que cresce no lugar e é aparado uma
+      vez por chamada (o stock reconstrói `bytes` a cada fatia);
+    - o tamanho do quadro vem de uma tabela por function code, sem
+      lookupPduClass/struct.unpack;
+    - o CRC é calculado sobre um memoryview do buffer, sem copiar o quadro
+      (duas posições por consulta de tabela nos quadros longos);
+    - as respostas são montadas num buffer pré-alocado (endereço + PDU + CRC)
+      e copiadas uma vez para o bytes entregue ao transporte.
+
+    Quadros com CRC inválido avançam um byte e a busca continua, como no stock;
+    cada um soma 1 em `errors['crc_errors']` (o handler troca `errors` pelo
+    dict de estatísticas da conexão).
+    """
+
+    method = "rtu"
+
+    def __init__(self, decoder, client=None):
+        super().__init__(decoder, client)
+        self._buffer = bytearray()
+        self._sizes = frame_sizes(decoder)
+        self._out = bytearray(MAX_RTU_FRAME)
+        self._out_view = memoryview(self._out)
+        self.errors = {'crc_errors': 0}
+
+    def resetFrame(self):
+        super().resetFrame()
+        self._buffer = bytearray()
+
+    def frameProcessIncomingPacket(self, _single, callback, slave, _tid=None, **kwargs):
+        buf = self._buffer
+        if not isinstance(buf, bytearray):
+            buf = self._buffer = bytearray(buf)
+        sizes = self._sizes
+        broadcast = not slave[0]
+        start = 0
+        end = len(buf)
+        view = memoryview(buf)
+        try:
+            while end - start >= 4:
+                uid = buf[start]
+                entry = sizes[buf[start + 1]]
+                if entry is None or (not broadcast and uid not in slave):
+                    start += 1
+                    continue
+                fixed, pos = entry
+                if fixed:
+                    size = fixed
+                elif end - start > pos:
+                    size = buf[start + pos] + pos + 3
+                else:
+                    break
+                if end - start < size:
+                    break
+                stop = start + size
+                if crc16(view[start:stop - 2]) != buf[stop - 2] | buf[stop - 1] << 8:
+                    self.errors['crc_errors'] += 1
+                    start += 1
+                    continue
+
+                result = self.decoder.decode(bytes(view[start + 1:stop - 2]))
+                if result is None:
+                    raise ModbusIOException("Unable to decode request")
+                result.slave_id = uid
+                result.transaction_id = 0
+                self._header = {"uid": uid, "tid": 0, "len": size, "crc": bytes(view[stop - 2:stop])}
+                start = stop
+                callback(result)
+        finally:
+            view.release()
+            # Sobras (início de quadro ou até 3 bytes de lixo) ficam para a próxima leitura
+            if start:
+                del buf[:start]
+
+    def buildPacket(self, message):
+        pdu = message.encode()
+        size = len(pdu) + 4
+        view = self._out_view if size <= MAX_RTU_FRAME else memoryview(bytearray(size))
+        view[0] = message.slave_id
+        view[1] = message.function_code
+        view[2:size - 2] = pdu
+        crc = crc16(view[:size - 2])
+        view[size - 2] = crc & 0xFF
+        view[size - 1] = crc >> 8
+        message.transaction_id = 0
+        # Cópia única: o transporte pode segurar o bytes até o envio terminar
+        return bytes(view[:size])
+
+
+# Opção "rtu_framer" da configuração -> classe do framer
+RTU_FRAMERS = {
+    'fast': FastRtuFramer,
+    'pymodbus': ModbusRtuFramer,
+}
+
+
+def rtu_framer(name):
+    """Classe do framer RTU pelo nome da configuração (desconhecido -> 'fast')"""
+    framer = RTU_FRAMERS.get(str(name or 'fast').lower())
+    if framer is None:
+        print(f"⚠️ rtu_framer desconhecido: {name!r} - usando 'fast'")
+        framer = FastRtuFramer
+    return framer
@@ -0,0 +1,250 @@
+"""Histogramas de latência por estágio e function code em shared memory (servidor grava, GUI/CLI leem)
+
+Uso (CLI, com o servidor rodando): python latency.py [nome_shm]
+Sem nome, lista os blocos modbus_emu_latency_* em /dev/shm e mostra o primeiro.
+"""
+import asyncio
+import glob
+import os
+import sys
+import time
+from multiprocessing import shared_memory
+
+# Estágios de uma requisição, do quadro lido à resposta escrita
+STAGES = ('decode', 'check', 'datastore', 'encode', 'write', 'total')
+DECODE, CHECK, DATASTORE, ENCODE, WRITE, TOTAL = range(len(STAGES))
+
+# Function codes com linha própria; os demais caem em "outros" (slot 0)
+FC_SLOTS = (None, 1, 2, 3, 4, 5, 6, 15, 16)
+NSLOTS = len(FC_SLOTS)
+
+# Buckets log-lineares estilo HDR: 16 valores exatos (ns) e depois 8 sub-buckets
+# por potência de 2 (erro relativo <= 12,5%) até ~68 s
+SUB_BITS = 3
+BUCKETS = 272
+
+SHM_PREFIX = "modbus_emu_latency_"
+MAGIC = 0x4C415431  # 'LAT1'
+HEADER_SIZE = 16
+
+
+def bucket_index(ns):
+    """Nanossegundos -> índice do bucket"""
+    if ns < 16:
+        return ns if ns > 0 else 0
+    shift = ns.bit_length() - (SUB_BITS + 1)
+    idx = ((shift + 1) << SUB_BITS) + (ns >> shift) - (1 << SUB_BITS)
+    return idx if idx < BUCKETS else BUCKETS - 1
+
+
+def bucket_bounds(idx):
+    """Índice -> (menor, maior) valor em ns do bucket"""
+    if idx < 16:
+        return idx, idx
+    shift = (idx >> SUB_BITS) - 1
+    low = ((idx & ((1 << SUB_BITS) - 1)) + (1 << SUB_BITS)) << shift
+    return low, low + (1 << shift) - 1
+
+
+def fc_label(slot):
+    fc = FC_SLOTS[slot]
+    return f"FC{fc:02d}" if fc is not None else "outros"
+
+
+class LatencyHistograms:
+    """Contadores [estágio][FC][bucket] + soma e máximo por linha, num bloco de shared memory
+
+    Só o processo servidor grava (um único writer, sem lock, pelo
+    LatencyRecorder); GUI e CLI leem cópias.
+    """
+
+    def __init__(self, name=None):
+        self.rows = len(STAGES) * NSLOTS
+        nbytes = HEADER_SIZE + 8 * (self.rows * BUCKETS + 2 * self.rows)
+        self.nbytes = nbytes
+        if name is None:
+            self.shm = shared_memory.SharedMemory(create=True, size=nbytes, name=f"{SHM_PREFIX}{os.getpid()}_{id(self):x}")
+            self.owner = True
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+            self.owner = False
+        header = self.shm.buf[:HEADER_SIZE].cast('Q')
+        if self.owner:
+            self.shm.buf[:nbytes] = bytes(nbytes)
+            header[0] = MAGIC
+            header[1] = time.time_ns()
+        elif header[0] != MAGIC:
+            header.release()
+            raise ValueError(f"{name} não é um bloco de latências do emulador")
+        self._header = header
+        data = self.shm.buf[HEADER_SIZE:nbytes].cast('Q')
+        self._counts = data[:self.rows * BUCKETS]
+        self._sums = data[self.rows * BUCKETS:self.rows * (BUCKETS + 1)]
+        self._max = data[self.rows * (BUCKETS + 1):]
+        self._data = data
+        # FC -> slot, para indexar sem dict no caminho quente
+        self._slot = bytes(FC_SLOTS.index(fc) if fc in FC_SLOTS[1:] else 0 for fc in range(256))
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def __reduce__(self):
+        return (self.__class__, (self.shm.name,))
+
+    def record(self, stage, fc, ns):
+        """Soma uma amostra de `ns` nanossegundos no estágio/FC"""
+        # bucket_index() em linha (SUB_BITS = 3): a chamada de função custaria mais que a conta
+        row = stage * NSLOTS + self._slot[fc & 0xFF]
+        if ns < 16:
+            idx = ns if ns > 0 else 0
+        else:
+            shift = ns.bit_length() - 4
+            idx = ((shift + 1) << 3) + (ns >> shift) - 8
+            if idx >= BUCKETS:
+                idx = BUCKETS - 1
+        self._counts[row * BUCKETS + idx] += 1
+        self._sums[row] += ns
+        if ns > self._max[row]:
+            self._max[row] = ns
+
+    def reset(self):
+        """Zera os contadores (o servidor pode gravar no meio - é só estatística)"""
+        self.shm.buf[HEADER_SIZE:self.nbytes] = bytes(self.nbytes - HEADER_SIZE)
+        self._header[1] = time.time_ns()
+
+    def snapshot(self):
+        """Cópia consistente o suficiente para estatística: (counts, sums, max) como listas"""
+        return self._counts.tolist(), self._sums.tolist(), self._max.tolist()
+
+    def summary(self, stages=STAGES, merge_fcs=False):
+        """[{stage, fc, count, mean_us, p50_us, p90_us, p99_us, max_us}] das linhas com amostras
+
+        `merge_fcs` soma todos os function codes numa linha por estágio (fc='*').
+        """
+        counts, sums, maxes = self.snapshot()
+        result = []
+        for stage in stages:
+            s = STAGES.index(stage)
+            groups = [list(range(NSLOTS))] if merge_fcs else [[slot] for slot in range(NSLOTS)]
+            for slots in groups:
+                hist = [0] * BUCKETS
+                total = peak = 0
+                for slot in slots:
+                    row = s * NSLOTS + slot
+                    base = row * BUCKETS
+                    for i, n in enumerate(counts[base:base + BUCKETS]):
+                        if n:
+                            hist[i] += n
+                    total += sums[row]
+                    peak = max(peak, maxes[row])
+                count = sum(hist)
+                if not count:
+                    continue
+                result.append({
+                    'stage': stage,
+                    'fc': '*' if merge_fcs else fc_label(slots[0]),
+                    'count': count,
+                    'mean_us': total / count / 1000,
+                    'p50_us': percentile(hist, count, 0.50) / 1000,
+                    'p90_us': percentile(hist, count, 0.90) / 1000,
+                    'p99_us': percentile(hist, count, 0.99) / 1000,
+                    'max_us': peak / 1000,
+                })
+        return result
+
+    def close(self):
+        for view in (self._counts, self._sums, self._max, self._data, self._header):
+            view.release()
+        self.shm.close()
+        if self.owner:
+            try:
+                self.shm.unlink()
+            except FileNotFoundError:
+                pass
+
+
+class LatencyRecorder:
+    """Lado do servidor: carimbos de tempo por requisição, somados aos histogramas fora do caminho da resposta
+
+    Cada requisição entrega uma lista [fc, quadro, execute, checado, task,
+    encode, encodado, write, escrito] de perf_counter_ns() (0 = estágio que não
+    aconteceu) - no caminho da requisição fica só um append. `flush()` roda
+    numa tarefa periódica do event loop (ou quando a fila enche) e faz a conta
+    dos buckets.
+    """
+
+    def __init__(self, histograms, max_pending=4096):
+        self.histograms = histograms
+        self.max_pending = max_pending
+        self.pending = []
+
+    def add(self, stamps):
+        pending = self.pending
+        pending.append(stamps)
+        if len(pending) >= self.max_pending:
+            self.flush()
+
+    def flush(self):
+        pending, self.pending = self.pending, []
+        record = self.histograms.record
+        for fc, frame, executed, checked, task, encode, encoded, write, written in pending:
+            record(DECODE, fc, executed - frame)
+            record(CHECK, fc, checked - executed)
+            if task:
+                record(DATASTORE, fc, encode - task)
+            record(ENCODE, fc, encoded - encode)
+            record(WRITE, fc, written - write)
+            record(TOTAL, fc, written - frame)
+        return len(pending)
+
+    async def run(self, interval=0.25):
+        """Tarefa do event loop: descarrega os carimbos a cada `interval` segundos"""
+        while True:
+            await asyncio.sleep(interval)
+            if self.pending:
+                self.flush()
+
+
+def percentile(hist, count, fraction):
+    """Valor (ns, meio do bucket) abaixo do qual fica `fraction` das amostras"""
+    rank = max(1, int(count * fraction + 0.5))
+    seen = 0
+    for idx, n in enumerate(hist):
+        seen += n
+        if seen >= rank:
+            low, high = bucket_bounds(idx)
+            return (low + high) / 2
+    return 0.0
+
+
+def format_summary(rows):
+    """Tabela de texto (CLI/diálogo) para o resultado de summary()"""
+    lines = [f"{'estágio':<10} {'FC':<7} {'n':>9} {'média':>9} {'p50':>9} {'p90':>9} {'p99':>9} {'máx':>9}  (µs)"]
+    for row in rows:
+        lines.append(f"{row['stage']:<10} {row['fc']:<7} {row['count']:>9} {row['mean_us']:>9.1f} "
+                     f"{row['p50_us']:>9.1f} {row['p90_us']:>9.1f} {row['p99_us']:>9.1f} {row['max_us']:>9.1f}")
+    return '\n'.join(lines)
+
+
+def find_blocks():
+    """Nomes dos blocos de latência abertos (Linux: /dev/shm)"""
+    return sorted(os.path.basename(path) for path in glob.glob(f"/dev/shm/{SHM_PREFIX}*"))
+
+
+if __name__ == "__main__":
+    names = sys.argv[1:] or find_blocks()
+    if not names:
+        print("❌ Nenhum servidor com histogramas de latência encontrado")
+        sys.exit(1)
+    histograms = LatencyHistograms(names[0])
+    # Só leitura: o resource_tracker deste processo não deve remover o bloco do servidor ao sair
+    from multiprocessing import resource_tracker
+    resource_tracker.unregister(histograms.shm._name, 'shared_memory')
+    try:
+        print(f"📊 {histograms.name}")
+        print(format_summary(histograms.summary(merge_fcs=True)))
+        print()
+        print(format_summary(histograms.summary()))
+    finally:
+        histograms.close()
@@ -2,12 +2,15 @@
 from PyQt6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
                               QLabel, QPushButton, QComboBox, QLineEdit, QTabWidget, 
                               QScrollArea, QCheckBox, QGroupBox, QFileDialog, QMessageBox, QGridLayout)
-from PyQt6.QtCore import Qt, QThread, pyqtSignal, QTimer
+from PyQt6.QtCore import Qt, QThread, pyqtSignal, QTimer, QSocketNotifier
 from PyQt6.QtGui import QFont, QIcon
-from csv_parser import MemoryMapParser
 from config import Config
 from splash import SplashScreen
 from modbus_server_multiprocess import ModbusServerMultiprocess as ModbusServer
+from device_map import DeviceMap
+from map_reload import diff_maps
+from virtual_serial import PTY_PORT
+from latency import format_summary
 import serial.tools.list_ports
 import multiprocessing as mp
 import time
@@ -16,6 +19,14 @@ import sys
 
 class ModbusEmulator(QMainWindow):
     server_error = pyqtSignal(str)  # Signal para erros da thread do servidor
+    START_TIMEOUT_MS = 10000  # Máximo para o processo servidor abrir as portas
+    # Verificação da porta após o stop: backoff exponencial de 2 ms até 500 ms, por até 2 min
+    PORT_CHECK_FIRST_MS = 2
+    PORT_CHECK_MAX_MS = 500
+    PORT_CHECK_TIMEOUT_S = 120
+    # Ordem das abas (FC da tabela) e nome da tabela no datastore
+    TAB_FCS = (1, 2, 4, 3)
+    FC_TABLES = {1: 'coils', 2: 'di', 3: 'hr', 4: 'ir'}
 
     def __init__(self):
         super().__init__()
@@ -35,13 +46,30 @@ class ModbusEmulator(QMainWindow):
         self.di_map = {}
         self.ir_map = {}
         self.hr_map = {}
+        self.ir_types = None
+        self.hr_types = None
+        self.device_map = None
         self.modbus = ModbusServer()
+        # Processo reserva pré-criado: Iniciar/Aplicar sem esperar um processo novo
+        self.modbus.warm_standby = self.config.get('warm_standby', True)
+        # Escrita em endereço fora do mapa: ILLEGAL ADDRESS (padrão) ou aceita e descartada
+        self.modbus.reject_unmapped_writes = self.config.get('reject_unmapped_writes', True)
         self.server_running = False
+        self.server_transport = 'rtu'
+        self.server_port = None
+        self.server_baudrate = None
         
         self.coil_controls = {}
         self.di_controls = {}
         self.ir_controls = {}
         self.hr_controls = {}
+        # Rótulo Base0 de cada linha por FC de leitura (destaque de acesso recente)
+        self.addr_labels = {1: {}, 2: {}, 3: {}, 4: {}}
+        # Rótulos Base1/Nome/Unidade de cada linha por FC (recarga do mapa atualiza só as linhas que mudaram)
+        self.row_labels = {1: {}, 2: {}, 3: {}, 4: {}}
+        self.hot_labels = set()
+        self.last_access_counts = {}
+        self.access_timer = None
         
         self.parity_map = {"None": "N", "Even": "E", "Odd": "O", "Mark": "M", "Space": "S"}
         
@@ -50,16 +78,22 @@ class ModbusEmulator(QMainWindow):
         self.server_error.connect(self.on_server_error)
         
         # Monitoramento de porta
-        self.port_check_timer = None
         self.port_check_count = 0
-        self.port_check_start = None
+        self.port_check_delay_ms = 0
         self.port_check_port = None
         self.port_check_baudrate = None
+        self.stop_started = None
         
-        # Polling timer para atualizar UI via shared memory
-        self.polling_timer = QTimer()
-        self.polling_timer.timeout.connect(self.poll_shared_memory)
-        self.last_values = {'coils': {}, 'di': {}, 'ir': {}, 'hr': {}}
+        # Notificação de escritas Modbus via socket (QSocketNotifier) - sem polling
+        self.change_notifier = None
+        self.last_sequence = None
+        self.last_repaint_latency_ms = None
+        
+        # Handshake de inicialização com o processo servidor (pipe + QSocketNotifier)
+        self.pending_start = None
+        self.ready_notifier = None
+        self.ready_timer = None
+        self.status_tooltip = ""
 
         self.setup_ui()
         self.apply_styles()
@@ -129,6 +163,17 @@ class ModbusEmulator(QMainWindow):
         self.stopbits_combo.setCurrentText(str(self.config.get('stopbits', 1)))
         config_layout.addWidget(self.stopbits_combo)
         
+        config_layout.addWidget(QLabel("Modo:"))
+        self.transport_combo = QComboBox()
+        self.transport_combo.addItems(["RTU", "TCP", "RTU+TCP"])
+        self.transport_combo.setCurrentText(self.config.get('transport', 'rtu').upper())
+        config_layout.addWidget(self.transport_combo)
+        
+        config_layout.addWidget(QLabel("Porta TCP:"))
+        self.tcp_port_entry = QLineEdit(str(self.config.get('tcp_port', 5020)))
+        self.tcp_port_entry.setMaximumWidth(60)
+        config_layout.addWidget(self.tcp_port_entry)
+        
         config_layout.addWidget(QLabel("Slave ID:"))
         self.slave_id_entry = QLineEdit(str(self.config.get('slave_id', 1)))
         self.slave_id_entry.setMaximumWidth(50)
@@ -139,6 +184,17 @@ class ModbusEmulator(QMainWindow):
         self.btn_toggle.clicked.connect(self.toggle_server)
         config_layout.addWidget(self.btn_toggle)
         
+        self.btn_apply = QPushButton("🔄 Aplicar")
+        self.btn_apply.setToolTip("Reinicia com a configuração da tela mantendo os valores (processo reserva)")
+        self.btn_apply.setEnabled(False)
+        self.btn_apply.clicked.connect(self.apply_server_config)
+        config_layout.addWidget(self.btn_apply)
+        
+        self.btn_latency = QPushButton("📊 Latências")
+        self.btn_latency.setEnabled(False)
+        self.btn_latency.clicked.connect(self.show_latency)
+        config_layout.addWidget(self.btn_latency)
+        
         self.status_label = QLabel("⚪ Parado")
         self.status_label.setStyleSheet("color: gray; font-weight: bold;")
         config_layout.addWidget(self.status_label)
@@ -272,7 +328,9 @@ class ModbusEmulator(QMainWindow):
     
     def get_available_ports(self):
         ports = [port.device for port in serial.tools.list_ports.comports()]
-        return ports if ports else ["COM16"]
+        # Par pty interno para testes sem hardware (Linux/Unix)
+        virtual = [PTY_PORT] if hasattr(os, 'openpty') else []
+        return (ports if ports else ["COM16"]) + virtual
     
     def refresh_ports(self):
         """Atualiza lista de portas COM ao abrir dropdown"""
@@ -308,49 +366,28 @@ class ModbusEmulator(QMainWindow):
         self.editor.showMaximized()
     
     def reload_csv_from_editor(self, csv_path):
-        """Recarregar CSV após edição no editor"""
+        """Recarregar CSV após edição no editor - com um mapa já carregado aplica só o que mudou"""
         if csv_path and os.path.exists(csv_path):
             print(f"🔄 Recarregando mapa de memória: {csv_path}")
-            self.load_csv()
+            if self.device_map is not None:
+                self.hot_reload_csv()
+            else:
+                self.load_csv()
+    
+    def set_device_map(self, device):
+        self.device_map = device
+        self.coils_map, self.di_map, self.ir_map, self.hr_map = device.coils_map, device.di_map, device.ir_map, device.hr_map
+        self.ir_types = device.ir_types
+        self.hr_types = device.hr_types
 
     def load_csv(self):
         try:
-            parser = MemoryMapParser(self.csv_path)
-            self.coils_map, self.di_map, self.ir_map, self.hr_map = parser.parse()
-            
-            max_coil = max(self.coils_map.keys()) if self.coils_map else 0
-            max_di = max(self.di_map.keys()) if self.di_map else 0
-            max_ir = max(self.ir_map.keys()) if self.ir_map else 0
-            max_hr = max(self.hr_map.keys()) if self.hr_map else 0
+            device = DeviceMap.from_csv(self.csv_path, self.config)
+            self.set_device_map(device)
             
-            # Criar arrays com tamanho suficiente
-            coils_block = [0] * max(max_coil + 100, 1000)
-            di_block = [0] * max(max_di + 100, 10000)
-            ir_block = [0] * max(max_ir + 100, 10000)
-            hr_block = [0] * max(max_hr + 100, 10000)
-            
-            # Preencher valores diretamente no índice correspondente
-            for addr, reg in self.coils_map.items():
-                coils_block[addr] = reg['valor_inicial']
-            for addr, reg in self.di_map.items():
-                di_block[addr] = reg['valor_inicial']
-            for addr, reg in self.ir_map.items():
-                ir_block[addr] = reg['valor_inicial']
-            for addr, reg in self.hr_map.items():
-                hr_block[addr] = reg['valor_inicial']
-            
-            # Extrair permissões dos mapas com offset +1
-            coils_perm = {addr + 1: reg.get('permissao', 'R/W') for addr, reg in self.coils_map.items()}
-            di_perm = {addr + 1: reg.get('permissao', 'R') for addr, reg in self.di_map.items()}
-            ir_perm = {addr + 1: reg.get('permissao', 'R') for addr, reg in self.ir_map.items()}
-            hr_perm = {addr + 1: reg.get('permissao', 'R/W') for addr, reg in self.hr_map.items()}
-            
-            # Criar datastore com permissões
-            self.modbus.create_datastore(
-                coils_block, di_block, ir_block, hr_block,
-                None, None, None, None,
-                coils_perm, di_perm, ir_perm, hr_perm
-            )
+            # Criar datastore com permissões, FCs e limites (tabelas segmentadas, endereço = base0 + 1)
+            self.modbus.create_datastore(**device.datastore_kwargs())
+            self.load_extra_devices()
             
             self.print_memory_map()
             
@@ -360,6 +397,151 @@ class ModbusEmulator(QMainWindow):
         except Exception as e:
             QMessageBox.critical(self, "Erro", f"Falha ao carregar Mapa de Memória:\n{str(e)}")
     
+    def hot_reload_csv(self):
+        """Recarga com o servidor rodando: diff dos mapas, troca no processo servidor e só as linhas afetadas
+
+        Valores dos endereços que continuam no mapa são mantidos; registradores
+        novos ou com Tipo_de_Dados/ValorInicial alterados voltam ao ValorInicial.
+        Abas cujo conjunto de endereços mudou são recriadas; nas outras só os
+        rótulos e valores das linhas alteradas são atualizados.
+        """
+        try:
+            device = DeviceMap.from_csv(self.csv_path, self.config)
+        except Exception as e:
+            QMessageBox.critical(self, "Erro", f"Falha ao carregar Mapa de Memória:\n{str(e)}")
+            return
+        diff = diff_maps(self.device_map, device)
+        if not any(diff.values()) and device.signal_specs == self.device_map.signal_specs:
+            print("🔄 Mapa sem alterações")
+            return
+        
+        started = time.perf_counter()
+        ok, message = self.modbus.reload_datastore(reset={name: table.words for name, table in diff.items()},
+                                                   **device.datastore_kwargs())
+        self.set_device_map(device)
+        if not ok:
+            # O servidor foi parado na falha: tela inteira com o mapa novo
+            if self.server_running:
+                self.stop_server()
+            self.create_tabs()
+            QMessageBox.critical(self, "Erro", message)
+            return
+        
+        rebuilt = []
+        for fc in self.TAB_FCS:
+            table = diff[self.FC_TABLES[fc]]
+            if table.addresses_changed:
+                self.rebuild_tab(fc)
+                rebuilt.append(fc)
+            elif table:
+                self.update_rows(fc, table.changed)
+                self.refresh_rows(fc, table.reset)
+        # Tabelas realocadas têm tracker/contadores novos: próxima notificação relê tudo
+        self.last_sequence = None
+        self.last_access_counts = {}
+        changed = sum(len(table.added) + len(table.removed) + len(table.changed) for table in diff.values())
+        print(f"🔄 {message} | {changed} registrador(es) | {len(rebuilt)} aba(s) recriada(s) | "
+              f"{(time.perf_counter() - started) * 1000:.1f} ms")
+    
+    def rebuild_tab(self, fc):
+        """Recria só a aba da tabela do FC (na mesma posição), com os valores atuais do servidor"""
+        index = self.TAB_FCS.index(fc)
+        current = self.tabs.currentIndex()
+        {1: self.coil_controls, 2: self.di_controls, 3: self.hr_controls, 4: self.ir_controls}[fc].clear()
+        self.hot_labels.difference_update(self.addr_labels[fc].values())
+        self.addr_labels[fc].clear()
+        self.row_labels[fc].clear()
+        
+        old = self.tabs.widget(index)
+        self.tabs.removeTab(index)
+        old.deleteLater()
+        {1: self.create_coils_tab, 2: self.create_di_tab, 3: self.create_hr_tab, 4: self.create_ir_tab}[fc]()
+        self.tabs.tabBar().moveTab(self.tabs.count() - 1, index)
+        self.tabs.setCurrentIndex(current)
+        self.refresh_rows(fc, self.addr_labels[fc])
+    
+    def update_rows(self, fc, addrs):
+        """Rótulos (Base1, nome, unidade, cor da permissão) das linhas cujo registro mudou no CSV"""
+        reg_map = {1: self.coils_map, 2: self.di_map, 3: self.hr_map, 4: self.ir_map}[fc]
+        for addr in addrs:
+            labels = self.row_labels[fc].get(addr)
+            if labels is None:
+                continue
+            reg = reg_map[addr]
+            base1, nome, unidade = labels
+            base1.setText(str(reg['base1']))
+            nome.setText(reg['nome'])
+            if unidade is not None:
+                unidade.setText(reg['unidade'])
+            if fc in (3, 4):
+                nome.setStyleSheet(self.permission_style(reg))
+        if fc in (2, 4):
+            controls = self.di_controls if fc == 2 else self.ir_controls
+            for addr in addrs:
+                if addr in controls:
+                    self.show_signal(self.FC_TABLES[fc], addr, controls[addr])
+    
+    def refresh_rows(self, fc, addrs):
+        """Valores das linhas relidos do servidor (parado: ValorInicial do mapa)"""
+        reg_map = {1: self.coils_map, 2: self.di_map, 3: self.hr_map, 4: self.ir_map}[fc]
+        if fc in (1, 2):
+            changed = self.on_coil_changed if fc == 1 else self.on_di_changed
+            for addr in addrs:
+                value = self.modbus.get_value(fc, addr + 1) if self.modbus.running else reg_map[addr]['valor_inicial']
+                if value is not None:
+                    changed(addr, bool(value))
+            return
+        types, controls = (self.hr_types, self.hr_controls) if fc == 3 else (self.ir_types, self.ir_controls)
+        values = []
+        for addr in addrs:
+            codec = types.codecs[addr]
+            if not self.modbus.running:
+                values.append((addr, types.initial_value(addr, reg_map[addr])))
+                continue
+            words = self.modbus.get_values(fc, addr + 1, codec.count)
+            if words is not None:
+                values.append((addr, codec.decode(words)))
+        for addr, text in types.format_batch(values):
+            self.set_register_text(controls, addr, text)
+    
+    def show_signal(self, table, addr, widget):
+        """Tooltip com o gerador de sinal do registrador (com o servidor rodando o valor muda sozinho)"""
+        spec = self.device_map.signal_specs.get((table, addr)) if self.device_map is not None else None
+        widget.setToolTip(f"Sinal: {spec}" if spec else "")
+    
+    def permission_style(self, reg):
+        """Cor do nome do registrador pela permissão (amarelo: bloqueado, verde: escrita, azul: leitura)"""
+        permissao = reg.get('permissao', 'R').upper()
+        if 'B' in permissao:
+            return "background-color: #FFF9C4; padding: 2px;"
+        if 'W' in permissao:
+            return "background-color: #C8E6C9; padding: 2px;"
+        return "background-color: #BBDEFB; padding: 2px;"
+    
+    def load_extra_devices(self):
+        """Slave IDs adicionais da configuração `devices` servidos pelo mesmo processo
+
+        Cada item é {"slave_id": N} (clone do mapa carregado) ou
+        {"slave_id": N, "csv": "caminho"} (mapa próprio).
+        """
+        self.modbus.clear_devices()
+        maps = {}
+        for entry in self.config.get('devices', []):
+            try:
+                slave_id = int(entry['slave_id'])
+                csv_path = entry.get('csv')
+                if not csv_path:
+                    self.modbus.clone_device(slave_id)
+                    continue
+                # CSVs repetidos compilam uma vez e viram clones
+                if csv_path in maps:
+                    self.modbus.clone_device(slave_id, maps[csv_path])
+                    continue
+                self.modbus.add_device(slave_id, **DeviceMap.from_csv(csv_path, self.config).datastore_kwargs())
+                maps[csv_path] = slave_id
+            except Exception as e:
+                print(f"⚠️ Dispositivo {entry} ignorado: {e}")
+    
     def print_memory_map(self):
         # LOG DETALHADO - Descomente para debug
         pass
@@ -401,6 +583,11 @@ class ModbusEmulator(QMainWindow):
         self.di_controls.clear()
         self.ir_controls.clear()
         self.hr_controls.clear()
+        for labels in self.addr_labels.values():
+            labels.clear()
+        for labels in self.row_labels.values():
+            labels.clear()
+        self.hot_labels.clear()
         
         self.create_coils_tab()
         self.create_di_tab()
@@ -445,6 +632,7 @@ class ModbusEmulator(QMainWindow):
                 reg = self.coils_map[addr]
                 
                 l0 = QLabel(str(addr))
+                self.addr_labels[1][addr] = l0
                 l0.setFixedWidth(60)
                 grid.addWidget(l0, row, 0)
                 
@@ -452,7 +640,9 @@ class ModbusEmulator(QMainWindow):
                 l1.setFixedWidth(60)
                 grid.addWidget(l1, row, 1)
                 
-                grid.addWidget(QLabel(reg['nome']), row, 2)
+                nome_label = QLabel(reg['nome'])
+                grid.addWidget(nome_label, row, 2)
+                self.row_labels[1][addr] = (l1, nome_label, None)
                 
                 # Definir estado inicial baseado no CSV
                 initial_value = bool(reg['valor_inicial'])
@@ -518,6 +708,7 @@ class ModbusEmulator(QMainWindow):
                 reg = self.di_map[addr]
                 
                 l0 = QLabel(str(addr))
+                self.addr_labels[2][addr] = l0
                 l0.setFixedWidth(60)
                 grid.addWidget(l0, row, 0)
                 
@@ -525,7 +716,9 @@ class ModbusEmulator(QMainWindow):
                 l1.setFixedWidth(60)
                 grid.addWidget(l1, row, 1)
                 
-                grid.addWidget(QLabel(reg['nome']), row, 2)
+                nome_label = QLabel(reg['nome'])
+                grid.addWidget(nome_label, row, 2)
+                self.row_labels[2][addr] = (l1, nome_label, None)
                 
                 btn = QPushButton("OFF")
                 btn.setCheckable(True)
@@ -541,6 +734,7 @@ class ModbusEmulator(QMainWindow):
                     btn.setText("OFF")
                     btn.setStyleSheet("background-color: #95a5a6; color: white;")
                 btn.clicked.connect(lambda checked, a=addr, b=btn: self.toggle_di(a, b, checked))
+                self.show_signal('di', addr, btn)
                 grid.addWidget(btn, row, 3, Qt.AlignmentFlag.AlignLeft)
                 self.di_controls[addr] = btn
                 row += 1
@@ -599,6 +793,7 @@ class ModbusEmulator(QMainWindow):
                 reg = self.ir_map[addr]
                 
                 l0 = QLabel(str(addr))
+                self.addr_labels[4][addr] = l0
                 l0.setFixedWidth(60)
                 grid.addWidget(l0, row, 0)
                 
@@ -607,27 +802,23 @@ class ModbusEmulator(QMainWindow):
                 grid.addWidget(l1, row, 1)
                 
                 nome_label = QLabel(reg['nome'])
-                permissao = reg.get('permissao', 'R').upper()
-                if 'B' in permissao:
-                    nome_label.setStyleSheet("background-color: #FFF9C4; padding: 2px;")
-                elif 'W' in permissao:
-                    nome_label.setStyleSheet("background-color: #C8E6C9; padding: 2px;")
-                else:
-                    nome_label.setStyleSheet("background-color: #BBDEFB; padding: 2px;")
+                nome_label.setStyleSheet(self.permission_style(reg))
                 grid.addWidget(nome_label, row, 2)
                 
-                entry = QLineEdit(str(reg['valor_inicial']))
+                entry = QLineEdit(self.ir_types.format(addr, self.ir_types.initial_value(addr, reg)))
                 entry.setMinimumHeight(24)
                 entry.setFixedWidth(60)
                 entry.setStyleSheet("background-color: white;")
                 entry.textChanged.connect(lambda text, e=entry: e.setText(text.replace(',', '.')) if ',' in text else None)
                 entry.editingFinished.connect(lambda a=addr, e=entry: self.update_ir(a, e.text()))
+                self.show_signal('ir', addr, entry)
                 grid.addWidget(entry, row, 3)
                 
                 l_unit = QLabel(reg['unidade'])
                 l_unit.setFixedWidth(70)
                 grid.addWidget(l_unit, row, 4)
                 self.ir_controls[addr] = entry
+                self.row_labels[4][addr] = (l1, nome_label, l_unit)
                 row += 1
             
             col_widget = QWidget()
@@ -684,6 +875,7 @@ class ModbusEmulator(QMainWindow):
                 reg = self.hr_map[addr]
                 
                 l0 = QLabel(str(addr))
+                self.addr_labels[3][addr] = l0
                 l0.setFixedWidth(60)
                 grid.addWidget(l0, row, 0)
                 
@@ -692,16 +884,10 @@ class ModbusEmulator(QMainWindow):
                 grid.addWidget(l1, row, 1)
                 
                 nome_label = QLabel(reg['nome'])
-                permissao = reg.get('permissao', 'R').upper()
-                if 'B' in permissao:
-                    nome_label.setStyleSheet("background-color: #FFF9C4; padding: 2px;")
-                elif 'W' in permissao:
-                    nome_label.setStyleSheet("background-color: #C8E6C9; padding: 2px;")
-                else:
-                    nome_label.setStyleSheet("background-color: #BBDEFB; padding: 2px;")
+                nome_label.setStyleSheet(self.permission_style(reg))
                 grid.addWidget(nome_label, row, 2)
                 
-                entry = QLineEdit(str(reg['valor_inicial']))
+                entry = QLineEdit(self.hr_types.format(addr, self.hr_types.initial_value(addr, reg)))
                 entry.setMinimumHeight(24)
                 entry.setFixedWidth(60)
                 entry.setStyleSheet("background-color: white;")
@@ -713,6 +899,7 @@ class ModbusEmulator(QMainWindow):
                 l_unit.setFixedWidth(70)
                 grid.addWidget(l_unit, row, 4)
                 self.hr_controls[addr] = entry
+                self.row_labels[3][addr] = (l1, nome_label, l_unit)
                 row += 1
             
             col_widget = QWidget()
@@ -753,23 +940,19 @@ class ModbusEmulator(QMainWindow):
     
     def update_ir(self, addr, value):
         try:
-            reg_name = self.ir_map[addr]['nome']
-            resolucao = float(self.ir_map[addr].get('resolucao', 1))
-            value = value.replace(',', '.')
-            valor_modbus = int(float(value) / resolucao)
-            # print(f"\n👉 [UI CLICK] Editou IR Base0={addr} ({reg_name}) → Valor real: {value}, Modbus: {valor_modbus} (res={resolucao})")
-            self.modbus.set_value(4, addr + 1, valor_modbus)
+            # Resolução/offset já compilados no TypedTable
+            words = self.ir_types.encode_text(addr, value)
+            # print(f"\n👉 [UI CLICK] Editou IR Base0={addr} → Valor real: {value}, Modbus: {words}")
+            # Todas as words do valor numa única escrita (atômica para o mestre)
+            self.modbus.set_values(4, addr + 1, words)
         except:
             pass
     
     def update_hr(self, addr, value):
         try:
-            reg_name = self.hr_map[addr]['nome']
-            resolucao = float(self.hr_map[addr].get('resolucao', 1))
-            value = value.replace(',', '.')
-            valor_modbus = int(float(value) / resolucao)
-            # print(f"\n👉 [UI CLICK] Editou HR Base0={addr} ({reg_name}) → Valor real: {value}, Modbus: {valor_modbus} (res={resolucao})")
-            self.modbus.set_value(3, addr + 1, valor_modbus)
+            words = self.hr_types.encode_text(addr, value)
+            # print(f"\n👉 [UI CLICK] Editou HR Base0={addr} → Valor real: {value}, Modbus: {words}")
+            self.modbus.set_values(3, addr + 1, words)
         except:
             pass
     
@@ -800,24 +983,18 @@ class ModbusEmulator(QMainWindow):
             btn.blockSignals(False)
     
     def on_ir_changed(self, addr, value):
-        if addr in self.ir_controls:
-            entry = self.ir_controls[addr]
-            if not entry.hasFocus():
-                resolucao = float(self.ir_map[addr].get('resolucao', 1))
-                valor_real = value * resolucao
-                entry.blockSignals(True)
-                entry.setText(str(valor_real))
-                entry.blockSignals(False)
+        self.set_register_text(self.ir_controls, addr, self.ir_types.format(addr, value))
     
     def on_hr_changed(self, addr, value):
-        if addr in self.hr_controls:
-            entry = self.hr_controls[addr]
-            if not entry.hasFocus():
-                resolucao = float(self.hr_map[addr].get('resolucao', 1))
-                valor_real = value * resolucao
-                entry.blockSignals(True)
-                entry.setText(str(valor_real))
-                entry.blockSignals(False)
+        self.set_register_text(self.hr_controls, addr, self.hr_types.format(addr, value))
+    
+    def set_register_text(self, controls, addr, text):
+        """Atualiza o campo do registrador (texto já formatado) sem disparar edição"""
+        entry = controls.get(addr)
+        if entry is not None and not entry.hasFocus():
+            entry.blockSignals(True)
+            entry.setText(text)
+            entry.blockSignals(False)
     
     def toggle_server(self):
         if self.server_running:
@@ -826,13 +1003,52 @@ class ModbusEmulator(QMainWindow):
             self.start_server()
     
     def start_server(self):
-        if self.server_running:
+        if self.server_running or self.pending_start is not None:
             return
         
         if not self.modbus.store:
             QMessageBox.warning(self, "Aviso", "Carregue um Mapa de Memória antes de iniciar o servidor")
             return
         
+        settings = self.read_server_settings()
+        if settings is None:
+            return
+        
+        # Iniciar servidor usando módulo - não bloqueia: as portas abrem no processo filho
+        self.stop_started = None
+        success, message = self.modbus.start(**settings)
+        
+        if not success:
+            QMessageBox.critical(self, "Erro", f"Falha ao iniciar servidor:\n\n{message}")
+            print(f"❌ {message}")
+            return
+        self.wait_server_ready(message, settings)
+    
+    def apply_server_config(self):
+        """Troca porta/baudrate/slave ID/modo com o servidor rodando - processo reserva, valores mantidos"""
+        if not self.server_running:
+            return
+        settings = self.read_server_settings()
+        if settings is None:
+            return
+        
+        self.stop_notifications()
+        self.stop_started = time.perf_counter()
+        success, message = self.modbus.restart(**settings)
+        if not success:
+            QMessageBox.critical(self, "Erro", f"Falha ao aplicar configuração:\n\n{message}")
+            print(f"❌ {message}")
+            if self.modbus.running:
+                self.start_notifications()  # Recusado antes de parar: continua como estava
+            else:
+                self.set_stopped_controls()
+                self.show_stopped()
+            return
+        self.server_running = False
+        self.wait_server_ready(message, settings)
+    
+    def read_server_settings(self):
+        """Parâmetros de modbus.start()/restart() a partir da tela e da configuração (None se inválidos)"""
         port = self.port_combo.currentText()
         baudrate = int(self.baudrate_combo.currentText())
         bytesize = int(self.bytesize_combo.currentText())
@@ -843,86 +1059,231 @@ class ModbusEmulator(QMainWindow):
             slave_id = int(self.slave_id_entry.text())
             if slave_id < 1 or slave_id > 247:
                 QMessageBox.warning(self, "Aviso", "Slave ID deve estar entre 1 e 247")
-                return
+                return None
         except ValueError:
             QMessageBox.warning(self, "Aviso", "Slave ID inválido")
-            return
-        
-        available_ports = self.get_available_ports()
-        if port not in available_ports:
-            QMessageBox.critical(self, "Erro", f"Porta {port} não disponível!\n\nPortas: {', '.join(available_ports)}")
-            return
+            return None
         
-        # Testar abertura da porta ANTES de qualquer coisa
-        import serial
+        transport = self.transport_combo.currentText().lower()
         try:
-            print(f"🔍 Testando porta {port}...")
-            
-            # Tentar abrir/fechar 3 vezes com intervalo (força liberação)
-            for attempt in range(3):
-                try:
-                    test_serial = serial.Serial(
-                        port=port,
-                        baudrate=baudrate,
-                        bytesize=bytesize,
-                        parity=parity,
-                        stopbits=stopbits,
-                        timeout=1
-                    )
-                    test_serial.close()
-                    time.sleep(0.5)
-                    print(f"✅ Porta {port} disponível (tentativa {attempt+1})")
-                    break
-                except serial.SerialException as e:
-                    if attempt < 2:
-                        print(f"⚠️ Tentativa {attempt+1} falhou, aguardando...")
-                        time.sleep(2)
-                    else:
-                        raise
-        except serial.SerialException as se:
-            error_msg = f"Porta {port} ainda está em uso após 3 tentativas.\n\nAguarde mais alguns segundos e tente novamente.\n\nDetalhes: {str(se)}"
-            QMessageBox.critical(self, "Porta Serial em Uso", error_msg)
-            print(f"❌ {error_msg}")
-            return
-        except Exception as pe:
-            error_msg = f"Erro ao acessar porta {port}: {str(pe)}"
-            QMessageBox.critical(self, "Erro de Porta Serial", error_msg)
-            print(f"❌ {error_msg}")
-            return
+            tcp_port = int(self.tcp_port_entry.text())
+            if not 1 <= tcp_port <= 65535:
+                raise ValueError
+        except ValueError:
+            QMessageBox.warning(self, "Aviso", "Porta TCP inválida")
+            return None
+        tcp_address = (self.config.get('tcp_host', '127.0.0.1'), tcp_port)
+        # Endpoint /metrics só se metrics_port estiver configurada (0 = desligado)
+        metrics_port = int(self.config.get('metrics_port', 0) or 0)
+        metrics_address = (self.config.get('metrics_host', '127.0.0.1'), metrics_port) if metrics_port else None
         
-        # Iniciar servidor usando módulo
-        success, message = self.modbus.start(port, baudrate, bytesize, parity, stopbits, slave_id)
+        # Modo só TCP e o loopback pty não usam porta serial real
+        if 'rtu' in transport and port != PTY_PORT and not self.probe_serial_port(port):
+            return None
         
+        return {
+            'port': port, 'baudrate': baudrate, 'bytesize': bytesize, 'parity': parity, 'stopbits': stopbits,
+            'slave_id': slave_id, 'transport': transport, 'tcp_address': tcp_address,
+            'pty_pacing': self.config.get('pty_pacing', True),
+            'rtu_framer': self.config.get('rtu_framer', 'fast'),
+            'turnaround_mode': self.config.get('turnaround_mode', 'min'),
+            'turnaround_ms': self.config.get('turnaround_ms', 0.0),
+            'turnaround_jitter_ms': self.config.get('turnaround_jitter_ms', 0.0),
+            'turnaround_spin_ms': self.config.get('turnaround_spin_ms', 0.0),
+            'metrics_address': metrics_address,
+            'signal_rate': self.config.get('signal_rate_hz', 10),
+        }
+    
+    def wait_server_ready(self, message, settings):
+        """Aguarda o handshake do processo servidor sem bloquear a UI"""
+        print(message)
+        self.pending_start = settings
+        self.btn_toggle.setEnabled(False)
+        self.btn_apply.setEnabled(False)
+        self.status_label.setText("⏳ Iniciando...")
+        self.status_label.setStyleSheet("color: orange; font-weight: bold;")
+        
+        # O processo responde pelo socket do handshake quando as portas abrirem (ou com o erro)
+        self.ready_notifier = QSocketNotifier(self.modbus.ready_fileno(), QSocketNotifier.Type.Read, self)
+        self.ready_notifier.activated.connect(self.on_server_ready)
+        self.ready_timer = QTimer(self)
+        self.ready_timer.setSingleShot(True)
+        self.ready_timer.timeout.connect(self.on_server_start_timeout)
+        self.ready_timer.start(self.START_TIMEOUT_MS)
+    
+    def on_server_ready(self):
+        """Slot do QSocketNotifier do handshake - porta aberta ou erro concreto do processo servidor"""
+        result = self.modbus.poll_ready()
+        if result is None:
+            return
+        self.finish_start_wait()
+        success, message = result
         if success:
-            self.server_running = True
-            self.port_combo.setEnabled(False)
-            self.baudrate_combo.setEnabled(False)
-            self.bytesize_combo.setEnabled(False)
-            self.parity_combo.setEnabled(False)
-            self.stopbits_combo.setEnabled(False)
-            self.slave_id_entry.setEnabled(False)
-            self.status_label.setText(f"🟢 Rodando (ID {slave_id})")
-            self.status_label.setStyleSheet("color: green; font-weight: bold;")
-            self.btn_toggle.setText("Parar Servidor")
-            print(message)
-            
-            # Salvar configurações
-            self.config.update(
-                serial_port=port,
-                baudrate=baudrate,
-                bytesize=bytesize,
-                parity=self.parity_combo.currentText(),
-                stopbits=stopbits,
-                slave_id=slave_id
-            )
-            
-            # Iniciar polling para atualizar UI (multiprocessing não tem callbacks)
-            # print("🔄 Iniciando polling de shared memory (100ms)...")
-            self.polling_timer.start(100)  # A cada 100ms
+            self.server_started(message)
         else:
+            self.pending_start = None
+            self.set_stopped_controls()
+            self.status_label.setText("⚪ Parado")
+            self.status_label.setStyleSheet("color: gray; font-weight: bold;")
             QMessageBox.critical(self, "Erro", f"Falha ao iniciar servidor:\n\n{message}")
             print(f"❌ {message}")
+    
+    def on_server_start_timeout(self):
+        """Processo não respondeu ao handshake a tempo (porta travada no open)"""
+        if self.pending_start is None:
+            return
+        self.pending_start = None
+        self.finish_start_wait()
+        self.modbus.stop()
+        self.set_stopped_controls()
+        self.status_label.setText("⚪ Parado")
+        self.status_label.setStyleSheet("color: gray; font-weight: bold;")
+        message = f"O processo servidor não abriu as portas em {self.START_TIMEOUT_MS // 1000}s"
+        QMessageBox.critical(self, "Erro", f"Falha ao iniciar servidor:\n\n{message}")
+        print(f"❌ {message}")
+    
+    def finish_start_wait(self):
+        if self.ready_notifier:
+            self.ready_notifier.setEnabled(False)
+            self.ready_notifier.deleteLater()
+            self.ready_notifier = None
+        if self.ready_timer:
+            self.ready_timer.stop()
+            self.ready_timer = None
+        self.btn_toggle.setEnabled(True)
+    
+    def server_started(self, message):
+        """Portas abertas - liga notificações/contadores (a configuração fica editável para o Aplicar)"""
+        params, self.pending_start = self.pending_start, None
+        slave_id = params['slave_id']
+        metrics_address = params['metrics_address']
+        self.server_running = True
+        self.server_transport = params['transport']
+        self.server_port = params['port']
+        self.server_baudrate = params['baudrate']
+        ids = self.modbus.slave_ids()
+        status = f"🟢 Rodando (ID {slave_id})" if len(ids) == 1 else f"🟢 Rodando ({len(ids)} IDs)"
+        if self.stop_started is not None:
+            # Aplicar com o servidor rodando: tempo até o processo reserva abrir as portas
+            status += f" | reinício em {(time.perf_counter() - self.stop_started) * 1000:.0f} ms"
+            self.stop_started = None
+        self.status_label.setText(status)
+        tooltip = f"Slave IDs: {', '.join(map(str, ids))}"
+        if self.modbus.client_port():
+            tooltip += f"\nMestre: {self.modbus.client_port()}"
+        if metrics_address:
+            tooltip += f"\nMétricas: http://{metrics_address[0]}:{metrics_address[1]}/metrics"
+        self.status_tooltip = tooltip
+        self.status_label.setToolTip(tooltip)
+        self.status_label.setStyleSheet("color: green; font-weight: bold;")
+        self.btn_toggle.setText("Parar Servidor")
+        self.btn_apply.setEnabled(True)
+        self.btn_latency.setEnabled(True)
+        print(message)
+        
+        # Salvar configurações
+        self.config.update(
+            serial_port=params['port'],
+            baudrate=params['baudrate'],
+            bytesize=params['bytesize'],
+            parity=self.parity_combo.currentText(),
+            stopbits=params['stopbits'],
+            slave_id=slave_id,
+            transport=params['transport'],
+            tcp_port=params['tcp_address'][1]
+        )
+        self.start_notifications()
+    
+    def start_notifications(self):
+        # Atualizar UI quando o processo servidor avisar pelo socket (multiprocessing não tem callbacks)
+        self.last_sequence = None
+        self.change_notifier = QSocketNotifier(self.modbus.notification_fileno(), QSocketNotifier.Type.Read, self)
+        self.change_notifier.activated.connect(self.on_server_notification)
+        
+        # Contadores de acesso do processo servidor (shared memory) - destaque a cada 500 ms
+        self.last_access_counts = {}
+        self.access_timer = QTimer(self)
+        self.access_timer.timeout.connect(self.refresh_access_counts)
+        self.access_timer.start(500)
+    
+    def stop_notifications(self):
+        # Parar notificações antes de fechar o socket
+        if self.change_notifier:
+            self.change_notifier.setEnabled(False)
+            self.change_notifier.deleteLater()
+            self.change_notifier = None
+            print("⏸️ Notificações paradas")
+        
+        if self.access_timer:
+            self.access_timer.stop()
+            self.access_timer = None
+        self.clear_access_highlight()
+    
+    def set_stopped_controls(self):
+        self.server_running = False
+        self.btn_toggle.setText("Iniciar Servidor")
+        self.btn_apply.setEnabled(False)
+        self.btn_latency.setEnabled(False)
+    
+    def probe_serial_port(self, port):
+        """Confere se a porta serial existe - abrir fica com o processo servidor, que devolve o erro concreto"""
+        available_ports = self.get_available_ports()
+        if port not in available_ports:
+            QMessageBox.critical(self, "Erro", f"Porta {port} não disponível!\n\nPortas: {', '.join(available_ports)}")
+            return False
+        return True
 
+    def show_latency(self):
+        """Histogramas do processo servidor (por estágio e FC) e contadores de requisições"""
+        merged = self.modbus.latency_summary(merge_fcs=True)
+        if not merged:
+            QMessageBox.information(self, "Latências", "Nenhuma requisição medida ainda")
+            return
+        lines = [f"{'FC':<6} {'requisições':>12} {'respostas':>10} {'exceções':>9}"]
+        for fc, counts in sorted(self.modbus.fc_counts().items()):
+            lines.append(f"FC{fc:02d}   {counts['requests']:>12} {counts['responses']:>10} {counts['exceptions']:>9}")
+        box = QMessageBox(self)
+        box.setWindowTitle("Latências do servidor")
+        box.setText(f"<pre>{format_summary(merged)}\n\n" + "\n".join(lines) + "</pre>")
+        box.setDetailedText(format_summary(self.modbus.latency_summary()))
+        dump_btn = box.addButton("Salvar contadores...", QMessageBox.ButtonRole.ActionRole)
+        box.addButton(QMessageBox.StandardButton.Close)
+        box.exec()
+        if box.clickedButton() == dump_btn:
+            filename, _ = QFileDialog.getSaveFileName(self, "Salvar contadores", "contadores.json",
+                                                      "JSON (*.json);;CSV (*.csv)")
+            if filename:
+                self.modbus.dump_counters(filename)
+                print(f"💾 Contadores salvos em {filename}")
+    
+    def refresh_access_counts(self):
+        """Destaca os endereços acessados pelo mestre desde a última passada (tooltip: total de acessos)"""
+        hot = set()
+        for fc, labels in self.addr_labels.items():
+            if not labels:
+                continue
+            counts = self.modbus.access_counts(fc)
+            last = self.last_access_counts.get(fc, {})
+            self.last_access_counts[fc] = counts
+            if counts == last:
+                continue
+            for addr, n in counts.items():
+                label = labels.get(addr)
+                if label is None or n == last.get(addr, 0):
+                    continue
+                label.setToolTip(f"Acessos Modbus: {n}")
+                hot.add(label)
+        for label in self.hot_labels - hot:
+            label.setStyleSheet("")
+        for label in hot - self.hot_labels:
+            label.setStyleSheet("background-color: #FFB74D;")
+        self.hot_labels = hot
+    
+    def clear_access_highlight(self):
+        for label in self.hot_labels:
+            label.setStyleSheet("")
+        self.hot_labels = set()
+    
     def on_server_error_callback(self, error_msg):
         """Callback chamado quando há erro na thread do servidor"""
         self.server_error.emit(error_msg)
@@ -937,51 +1298,38 @@ class ModbusEmulator(QMainWindow):
             return
         
         from datetime import datetime
-        import serial
         
         print("\n" + "="*80)
         print(f"🛑 PARANDO SERVIDOR - {datetime.now().strftime('%H:%M:%S.%f')[:-3]}")
         print("="*80)
+        self.stop_started = time.perf_counter()
         
         try:
+            self.stop_notifications()
+            
+            # Espera o processo sair (sentinel) - o sistema já fechou a porta dele
             print("🛑 Chamando modbus.stop()...")
             self.modbus.stop()
             print("✅ modbus.stop() concluído")
             
-            # Parar polling
-            if self.polling_timer.isActive():
-                self.polling_timer.stop()
-                print("⏸️ Polling parado")
+            self.set_stopped_controls()
             
-            self.server_running = False
-            self.port_combo.setEnabled(True)
-            self.baudrate_combo.setEnabled(True)
-            self.bytesize_combo.setEnabled(True)
-            self.parity_combo.setEnabled(True)
-            self.stopbits_combo.setEnabled(True)
-            self.slave_id_entry.setEnabled(True)
-            self.btn_toggle.setText("Iniciar Servidor")
-            self.btn_toggle.setEnabled(False)  # Desabilitar até porta liberar
+            # Só TCP ou loopback pty: nenhuma porta serial para verificar
+            if 'rtu' not in self.server_transport or self.server_port == PTY_PORT:
+                self.show_stopped()
+                return
             
-            # Iniciar monitoramento de porta
-            port = self.port_combo.currentText()
-            baudrate = int(self.baudrate_combo.currentText())
+            self.btn_toggle.setEnabled(False)  # Desabilitar até confirmar a porta
             
+            # Uma abertura de verificação; se o driver ainda segurar a porta, backoff exponencial
             self.port_check_count = 0
-            self.port_check_start = datetime.now()
-            self.port_check_port = port
-            self.port_check_baudrate = baudrate
+            self.port_check_delay_ms = self.PORT_CHECK_FIRST_MS
+            self.port_check_port = self.server_port
+            self.port_check_baudrate = self.server_baudrate
             
-            self.status_label.setText("⏳ Aguardando porta liberar...")
+            self.status_label.setText("⏳ Verificando porta...")
             self.status_label.setStyleSheet("color: orange; font-weight: bold;")
-            
-            print("\n🔍 Iniciando monitoramento de porta (timeout: 2min)...")
-            print(f"🔍 Testando {port} a cada 1 segundo\n")
-            
-            # Timer para verificar porta a cada 1 segundo
-            self.port_check_timer = QTimer()
-            self.port_check_timer.timeout.connect(self.check_port_released)
-            self.port_check_timer.start(1000)  # 1 segundo
+            self.check_port_released()
             
         except Exception as e:
             print(f"❌ Erro ao parar servidor: {e}")
@@ -989,28 +1337,12 @@ class ModbusEmulator(QMainWindow):
             self.btn_toggle.setEnabled(True)
     
     def check_port_released(self):
-        """Verifica se porta foi liberada"""
-        from datetime import datetime
+        """Abre a porta uma vez; ainda em uso -> nova tentativa com o dobro do intervalo"""
         import serial
         
         self.port_check_count += 1
-        elapsed = (datetime.now() - self.port_check_start).total_seconds()
-        timestamp = datetime.now().strftime('%H:%M:%S.%f')[:-3]
-        
-        # Timeout de 2 minutos (120 segundos)
-        if elapsed > 120:
-            self.port_check_timer.stop()
-            print(f"\n[{timestamp}] +{elapsed:6.2f}s | ⏱️ TIMEOUT (2 minutos)")
-            print("\n" + "="*80)
-            print("❌ PORTA NÃO LIBEROU EM 2 MINUTOS - Forçando habilitação do botão")
-            print("="*80 + "\n")
-            
-            self.btn_toggle.setEnabled(True)
-            self.status_label.setText("❌ Porta travada - Tente novamente")
-            self.status_label.setStyleSheet("color: red; font-weight: bold;")
-            return
+        elapsed = time.perf_counter() - self.stop_started
         
-        # Tentar abrir porta
         try:
             test_serial = serial.Serial(
                 port=self.port_check_port,
@@ -1018,88 +1350,107 @@ class ModbusEmulator(QMainWindow):
                 timeout=0.1
             )
             test_serial.close()
-            
-            # SUCESSO! Porta está livre
-            self.port_check_timer.stop()
-            print(f"[{timestamp}] +{elapsed:6.2f}s | ✅ PORTA LIVRE!")
-            print("\n" + "="*80)
-            print(f"✅ PORTA LIBERADA EM {elapsed:.2f}s - Botão habilitado")
-            print("="*80 + "\n")
-            
-            self.btn_toggle.setEnabled(True)
-            self.status_label.setText("⚪ Parado")
-            self.status_label.setStyleSheet("color: gray; font-weight: bold;")
-            
-        except (OSError, serial.SerialException) as e:
-            # Porta ainda em uso
-            print(f"[{timestamp}] +{elapsed:6.2f}s | ❌ EM USO (tentativa {self.port_check_count})")
+        except (OSError, serial.SerialException):
+            if elapsed > self.PORT_CHECK_TIMEOUT_S:
+                print(f"❌ Porta {self.port_check_port} não liberou em {self.PORT_CHECK_TIMEOUT_S}s "
+                      f"({self.port_check_count} tentativas) - Forçando habilitação do botão")
+                self.btn_toggle.setEnabled(True)
+                self.status_label.setText("❌ Porta travada - Tente novamente")
+                self.status_label.setStyleSheet("color: red; font-weight: bold;")
+                return
+            print(f"+{elapsed * 1000:8.1f} ms | ❌ EM USO (tentativa {self.port_check_count}) "
+                  f"- próxima em {self.port_check_delay_ms} ms")
+            QTimer.singleShot(self.port_check_delay_ms, self.check_port_released)
+            self.port_check_delay_ms = min(self.port_check_delay_ms * 2, self.PORT_CHECK_MAX_MS)
+            return
+        
+        print(f"✅ Porta {self.port_check_port} livre ({self.port_check_count} tentativa(s))")
+        self.btn_toggle.setEnabled(True)
+        self.show_stopped()
+    
+    def show_stopped(self):
+        """Status parado com o tempo do stop até poder reiniciar"""
+        restart_ms = (time.perf_counter() - self.stop_started) * 1000
+        print(f"⏱️ Parada -> pronto para reiniciar: {restart_ms:.1f} ms")
+        self.status_label.setText(f"⚪ Parado (reinício liberado em {restart_ms:.0f} ms)")
+        self.status_label.setStyleSheet("color: gray; font-weight: bold;")
+        self.status_label.setToolTip("")
+    
+    def on_server_notification(self):
+        """Slot do QSocketNotifier - servidor escreveu algo via Modbus"""
+        if not self.server_running:
+            return
+        self.modbus.drain_notifications()
+        self.poll_shared_memory()
+        
+        # Latência medida: notificação do servidor → widgets atualizados
+        latency = self.modbus.notification_latency_ms()
+        if latency is not None:
+            self.last_repaint_latency_ms = latency
+            self.status_label.setToolTip(f"{self.status_tooltip}\nLatência escrita → tela: {latency:.1f} ms")
     
     def poll_shared_memory(self):
-        """Faz polling de shared memory para atualizar UI (multiprocessing)"""
+        """Atualiza UI a partir de shared memory (multiprocessing)
+
+        O processo servidor marca as posições escritas via Modbus num bitmap de
+        sujeira e incrementa um número de sequência global; se a sequência não
+        mudou não há nada a fazer, senão só os endereços marcados são repintados.
+        """
         if not self.server_running or not self.modbus:
             return
         
         try:
-            # Verificar coils - ler do endereço offset+1
-            for addr in self.coils_map.keys():
-                val = self.modbus.get_value(1, addr + 1)
-                if val is not None and val != self.last_values['coils'].get(addr):
-                    old_val = self.last_values['coils'].get(addr, 'N/A')
-                    self.last_values['coils'][addr] = val
-                    
-                    # Debug: mostrar mudança
-                    reg_name = self.coils_map[addr]['nome']
-                    pass # print(f"🔄 [COIL] Base0={addr} | {reg_name[:30]:30s} | Tela: {old_val} → Modbus: {val}")
-                    
-                    self.on_coil_changed(addr, bool(val))
-            
-            # Verificar discrete inputs - ler do endereço offset+1
-            for addr in self.di_map.keys():
-                val = self.modbus.get_value(2, addr + 1)
-                if val is not None and val != self.last_values['di'].get(addr):
-                    old_val = self.last_values['di'].get(addr, 'N/A')
-                    self.last_values['di'][addr] = val
-                    
-                    # Debug: mostrar mudança
-                    reg_name = self.di_map[addr]['nome']
-                    pass # print(f"🔄 [DI]   Base0={addr} | {reg_name[:30]:30s} | Tela: {old_val} → Modbus: {val}")
-                    
-                    self.on_di_changed(addr, bool(val))
-            
-            # Verificar input registers - ler do endereço offset+1
-            for addr in self.ir_map.keys():
-                val = self.modbus.get_value(4, addr + 1)
-                if val is not None and val != self.last_values['ir'].get(addr):
-                    old_val = self.last_values['ir'].get(addr, 'N/A')
-                    self.last_values['ir'][addr] = val
-                    
-                    # Debug: mostrar mudança
-                    reg_name = self.ir_map[addr]['nome']
-                    unidade = self.ir_map[addr]['unidade']
-                    pass # print(f"🔄 [IR]   Base0={addr} | {reg_name[:30]:30s} | Tela: {old_val} → Modbus: {val} {unidade}")
-                    
-                    self.on_ir_changed(addr, int(val))
+            sequence = self.modbus.change_sequence()
+            if sequence is None or sequence == self.last_sequence:
+                return
+            self.last_sequence = sequence
+            changes = self.modbus.collect_changes()
             
-            # Verificar holding registers - ler do endereço offset+1
-            for addr in self.hr_map.keys():
-                val = self.modbus.get_value(3, addr + 1)
-                if val is not None and val != self.last_values['hr'].get(addr):
-                    old_val = self.last_values['hr'].get(addr, 'N/A')
-                    self.last_values['hr'][addr] = val
-                    
-                    # Debug: mostrar mudança
-                    reg_name = self.hr_map[addr]['nome']
-                    unidade = self.hr_map[addr]['unidade']
-                    pass # print(f"🔄 [HR]   Base0={addr} | {reg_name[:30]:30s} | Tela: {old_val} → Modbus: {val} {unidade}")
-                    
-                    self.on_hr_changed(addr, int(val))
+            # Endereços do datastore são offset+1
+            for address, val in changes['coils']:
+                if address - 1 in self.coils_map:
+                    self.on_coil_changed(address - 1, bool(val))
+            for address, val in changes['di']:
+                if address - 1 in self.di_map:
+                    self.on_di_changed(address - 1, bool(val))
+            # Escala + formatação da tabela inteira numa passada (arrays pré-compilados)
+            for addr, text in self.ir_types.format_batch(self.decode_changes(4, changes['ir'], self.ir_types)):
+                self.set_register_text(self.ir_controls, addr, text)
+            for addr, text in self.hr_types.format_batch(self.decode_changes(3, changes['hr'], self.hr_types)):
+                self.set_register_text(self.hr_controls, addr, text)
         except Exception as e:
             pass  # Ignorar erros de polling
     
+    def decode_changes(self, function_code, changes, types):
+        """[(endereço datastore, word)] -> [(base0, valor tipado)]
+
+        Registradores de uma word decodificam direto da word alterada; os
+        multi-word são relidos inteiros numa leitura consistente.
+        """
+        result = []
+        pending = set()
+        for address, word in changes:
+            addr = types.owner(address - 1)
+            codec = types.codecs.get(addr)
+            if codec is None:
+                continue
+            if codec.count == 1:
+                result.append((addr, codec.decode([word])))
+            else:
+                pending.add(addr)
+        for addr in sorted(pending):
+            codec = types.codecs[addr]
+            words = self.modbus.get_values(function_code, addr + 1, codec.count)
+            if words is not None:
+                result.append((addr, codec.decode(words)))
+        return result
+    
     def closeEvent(self, event):
         try:
             if self.server_running:
                 self.stop_server()
+            self.finish_start_wait()
+            self.modbus.shutdown()
         except Exception as e:
             print(f"⚠️ Erro ao fechar aplicação: {e}")
         finally:
@@ -0,0 +1,88 @@
+"""Recarga do mapa de memória com o servidor rodando - diff entre dois DeviceMap e plano de cópia
+
+`diff_maps()` diz o que entrou, saiu ou mudou em cada tabela e quais words do
+datastore recebem o ValorInicial do novo mapa (registradores novos ou com
+Tipo_de_Dados/ValorInicial alterados); nas demais o valor atual é mantido.
+Quando os segmentos de uma tabela mudam, `migration_plan()` leva as posições
+mantidas do buffer compacto antigo para o novo.
+"""
+from bisect import bisect_left
+
+# (tabela, atributo do DeviceMap, atributo TypedTable ou None para bits)
+TABLES = (('coils', 'coils_map', None), ('di', 'di_map', None),
+          ('ir', 'ir_map', 'ir_types'), ('hr', 'hr_map', 'hr_types'))
+# Campos que mudam o valor guardado; os demais (nome, permissão, resolução...) só mudam regras/exibição
+VALUE_FIELDS = ('tipo_dados', 'valor_inicial')
+
+
+class TableDiff:
+    """Diferença de uma tabela entre dois mapas
+
+    `added`, `removed` e `changed` são base0 ordenados; `reset` são os base0 do
+    novo mapa que voltam ao ValorInicial e `words` os endereços de datastore
+    correspondentes (incluindo as words de registradores removidos ou que
+    mudaram de tamanho).
+    """
+
+    def __init__(self, added, removed, changed, reset, words):
+        self.added = added
+        self.removed = removed
+        self.changed = changed
+        self.reset = reset
+        self.words = words
+
+    def __bool__(self):
+        return bool(self.added or self.removed or self.changed)
+
+    @property
+    def addresses_changed(self):
+        """Conjunto de endereços mudou (a aba precisa ser recriada, não só as linhas)"""
+        return bool(self.added or self.removed)
+
+
+def _word_count(types, addr):
+    return types.codecs[addr].count if types is not None else 1
+
+
+def diff_maps(old, new):
+    """{tabela: TableDiff} entre dois DeviceMap"""
+    result = {}
+    for name, map_attr, types_attr in TABLES:
+        old_map, new_map = getattr(old, map_attr), getattr(new, map_attr)
+        old_types = getattr(old, types_attr) if types_attr else None
+        new_types = getattr(new, types_attr) if types_attr else None
+        added = sorted(new_map.keys() - old_map.keys())
+        removed = sorted(old_map.keys() - new_map.keys())
+        changed = sorted(addr for addr in old_map.keys() & new_map.keys() if old_map[addr] != new_map[addr])
+        revalued = [addr for addr in changed
+                    if any(old_map[addr].get(field) != new_map[addr].get(field) for field in VALUE_FIELDS)]
+        reset = sorted(added + revalued)
+        words = set()
+        for addr in reset:
+            words.update(range(addr + 1, addr + 1 + _word_count(new_types, addr)))
+        for addr in removed + revalued:
+            words.update(range(addr + 1, addr + 1 + _word_count(old_types, addr)))
+        result[name] = TableDiff(added, removed, changed, reset, sorted(words))
+    return result
+
+
+def migration_plan(old_layout, new_layout, skip=()):
+    """[(posição nova, posição antiga, n)] das words mapeadas nos dois layouts, exceto os endereços `skip`"""
+    cuts = sorted(pos for pos in (new_layout.index(addr) for addr in skip) if pos >= 0)
+    plan = []
+    for start, length in new_layout.segments():
+        base = new_layout.index(start)
+        for rel, old_pos, n in old_layout.pieces(start, length):
+            new_pos = base + rel
+            end = new_pos + n
+            i = bisect_left(cuts, new_pos)
+            while i < len(cuts) and cuts[i] < end:
+                cut = cuts[i]
+                if cut > new_pos:
+                    plan.append((new_pos, old_pos, cut - new_pos))
+                old_pos += cut + 1 - new_pos
+                new_pos = cut + 1
+                i += 1
+            if new_pos < end:
+                plan.append((new_pos, old_pos, end - new_pos))
+    return plan
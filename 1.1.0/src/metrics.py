@@ -0,0 +1,147 @@
+"""Endpoint HTTP de métricas (formato texto do Prometheus) no event loop do processo servidor
+
+GET /metrics -> contadores por FC, percentis de latência, conexões, erros de
+framing e escritas no datastore. O custo não depende do tamanho do mapa:
+nada por endereço é exportado (para isso há dump_counters()).
+"""
+import asyncio
+import time
+
+from latency import STAGES
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+QUANTILES = (('0.5', 'p50_us'), ('0.9', 'p90_us'), ('0.99', 'p99_us'))
+# Campos numéricos das estatísticas de conexão somados por servidor (RTU/TCP)
+CONNECTION_FIELDS = (
+    ('requests', 'modbus_emu_connection_requests_total', "Requisições recebidas"),
+    ('exceptions', 'modbus_emu_connection_exceptions_total', "Respostas de exceção enviadas"),
+    ('bytes_in', 'modbus_emu_bytes_received_total', "Bytes recebidos"),
+    ('bytes_out', 'modbus_emu_bytes_sent_total', "Bytes enviados"),
+    ('crc_errors', 'modbus_emu_crc_errors_total', "Quadros RTU descartados por CRC inválido"),
+)
+
+
+class MetricsSource:
+    """O que o endpoint lê: servidores (conexões), contadores, histogramas e tracker do dispositivo principal
+
+    `collect()` roda no event loop (cópia rápida das estatísticas das conexões)
+    e `render()` roda numa thread do executor (percentis dos histogramas), para
+    o scrape não segurar o loop do Modbus.
+    """
+
+    def __init__(self, servers, counters=None, latency=None, tracker=None):
+        self.servers = servers
+        self.counters = counters
+        self.latency = latency
+        self.tracker = tracker
+        self.started_at = time.time()
+
+    def collect(self):
+        snapshot = {}
+        for server in self.servers:
+            totals = dict(server.totals)
+            for stats in server.connections.values():
+                for key, _, _ in CONNECTION_FIELDS:
+                    totals[key] = totals.get(key, 0) + stats.get(key, 0)
+            snapshot[server.label] = (len(server.connections), server.closed_total, totals)
+        return snapshot
+
+    def render(self, snapshot):
+        out = []
+
+        def metric(name, kind, help_text, samples):
+            out.append(f"# HELP {name} {help_text}")
+            out.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                label_text = ','.join(f'{k}="{v}"' for k, v in labels.items())
+                out.append(f"{name}{{{label_text}}} {value}" if label_text else f"{name} {value}")
+
+        metric('modbus_emu_up', 'gauge', "Servidor Modbus rodando", [({}, 1)])
+        metric('modbus_emu_uptime_seconds', 'gauge', "Tempo desde o início do servidor",
+               [({}, f"{time.time() - self.started_at:.3f}")])
+
+        if self.counters is not None:
+            fcs = sorted(self.counters.fc_counts().items())
+            metric('modbus_emu_requests_total', 'counter', "Requisições por function code",
+                   [({'fc': fc}, c['requests']) for fc, c in fcs])
+            metric('modbus_emu_responses_total', 'counter', "Respostas enviadas por function code",
+                   [({'fc': fc}, c['responses']) for fc, c in fcs])
+            metric('modbus_emu_exceptions_total', 'counter', "Respostas de exceção por function code",
+                   [({'fc': fc}, c['exceptions']) for fc, c in fcs])
+
+        if self.latency is not None:
+            merged = self.latency.summary(merge_fcs=True)
+            samples = []
+            for row in merged:
+                for quantile, key in QUANTILES:
+                    samples.append(({'stage': row['stage'], 'quantile': quantile}, f"{row[key] / 1e6:.9f}"))
+            metric('modbus_emu_stage_latency_seconds', 'summary',
+                   f"Latência por estágio ({', '.join(STAGES)})", samples)
+            out.extend(f"modbus_emu_stage_latency_seconds_sum{{stage=\"{row['stage']}\"}} "
+                       f"{row['mean_us'] * row['count'] / 1e6:.9f}" for row in merged)
+            out.extend(f"modbus_emu_stage_latency_seconds_count{{stage=\"{row['stage']}\"}} {row['count']}"
+                       for row in merged)
+
+            per_fc = self.latency.summary(stages=('total',))
+            for row in per_fc:
+                # 'FC03' -> '3', como nos contadores; 'outros' -> 'other'
+                row['fc'] = str(int(row['fc'][2:])) if row['fc'].startswith('FC') else 'other'
+            samples = []
+            for row in per_fc:
+                for quantile, key in QUANTILES:
+                    samples.append(({'fc': row['fc'], 'quantile': quantile}, f"{row[key] / 1e6:.9f}"))
+            metric('modbus_emu_request_latency_seconds', 'summary',
+                   "Quadro recebido -> resposta escrita, por function code", samples)
+            out.extend(f"modbus_emu_request_latency_seconds_count{{fc=\"{row['fc']}\"}} {row['count']}"
+                       for row in per_fc)
+
+        metric('modbus_emu_connections', 'gauge', "Conexões abertas",
+               [({'server': label}, active) for label, (active, _, _) in snapshot.items()])
+        metric('modbus_emu_connections_closed_total', 'counter', "Conexões encerradas (RTU: porta perdida)",
+               [({'server': label}, closed) for label, (_, closed, _) in snapshot.items()])
+        for key, name, help_text in CONNECTION_FIELDS:
+            metric(name, 'counter', help_text,
+                   [({'server': label}, totals.get(key, 0)) for label, (_, _, totals) in snapshot.items()])
+
+        if self.tracker is not None:
+            metric('modbus_emu_datastore_writes_total', 'counter',
+                   "Escritas Modbus no datastore do dispositivo principal", [({}, self.tracker.sequence)])
+
+        out.append('')
+        return '\n'.join(out)
+
+
+async def _handle(source, reader, writer):
+    try:
+        request_line = await asyncio.wait_for(reader.readline(), 5)
+        # Cabeçalhos são ignorados; só precisa consumir até a linha em branco
+        while True:
+            line = await asyncio.wait_for(reader.readline(), 5)
+            if not line or line in (b'\r\n', b'\n'):
+                break
+        parts = request_line.decode('latin-1').split()
+        path = parts[1].split('?', 1)[0] if len(parts) > 1 else ''
+        if len(parts) > 1 and parts[0] == 'GET' and path in ('/', '/metrics'):
+            snapshot = source.collect()
+            body = await asyncio.get_running_loop().run_in_executor(None, source.render, snapshot)
+            status, content_type = "200 OK", CONTENT_TYPE
+        else:
+            body, status, content_type = "not found\n", "404 Not Found", "text/plain; charset=utf-8"
+        data = body.encode('utf-8')
+        writer.write(f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\n"
+                     f"Content-Length: {len(data)}\r\nConnection: close\r\n\r\n".encode('latin-1') + data)
+        await writer.drain()
+    except (asyncio.TimeoutError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+
+async def start_metrics(source, address):
+    """Abre o servidor HTTP em `address` (host, porta) - erro de bind sobe para quem chamou
+
+    Devolve o asyncio.Server já escutando; `serve_forever()` mantém até o processo acabar.
+    """
+    server = await asyncio.start_server(lambda r, w: _handle(source, r, w), address[0], address[1])
+    print(f"[PROCESSO] Métricas em http://{address[0]}:{address[1]}/metrics")
+    return server
@@ -0,0 +1,219 @@
+"""Handler de requisições do emulador - valida no contexto antes de tocar no datastore"""
+import time
+from functools import partial
+from time import perf_counter_ns
+from pymodbus.server.async_io import ModbusServerRequestHandler, ModbusSerialServer, ModbusTcpServer
+from rtu_timing import TurnaroundScheduler
+
+
+class EmulatorRequestHandler(ModbusServerRequestHandler):
+    """Consulta `context.check_request(request)` e responde com exceção Modbus se recusada
+
+    Cada conexão (cliente TCP ou a porta serial) mantém suas estatísticas em
+    `stats` e se registra em `server.connections` enquanto estiver aberta.
+    Se o servidor tiver uma TurnaroundPolicy (`server.turnaround`), as
+    respostas passam pelo TurnaroundScheduler e o turnaround medido fica em
+    `stats['turnaround']`.
+
+    Com `server.latency` (LatencyRecorder) cada requisição leva uma lista de
+    carimbos perf_counter_ns() por estágio: quadro lido (_recv_), execute,
+    validação, task do datastore (_async_execute), encode e write.
+
+    Framers que contam erros (FastRtuFramer.errors) gravam direto em `stats`.
+    Contexto, contadores e o LatencyRecorder são lidos do servidor a cada
+    requisição: a recarga do mapa troca os dois primeiros sem derrubar as
+    conexões abertas, e o handler da porta serial nasce antes de o servidor
+    receber o recorder.
+    """
+
+    def __init__(self, owner):
+        super().__init__(owner)
+        self.stats = {
+            'peer': None,
+            'connected_at': time.time(),
+            'requests': 0,
+            'exceptions': 0,
+            'bytes_in': 0,
+            'bytes_out': 0,
+        }
+        policy = getattr(owner, 'turnaround', None)
+        self.scheduler = TurnaroundScheduler(policy) if policy is not None else None
+        if self.scheduler is not None:
+            self.stats['turnaround'] = self.scheduler.stats
+        self._t_frame = 0
+        self._stamps = None
+
+    def callback_connected(self):
+        super().callback_connected()
+        framer = getattr(self, 'framer', None)
+        if isinstance(getattr(framer, 'errors', None), dict):
+            self.stats.update(framer.errors)
+            framer.errors = self.stats
+        transport = getattr(self, 'transport', None)
+        if transport is not None:
+            peer = transport.get_extra_info('peername')
+            self.stats['peer'] = f"{peer[0]}:{peer[1]}" if isinstance(peer, tuple) else str(peer or 'serial')
+        register = getattr(self.server, 'connection_opened', None)
+        if register:
+            register(self)
+
+    def callback_disconnected(self, call_exc):
+        super().callback_disconnected(call_exc)
+        unregister = getattr(self.server, 'connection_closed', None)
+        if unregister:
+            unregister(self)
+
+    def callback_data(self, data, addr=()):
+        self.stats['bytes_in'] += len(data)
+        if self.scheduler is not None:
+            self.scheduler.received()
+        return super().callback_data(data, addr)
+
+    async def _recv_(self):
+        data = await super()._recv_()
+        self._t_frame = perf_counter_ns()
+        return data
+
+    def send(self, data, *args, **kwargs):
+        if isinstance(data, (bytes, bytearray)):
+            self.stats['bytes_out'] += len(data)
+            stamps = self._stamps
+            if stamps is not None:
+                self._stamps = None
+                stamps[6] = perf_counter_ns()
+            if self.scheduler is not None:
+                self.scheduler.schedule(data, partial(self._write, stamps, *args, **kwargs))
+                return None
+            return self._write(stamps, data, *args, **kwargs)
+        return super().send(data, *args, **kwargs)
+
+    def _write(self, stamps, data, *args, **kwargs):
+        if stamps is None:
+            return super().send(data, *args, **kwargs)
+        stamps[7] = perf_counter_ns()
+        result = super().send(data, *args, **kwargs)
+        stamps[8] = perf_counter_ns()
+        self.server.latency.add(stamps)
+        return result
+
+    def server_send(self, message, addr, **kwargs):
+        if self._stamps is not None:
+            self._stamps[5] = perf_counter_ns()
+        error = getattr(message, 'isError', lambda: False)()
+        if error:
+            self.stats['exceptions'] += 1
+        counters = getattr(self.server, 'counters', None)
+        if counters is not None:
+            fc = message.function_code & 0x7F
+            counters.responses[fc] += 1
+            if error:
+                counters.exceptions[fc] += 1
+        return super().server_send(message, addr, **kwargs)
+
+    async def _async_execute(self, request, *addr):
+        # Roda sem suspender até o server_send (datastore síncrono), então
+        # _stamps ainda é desta requisição quando a resposta for montada
+        stamps = getattr(request, 'latency_stamps', None)
+        if stamps is not None:
+            stamps[4] = perf_counter_ns()
+        self._stamps = stamps
+        return await super()._async_execute(request, *addr)
+
+    def execute(self, request, *addr):
+        self.stats['requests'] += 1
+        counters = getattr(self.server, 'counters', None)
+        if counters is not None:
+            counters.requests[request.function_code & 0xFF] += 1
+        stamps = None
+        if getattr(self.server, 'latency', None) is not None:
+            stamps = [request.function_code, self._t_frame, perf_counter_ns(), 0, 0, 0, 0, 0, 0]
+        check = getattr(self.server.context, 'check_request', None)
+        code = check(request) if check else None
+        if stamps is not None:
+            # Próximo quadro da mesma leitura começa a decodificar agora
+            stamps[3] = self._t_frame = perf_counter_ns()
+        if code is None:
+            request.latency_stamps = stamps
+            return super().execute(request, *addr)
+
+        self._stamps = stamps
+        response = request.doException(code)
+        response.transaction_id = request.transaction_id
+        response.slave_id = request.slave_id
+        # pymodbus 3.6 renomeou send() -> server_send()
+        send = getattr(self, 'server_send', None)
+        if send is None:
+            self.stats['exceptions'] += 1
+            send = self.send
+        send(response, *addr)
+
+
+class ConnectionRegistry:
+    """Mixin de servidor: conexões abertas e estatísticas por conexão"""
+
+    def _init_registry(self, label):
+        self.label = label
+        self.latency = None
+        self.counters = None
+        self.connections = {}
+        self.closed = []
+        self.closed_total = 0
+        self.totals = {}
+        self.stats_version = 0
+
+    def connection_opened(self, handler):
+        self.connections[id(handler)] = handler.stats
+        self.stats_version += 1
+        print(f"🔌 [{self.label}] Conexão aberta: {handler.stats['peer']} ({len(self.connections)} ativa(s))")
+
+    def connection_closed(self, handler):
+        if self.connections.pop(id(handler), None) is None:
+            return
+        stats = handler.stats
+        self.closed = (self.closed + [dict(stats)])[-32:]
+        self.closed_total += 1
+        # Acumulado das conexões encerradas (o histórico `closed` é limitado)
+        for key, value in stats.items():
+            if isinstance(value, int):
+                self.totals[key] = self.totals.get(key, 0) + value
+        self.stats_version += 1
+        duration = time.time() - stats['connected_at']
+        print(f"🔌 [{self.label}] Conexão fechada: {stats['peer']} | {duration:.1f}s | "
+              f"{stats['requests']} req | {stats['exceptions']} exc | "
+              f"{stats['bytes_in']} B in / {stats['bytes_out']} B out")
+        timing = stats.get('turnaround')
+        if timing and timing['sent']:
+            print(f"⏱️ [{self.label}] Turnaround {timing['mode']}: média {timing['avg_ms']:.2f} ms | "
+                  f"{timing['min_ms']:.2f}..{timing['max_ms']:.2f} ms | {timing['late']} atrasada(s)")
+
+    def connection_stats(self):
+        """Lista de estatísticas (cópias) das conexões abertas, marcadas com a origem"""
+        return [dict(stats, server=self.label, active=True) for stats in self.connections.values()] + \
+               [dict(stats, server=self.label, active=False) for stats in self.closed]
+
+
+class EmulatorSerialServer(ConnectionRegistry, ModbusSerialServer):
+    """ModbusSerialServer usando EmulatorRequestHandler
+
+    `turnaround` (TurnaroundPolicy) define quando as respostas saem; None
+    responde assim que a requisição é processada, como o pymodbus.
+    """
+
+    def __init__(self, *args, turnaround=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._init_registry('RTU')
+        self.turnaround = turnaround
+
+    def callback_new_connection(self):
+        return EmulatorRequestHandler(self)
+
+
+class EmulatorTcpServer(ConnectionRegistry, ModbusTcpServer):
+    """ModbusTcpServer usando EmulatorRequestHandler - vários clientes no mesmo event loop"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._init_registry('TCP')
+
+    def callback_new_connection(self):
+        return EmulatorRequestHandler(self)
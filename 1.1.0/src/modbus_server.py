@@ -8,16 +8,16 @@ import warnings
 warnings.filterwarnings('ignore', category=RuntimeWarning, message='coroutine.*was never awaited')
 warnings.filterwarnings('ignore', message='Task was destroyed but it is pending')
 from pymodbus.server.async_io import StartSerialServer
-from pymodbus.datastore import ModbusSlaveContext, ModbusServerContext, ModbusSequentialDataBlock
+from pymodbus.datastore import ModbusSlaveContext, ModbusServerContext
 from pymodbus.transaction import ModbusRtuFramer
+from segmented_store import SegmentedDataBlock
 
 
-class EventDrivenDataBlock(ModbusSequentialDataBlock):
-    """DataBlock com callbacks para notificação imediata de mudanças"""
-    def __init__(self, address, values, callback=None):
-        super().__init__(address, values)
+class EventDrivenDataBlock(SegmentedDataBlock):
+    """DataBlock segmentado com callbacks para notificação imediata de mudanças"""
+    def __init__(self, table, callback=None):
+        super().__init__(table.layout, list(table.values))
         self.callback = callback
-        self.base_address = address
     
     def setValues(self, address, values):
         super().setValues(address, values)
@@ -45,12 +45,12 @@ class ModbusServer:
     def create_datastore(self, coils_data, di_data, ir_data, hr_data, 
                         coil_callback=None, di_callback=None, 
                         ir_callback=None, hr_callback=None):
-        """Cria datastore com callbacks"""
+        """Cria datastore com callbacks a partir de SegmentedTable"""
         self.store = ModbusSlaveContext(
-            co=EventDrivenDataBlock(0, coils_data, coil_callback),
-            di=EventDrivenDataBlock(0, di_data, di_callback),
-            ir=EventDrivenDataBlock(0, ir_data, ir_callback),
-            hr=EventDrivenDataBlock(0, hr_data, hr_callback)
+            co=EventDrivenDataBlock(coils_data, coil_callback),
+            di=EventDrivenDataBlock(di_data, di_callback),
+            ir=EventDrivenDataBlock(ir_data, ir_callback),
+            hr=EventDrivenDataBlock(hr_data, hr_callback)
         )
         return self.store
     
@@ -178,3 +178,34 @@ class ModbusServer:
         if self.store:
             return self.store.getValues(function_code, address, 1)[0]
         return None
+    
+    def set_values(self, function_code, start, values):
+        """Define faixa de valores"""
+        if self.store:
+            self.store.setValues(function_code, start, list(values))
+    
+    def get_values(self, function_code, start, count):
+        """Obtém faixa de valores"""
+        if self.store:
+            return self.store.getValues(function_code, start, count)
+        return None
+    
+    def apply_batch(self, writes):
+        """Aplica [(function_code, start, values), ...] de forma atômica para o mestre
+
+        Com o servidor rodando, o lote executa dentro do event loop do servidor,
+        entre duas requisições.
+        """
+        if not self.store:
+            return
+        
+        def apply():
+            for function_code, start, values in writes:
+                self.store.setValues(function_code, start, list(values))
+        
+        if self.running and self.server_loop and self.server_loop.is_running():
+            async def apply_in_loop():
+                apply()
+            asyncio.run_coroutine_threadsafe(apply_in_loop(), self.server_loop).result(timeout=2)
+        else:
+            apply()
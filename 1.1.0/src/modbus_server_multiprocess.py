@@ -1,114 +1,246 @@
 """Servidor Modbus com multiprocessing - comunicação bidirecional + kill instantâneo"""
 import multiprocessing as mp
+from multiprocessing.connection import wait as wait_objects
 import asyncio
+import io
+import logging
+import pickle
+import queue
+import signal
+import socket
+import threading
 import time
 import sys
-from pymodbus.server.async_io import ModbusSerialServer
-from pymodbus.datastore import ModbusSlaveContext, ModbusServerContext, ModbusSequentialDataBlock
-from pymodbus.transaction import ModbusRtuFramer
-from pymodbus.pdu import ExceptionResponse
+from pymodbus.datastore import ModbusSlaveContext, ModbusServerContext
+from pymodbus.transaction import ModbusSocketFramer
+from fast_rtu import rtu_framer as resolve_rtu_framer
+from modbus_handler import EmulatorSerialServer, EmulatorTcpServer
+from permissions import DeviceRules
+from segmented_store import SegmentedDataBlock
+from shared_tables import SharedArena, SharedBitTable, SharedRegisterTable, ChangeTracker
+from virtual_serial import PtyLoopback, PTY_PORT
+from rtu_timing import TurnaroundPolicy
+from latency import LatencyHistograms, LatencyRecorder
+from counters import RequestCounters, count_access, dump as dump_counters
+from metrics import MetricsSource, start_metrics
+from map_reload import migration_plan
+from signal_engine import SignalEngine
 
+log = logging.getLogger(__name__)
 
 
-class SharedDataBlock(ModbusSequentialDataBlock):
-    """DataBlock que sincroniza com shared array"""
-    def __init__(self, address, values, shared_array):
-        super().__init__(address, values)
+class SharedDataBlock(SegmentedDataBlock):
+    """DataBlock segmentado lendo/escrevendo direto no shared array compacto
+
+    Escritas vindas do Modbus marcam as posições no ChangeTracker dentro da
+    mesma seção de escrita, para a GUI repintar só o que mudou. Com `hits`
+    (array de diferenças do RequestCounters) cada leitura/escrita conta um
+    acesso por trecho mapeado.
+    """
+    def __init__(self, name, layout, shared_array, tracker=None, hits=None):
+        super().__init__(layout, shared_array)
+        self.name = name
         self.shared_array = shared_array
-        for i, val in enumerate(values):
-            if i < len(shared_array):
-                shared_array[i] = val
-    
-    def setValues(self, address, values):
-        super().setValues(address, values)
-        for i, val in enumerate(values):
-            idx = address + i
-            if idx < len(self.shared_array):
-                self.shared_array[idx] = val
+        self.tracker = tracker
+        self.hits = hits
     
     def getValues(self, address, count=1):
-        for i in range(count):
-            idx = address + i
-            if idx < len(self.shared_array):
-                self.values[idx] = self.shared_array[idx]
-        return super().getValues(address, count)
+        pieces = self.layout.pieces(address, count)
+        if self.hits is not None:
+            count_access(self.hits, pieces)
+        return self.shared_array.read_pieces(pieces, count)
+    
+    def setValues(self, address, values):
+        if not isinstance(values, list):
+            values = [values]
+        pieces = self.layout.pieces(address, len(values))
+        if not pieces:
+            return
+        if self.hits is not None:
+            count_access(self.hits, pieces)
+        self.shared_array.begin_write()
+        try:
+            for rel, pos, n in pieces:
+                self.shared_array.store(pos, values[rel:rel + n])
+            if self.tracker:
+                self.tracker.mark(self.name, pieces)
+        finally:
+            self.shared_array.end_write()
+        if self.tracker:
+            self.tracker.notify()
 
 class CustomModbusServerContext(ModbusServerContext):
-    """Context customizado que valida permissões"""
-    def __init__(self, slaves, single, permissions, allowed_fcs):
+    """Context customizado que valida cada requisição com as DeviceRules do unit ID (dict, O(1))"""
+    def __init__(self, slaves, single, rules):
         super().__init__(slaves=slaves, single=single)
-        self.permissions = permissions
-        self.allowed_fcs = allowed_fcs
+        self.rules = rules
     
-    def setValues(self, unit, fx, address, values):
-        """Intercepta escritas e valida permissões"""
-        # LOG DETALHADO - Descomente para debug
-        # print(f"\n📨 WRITE: Unit={unit}, FC={fx}, Addr={address}, Values={values}")
-        
-        fc_to_type = {1: 'coils', 5: 'coils', 15: 'coils', 6: 'hr', 16: 'hr'}
-        reg_type = fc_to_type.get(fx)
-        
-        if reg_type:
-            perms = self.permissions.get(reg_type, {})
-            
-            for i in range(len(values)):
-                addr = address + i
-                perm = perms.get(addr, 'R/W').upper()
-                # print(f"  → Addr {addr}: Permissão={perm}")
-                
-                if 'W' not in perm:
-                    print(f"❌ BLOQUEADO: Escrita em endereço {addr} somente leitura (Permissão: {perm})")
-                    return None
-            
-            # print(f"  ✅ PERMITIDO\n")
-        
-        return super().setValues(unit, fx, address, values)
+    def check_request(self, request):
+        """Chamado pelo EmulatorRequestHandler antes do datastore - retorna código de exceção ou None"""
+        rules = self.rules.get(request.slave_id)
+        return rules.check(request) if rules is not None else None
 
-def run_modbus_server(port, baudrate, bytesize, parity, stopbits, slave_id, 
-                      coils_array, di_array, ir_array, hr_array,
-                      coils_perm, di_perm, ir_perm, hr_perm,
-                      coils_fcs, di_fcs, ir_fcs, hr_fcs):
-    """Função executada no processo separado"""
+class DeviceTables:
+    """O que o processo servidor recebe de cada slave ID: layouts, tabelas compartilhadas e regras
+
+    Layouts e regras são os mesmos objetos para dispositivos clonados do mesmo
+    mapa (o pickle do mp.Process os serializa uma vez só); apenas as tabelas
+    em shared memory são próprias de cada dispositivo. `signals` é o
+    SignalPlan do mapa (None = valores estáticos).
+    """
+    def __init__(self, slave_id, layouts, arrays, rules, tracker=None, counters=None, signals=None):
+        self.slave_id = slave_id
+        self.layouts = layouts
+        self.arrays = arrays
+        self.rules = rules
+        self.tracker = tracker
+        self.counters = counters
+        self.signals = signals
+    
+    def slave_context(self):
+        def block(name):
+            hits = self.counters.table(self.slave_id, name) if self.counters is not None else None
+            return SharedDataBlock(name, self.layouts[name], self.arrays[name], self.tracker, hits)
+        return ModbusSlaveContext(co=block('coils'), di=block('di'), ir=block('ir'), hr=block('hr'))
+
+def build_context(devices):
+    """Context com um ModbusSlaveContext por slave ID sobre as tabelas compartilhadas
+
+    O primeiro dispositivo responde também no unit ID 0; permissões e FCs já
+    vêm compilados nas DeviceRules.
+    """
+    primary = devices[0]
+    slaves = {device.slave_id: device.slave_context() for device in devices}
+    rules = {device.slave_id: device.rules for device in devices}
+    slaves[0] = slaves[primary.slave_id]
+    rules[0] = primary.rules
+    return CustomModbusServerContext(slaves=slaves, single=False, rules=rules)
+
+def start_signals(devices, write_lock, rate):
+    """SignalEngine rodando no event loop atual (None se nenhum dispositivo tiver geradores ou sem numpy)"""
+    if not any(device.signals is not None for device in devices):
+        return None
+    try:
+        engine = SignalEngine(devices, write_lock, rate)
+    except RuntimeError as e:
+        log.warning("Geradores de sinal: %s", e)
+        return None
+    engine.task = asyncio.get_running_loop().create_task(engine.run())
+    print(f"[PROCESSO] Sinais: {engine.count} registrador(es) a {engine.rate:g} Hz")
+    return engine
+
+def run_modbus_server(port, baudrate, bytesize, parity, stopbits, devices, notify_socket,
+                      transport='rtu', tcp_address=None, stats_queue=None, rtu_framer='fast',
+                      turnaround=None, latency=None, metrics_address=None, ready=None, open_timeout=0.0,
+                      commands=None, write_lock=None, signal_rate=10.0):
+    """Função executada no processo separado
+
+    `devices` é a lista de DeviceTables; o primeiro é o dispositivo da GUI
+    (recebe o ChangeTracker e responde também no unit ID 0).
+    `transport` é 'rtu', 'tcp' ou 'rtu+tcp': os servidores compartilham o mesmo
+    contexto (datastore + permissões) e o mesmo event loop.
+    `rtu_framer` escolhe o framer RTU: 'fast' (FastRtuFramer) ou 'pymodbus'.
+    `turnaround` (TurnaroundPolicy) agenda as respostas RTU; None = asap sem medição.
+    `latency` (LatencyHistograms em shared memory) recebe os tempos por estágio/FC.
+    `metrics_address` (host, porta) liga o endpoint HTTP /metrics; None = desligado.
+    `ready` (ponta de escrita de um socketpair) recebe ('ready', pid) depois que
+    as portas abriram ou ('error', mensagem) se alguma falhar.
+    `open_timeout` > 0 insiste na abertura (backoff exponencial) enquanto a porta
+    ainda estiver presa ao processo anterior - usado no restart().
+    `commands` (ponta do pipe de comando) recebe recargas do mapa com o
+    servidor rodando, aplicadas no event loop entre requisições (ver swap_devices()),
+    e o pedido de parada ('stop',) - também atendido por SIGTERM no POSIX.
+    `signal_rate` (1 a 1000 Hz) é a cadência dos geradores de sinal dos
+    dispositivos que têm SignalPlan, calculados no mesmo event loop.
+    """
+    primary = devices[0]
+    
+    # Socket para acordar a GUI quando o Modbus escrever (coalescido pelo tracker)
+    if notify_socket is not None:
+        notify_socket.setblocking(False)
+        primary.tracker.notify_socket = notify_socket
     
     async def start_server():
-        # Criar datablocks compartilhados
-        store = ModbusSlaveContext(
-            co=SharedDataBlock(0, list(coils_array), coils_array),
-            di=SharedDataBlock(0, list(di_array), di_array),
-            ir=SharedDataBlock(0, list(ir_array), ir_array),
-            hr=SharedDataBlock(0, list(hr_array), hr_array)
-        )
+        context = build_context(devices)
+        slave_id = ', '.join(str(device.slave_id) for device in devices)
         
-        # Context customizado com permissões e FCs
-        permissions = {
-            'coils': coils_perm,
-            'di': di_perm,
-            'ir': ir_perm,
-            'hr': hr_perm
-        }
-        allowed_fcs = {
-            'coils': coils_fcs,
-            'di': di_fcs,
-            'ir': ir_fcs,
-            'hr': hr_fcs
-        }
-        context = CustomModbusServerContext(slaves={slave_id: store, 0: store}, single=False, permissions=permissions, allowed_fcs=allowed_fcs)
-        
-        print(f"[PROCESSO] Servidor Modbus iniciado em {port} @ {baudrate} bps | Slave ID: {slave_id}")
-        
-        # Criar servidor dentro de função async
-        server = ModbusSerialServer(
-            context=context,
-            framer=ModbusRtuFramer,
-            port=port,
-            baudrate=baudrate,
-            bytesize=bytesize,
-            parity=parity,
-            stopbits=stopbits,
-            timeout=1
-        )
+        # Criar servidores dentro de função async
+        servers = []
+        if 'rtu' in transport:
+            framer = resolve_rtu_framer(rtu_framer)
+            servers.append(EmulatorSerialServer(
+                context=context,
+                framer=framer,
+                port=port,
+                baudrate=baudrate,
+                bytesize=bytesize,
+                parity=parity,
+                stopbits=stopbits,
+                timeout=1,
+                turnaround=turnaround
+            ))
+            timing = f" | Turnaround: {turnaround.describe()}" if turnaround is not None else ""
+            print(f"[PROCESSO] Servidor Modbus RTU iniciado em {port} @ {baudrate} bps | Slave ID: {slave_id} | Framer: {framer.__name__}{timing}")
+        if 'tcp' in transport:
+            servers.append(EmulatorTcpServer(
+                context=context,
+                framer=ModbusSocketFramer,
+                address=tcp_address
+            ))
+            print(f"[PROCESSO] Servidor Modbus TCP iniciado em {tcp_address[0]}:{tcp_address[1]} | Slave ID: {slave_id}")
+        
+        # Antes de abrir as portas: o handler RTU nasce dentro do open_server()
+        recorder = LatencyRecorder(latency) if latency is not None else None
+        for server in servers:
+            server.counters = primary.counters
+            server.latency = recorder
+        
+        # Abrir as portas antes de avisar a GUI: o erro concreto (porta ocupada,
+        # inexistente, endereço em uso) vai pelo socket do handshake em vez de só um log
+        metrics_server = None
+        source = None
+        label = None
+        try:
+            for server in servers:
+                label = server.label
+                await open_server(server, open_timeout)
+            if metrics_address is not None:
+                label = 'Métricas'
+                source = MetricsSource(servers, counters=primary.counters, latency=latency, tracker=primary.tracker)
+                metrics_server = await start_metrics(source, metrics_address)
+        except Exception as e:
+            report_ready(ready, 'error', f"{label}: {e}")
+            return
+        report_ready(ready, 'ready', mp.current_process().pid)
+        
+        lock = write_lock if write_lock is not None else primary.arrays['ir'].lock
+        signals = start_signals(devices, lock, signal_rate)
+        loop = asyncio.get_running_loop()
+        stopped = loop.create_future()
+        live = {'devices': devices, 'source': source, 'signals': signals, 'signal_rate': signal_rate,
+                'stopped': stopped}
+        if commands is not None:
+            watch_commands(commands, handle_command, write_lock, servers, live, notify_socket)
+        try:
+            loop.add_signal_handler(signal.SIGTERM, request_stop, stopped)
+        except (NotImplementedError, RuntimeError):
+            pass  # Windows: terminate() encerra na hora
         
-        await server.serve_forever()
+        tasks = [server.serving for server in servers]
+        if metrics_server is not None:
+            tasks.append(metrics_server.serve_forever())
+        if recorder is not None:
+            tasks.append(recorder.run())
+        if stats_queue is not None:
+            tasks.append(publish_connection_stats(servers, stats_queue))
+        serving = asyncio.gather(*tasks)
+        await asyncio.wait([serving, stopped], return_when=asyncio.FIRST_COMPLETED)
+        if not stopped.done():
+            serving.result()
+            return
+        await shutdown_server(servers, metrics_server, serving, live)
+        if stats_queue is not None:
+            stats_queue.cancel_join_thread()
     
     # Criar novo event loop para o processo filho
     loop = asyncio.new_event_loop()
@@ -121,46 +253,419 @@ def run_modbus_server(port, baudrate, bytesize, parity, stopbits, slave_id,
     finally:
         loop.close()
 
+def request_stop(stopped):
+    if not stopped.done():
+        stopped.set_result(None)
+
+async def shutdown_server(servers, metrics_server, serving, live):
+    """Parada pedida pela GUI: fecha portas, geradores e tabelas e deixa o processo sair
+
+    Roda no event loop, fora de qualquer seção de escrita - o lock de escrita
+    e os contadores seqlock ficam em ordem para o próximo processo.
+    """
+    if live['signals'] is not None:
+        live['signals'].close()
+    for server in servers:
+        await server.shutdown()
+    if metrics_server is not None:
+        metrics_server.close()
+    serving.cancel()
+    await asyncio.gather(serving, return_exceptions=True)
+    for device in live['devices']:
+        for table in device.arrays.values():
+            table.close()
+    primary = live['devices'][0]
+    for shared in (primary.tracker, primary.counters):
+        if shared is not None:
+            shared.close()
+
+def watch_commands(commands, handler, *args):
+    """Lê o pipe de comando numa thread e roda `handler(data, commands, *args)` no event loop
+
+    O event loop Proactor (padrão no Windows) não tem add_reader(): a thread
+    só bloqueia em recv_bytes() e entrega cada mensagem com
+    call_soon_threadsafe, então o comando roda entre duas requisições.
+    """
+    loop = asyncio.get_running_loop()
+    
+    def reader():
+        while True:
+            try:
+                data = commands.recv_bytes()
+            except (EOFError, OSError):
+                return
+            try:
+                loop.call_soon_threadsafe(handler, data, commands, *args)
+            except RuntimeError:
+                return  # Event loop já fechado
+    
+    threading.Thread(target=reader, name="modbus-commands", daemon=True).start()
+
+def handle_command(data, commands, write_lock, servers, live, notify_socket):
+    """Mensagem do pipe de comando
+
+    ('reload', devices, migrations) é respondida com ('reloaded', n) ou
+    ('error', msg); ('stop',) encerra o servidor sem resposta (o processo sai).
+    """
+    try:
+        message = _LockUnpickler(io.BytesIO(data), write_lock).load()
+        if message[0] == 'stop':
+            request_stop(live['stopped'])
+            return
+        kind, devices, migrations = message
+        if kind != 'reload':
+            raise ValueError(f"comando desconhecido: {kind!r}")
+        swap_devices(servers, live, devices, migrations, notify_socket, write_lock)
+        reply = ('reloaded', len(devices))
+        print(f"[PROCESSO] Mapa recarregado | {len(migrations)} tabela(s) migrada(s)")
+    except Exception as e:
+        reply = ('error', str(e))
+    try:
+        commands.send(reply)
+    except OSError:
+        pass
+
+def swap_devices(servers, live, devices, migrations, notify_socket, write_lock):
+    """Troca o contexto (tabelas, regras, contadores, tracker, sinais) de todos os servidores de uma vez
+
+    Roda num callback do event loop, então nenhuma requisição fica no meio:
+    a anterior usou o contexto velho inteiro e a próxima usa o novo. Cada
+    migração (slave_id, tabela, plano) copia os valores mantidos da tabela
+    atual para a nova sob o lock de escrita (a GUI também escreve nele).
+    """
+    current = {device.slave_id: device for device in live['devices']}
+    incoming = {device.slave_id: device for device in devices}
+    with write_lock:
+        for sid, name, plan in migrations:
+            source, target = current[sid].arrays[name], incoming[sid].arrays[name]
+            target.open_write()
+            try:
+                for new_pos, old_pos, n in plan:
+                    target.store(new_pos, source.load(old_pos, n))
+            finally:
+                target.close_write()
+    
+    primary = devices[0]
+    if notify_socket is not None:
+        primary.tracker.notify_socket = notify_socket
+    context = build_context(devices)
+    for server in servers:
+        server.context = context
+        server.counters = primary.counters
+    if live['source'] is not None:
+        live['source'].counters = primary.counters
+        live['source'].tracker = primary.tracker
+    # Geradores passam para as tabelas novas antes de as antigas serem fechadas
+    if live['signals'] is not None:
+        live['signals'].bind(devices)
+    else:
+        live['signals'] = start_signals(devices, write_lock, live['signal_rate'])
+    
+    # Os objetos antigos só mapeiam os blocos (quem remove os que saíram é a GUI)
+    previous = live['devices']
+    live['devices'] = devices
+    for device in previous:
+        for table in device.arrays.values():
+            table.close()
+    if previous[0].tracker is not None:
+        previous[0].tracker.close()
+    if previous[0].counters is not None:
+        previous[0].counters.close()
+
+async def open_server(server, timeout=0.0):
+    """listen() do pymodbus sem engolir a exceção (ele só devolve False e loga)
+
+    Com `timeout`, repete a abertura de 2 ms em 2 ms dobrando (até 250 ms)
+    enquanto der OSError, por no máximo `timeout` segundos.
+    """
+    server.is_closing = False
+    deadline = time.monotonic() + timeout
+    delay = 0.002
+    while True:
+        try:
+            transport = await server.call_create()
+            break
+        except OSError:
+            if time.monotonic() + delay > deadline:
+                raise
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 0.25)
+    server.transport = transport[0] if isinstance(transport, tuple) else transport
+
+
+def report_ready(ready, status, detail):
+    """Manda o resultado da inicialização pelo socket (uma mensagem só) e fecha a ponta - o EOF delimita"""
+    if ready is None:
+        return
+    try:
+        ready.sendall(pickle.dumps((status, detail)))
+    except OSError:
+        pass
+    ready.close()
+
+
+async def publish_connection_stats(servers, stats_queue, interval=1.0):
+    """Envia ao processo da GUI as estatísticas por conexão sempre que mudarem"""
+    last = None
+    while True:
+        await asyncio.sleep(interval)
+        version = tuple(server.stats_version for server in servers)
+        active = any(server.connections for server in servers)
+        if version == last and not active:
+            continue
+        last = version
+        snapshot = [stats for server in servers for stats in server.connection_stats()]
+        # Fila de 1 posição: mantém só o snapshot mais recente
+        try:
+            stats_queue.put_nowait(snapshot)
+        except queue.Full:
+            try:
+                stats_queue.get_nowait()
+            except queue.Empty:
+                pass
+            try:
+                stats_queue.put_nowait(snapshot)
+            except queue.Full:
+                pass
+
+class _LockPickler(pickle.Pickler):
+    """Pickle que troca o lock de escrita por uma referência (Lock só passa por herança)"""
+
+    def __init__(self, file, lock):
+        super().__init__(file, pickle.HIGHEST_PROTOCOL)
+        self.lock = lock
+
+    def persistent_id(self, obj):
+        return 'write_lock' if obj is self.lock else None
+
+
+class _LockUnpickler(pickle.Unpickler):
+    def __init__(self, file, lock):
+        super().__init__(file)
+        self.lock = lock
+
+    def persistent_load(self, pid):
+        if pid != 'write_lock':
+            raise pickle.UnpicklingError(f"referência desconhecida: {pid!r}")
+        return self.lock
+
+
+def standby_main(commands, write_lock, notify_socket, stats_queue, ready):
+    """Processo reserva: parado no pipe até receber os argumentos de run_modbus_server"""
+    try:
+        data = commands.recv_bytes()
+    except (EOFError, OSError):
+        commands.close()
+        return  # Reserva descartada sem uso
+    kwargs = _LockUnpickler(io.BytesIO(data), write_lock).load()
+    run_modbus_server(notify_socket=notify_socket, stats_queue=stats_queue, ready=ready,
+                      commands=commands, write_lock=write_lock, **kwargs)
+
+
+class StandbyWorker:
+    """Processo servidor pré-criado (imports feitos), que assume a porta quando `launch()` é chamado
+
+    O que só passa por herança (lock de escrita, socket de notificação, fila de
+    estatísticas, socket do handshake) vai na criação; porta, dispositivos
+    (tabelas em shared memory, reabertas pelo nome) e demais opções vão pelo
+    pipe de comando, que continua aberto para as recargas do mapa. Quem assume
+    fica com `process`, `commands`, `notify_reader`, `notify_writer`,
+    `stats_queue` e `ready_reader`.
+
+    O handshake usa um socketpair, como as notificações: no Windows a ponta de
+    um mp.Pipe é um named pipe, que o QSocketNotifier da GUI não observa.
+    """
+
+    def __init__(self, write_lock):
+        self.write_lock = write_lock
+        self.notify_reader, self.notify_writer = socket.socketpair()
+        self.notify_reader.setblocking(False)
+        self.stats_queue = mp.Queue(maxsize=1)
+        self.ready_reader, ready_writer = socket.socketpair()
+        self.ready_reader.setblocking(False)
+        commands, self.commands = mp.Pipe()
+        self.process = mp.Process(
+            target=standby_main,
+            args=(commands, write_lock, self.notify_writer, self.stats_queue, ready_writer),
+            name="modbus-server",
+            daemon=True
+        )
+        self.process.start()
+        # Só o filho fica com estas pontas: se ele morrer, ready_reader dá EOF
+        commands.close()
+        ready_writer.close()
+    
+    def alive(self):
+        return self.process.is_alive() and not self.commands.closed
+    
+    def launch(self, **kwargs):
+        """Envia os argumentos de run_modbus_server (exceto socket, fila e pipe, que o processo já tem)"""
+        buffer = io.BytesIO()
+        _LockPickler(buffer, self.write_lock).dump(kwargs)
+        self.commands.send_bytes(buffer.getvalue())
+    
+    def close(self):
+        """Descarta uma reserva não usada"""
+        if not self.commands.closed:
+            self.commands.close()
+        if self.process.is_alive():
+            self.process.kill()
+        self.process.join(timeout=2)
+        for sock in (self.notify_reader, self.notify_writer, self.ready_reader):
+            sock.close()
+        self.stats_queue.cancel_join_thread()
+        self.stats_queue.close()
+
 class ModbusServerMultiprocess:
     """Servidor Modbus com multiprocessing - melhor dos dois mundos"""
     
+    FC_TABLES = {1: 'coils', 2: 'di', 3: 'hr', 4: 'ir'}
+    # Espera por etapa da parada (pedido pelo pipe, depois terminate) antes do kill
+    GRACEFUL_STOP_TIMEOUT = 1.0
+    
     def __init__(self):
         self.process = None
         self.running = False
         self.store = None
+        self.rules = None
+        self.slave_id = None
+        self.devices = {}
+        # SignalPlan do mapa principal e dos dispositivos com mapa próprio (None = valores estáticos)
+        self.signals = None
+        self.device_signals = {}
+        self.device_tables = {}
         self.coils_array = None
         self.di_array = None
         self.ir_array = None
         self.hr_array = None
+        # Mesmo lock de escrita para todas as tabelas de todos os dispositivos; criado
+        # uma vez porque o processo reserva o recebe por herança
+        self.write_lock = mp.Lock()
+        self.tracker = None
+        # Pipe de comando do processo servidor (recarga do mapa com ele rodando)
+        self.commands = None
+        self.notify_reader = None
+        self.notify_writer = None
+        self.stats_queue = None
+        self.last_connection_stats = []
+        self.loopback = None
+        self.latency = None
+        self.counters = None
+        self.counter_layouts = {}
+        # Handshake de inicialização: o processo avisa pelo socket quando as portas abriram
+        self.ready = False
+        self.ready_reader = None
+        self.ready_buffer = b''
+        self.ready_message = None
+        # Processo reserva já criado para o próximo start()/restart()
+        self.warm_standby = True
+        # Escrita Modbus fora do mapa recusa com ILLEGAL ADDRESS (False = aceita e descarta,
+        # como antes das permissões compiladas); vale para os mapas compilados depois
+        self.reject_unmapped_writes = True
+        self.standby = None
     
     def create_datastore(self, coils_data, di_data, ir_data, hr_data, 
                         coil_callback=None, di_callback=None, 
                         ir_callback=None, hr_callback=None,
                         coils_perm=None, di_perm=None, ir_perm=None, hr_perm=None,
-                        coils_fcs=None, di_fcs=None, ir_fcs=None, hr_fcs=None):
-        """Cria datastore compartilhado com permissões e FCs"""
-        self.store = {
-            'coils': list(coils_data),
-            'di': list(di_data),
-            'ir': list(ir_data),
-            'hr': list(hr_data)
-        }
-        self.permissions = {
-            'coils': coils_perm or {},
-            'di': di_perm or {},
-            'ir': ir_perm or {},
-            'hr': hr_perm or {}
-        }
-        self.allowed_fcs = {
-            'coils': coils_fcs or {},
-            'di': di_fcs or {},
-            'ir': ir_fcs or {},
-            'hr': hr_fcs or {}
-        }
+                        coils_fcs=None, di_fcs=None, ir_fcs=None, hr_fcs=None,
+                        hr_bounds=None, signals=None):
+        """Cria datastore compartilhado (SegmentedTable por tabela) com permissões, FCs, limites e geradores de sinal"""
+        self.signals = signals
+        self.store, self.rules = self._compile_device(
+            coils_data, di_data, ir_data, hr_data,
+            {'coils': coils_perm, 'di': di_perm, 'ir': ir_perm, 'hr': hr_perm},
+            {'coils': coils_fcs, 'di': di_fcs, 'ir': ir_fcs, 'hr': hr_fcs},
+            hr_bounds)
         return self.store
     
-    def start(self, port, baudrate, bytesize, parity, stopbits, slave_id):
-        """Inicia servidor em processo separado com shared arrays"""
+    def _compile_device(self, coils_data, di_data, ir_data, hr_data, perms, fcs, hr_bounds):
+        """(store, DeviceRules) de um mapa - permissões compiladas uma vez no carregamento"""
+        store = {
+            'coils': coils_data,
+            'di': di_data,
+            'ir': ir_data,
+            'hr': hr_data
+        }
+        layouts = {name: table.layout for name, table in store.items()}
+        return store, DeviceRules.compile(layouts, perms, fcs, hr_bounds, self.reject_unmapped_writes)
+    
+    def add_device(self, slave_id, coils_data, di_data, ir_data, hr_data,
+                   coils_perm=None, di_perm=None, ir_perm=None, hr_perm=None,
+                   coils_fcs=None, di_fcs=None, ir_fcs=None, hr_fcs=None,
+                   hr_bounds=None, signals=None):
+        """Adiciona outro slave ID com seu próprio mapa (vale a partir do próximo start)"""
+        self.device_signals[slave_id] = signals
+        self.devices[slave_id] = self._compile_device(
+            coils_data, di_data, ir_data, hr_data,
+            {'coils': coils_perm, 'di': di_perm, 'ir': ir_perm, 'hr': hr_perm},
+            {'coils': coils_fcs, 'di': di_fcs, 'ir': ir_fcs, 'hr': hr_fcs},
+            hr_bounds)
+    
+    def clone_device(self, slave_id, template_id=None):
+        """Adiciona slave ID com o mesmo mapa de `template_id` (None = mapa principal)
+
+        Layouts, valores iniciais e regras compiladas são compartilhados (mesmos
+        objetos); só os valores em shared memory são alocados por dispositivo.
+        """
+        source = self.devices.get(template_id) if template_id is not None else None
+        if source is None:
+            if not self.store:
+                raise ValueError("Datastore não criado")
+            source = (self.store, self.rules)
+        self.devices[slave_id] = source
+        self.device_signals[slave_id] = self.device_signals.get(template_id)
+    
+    def clear_devices(self):
+        """Remove os slave IDs adicionais (o mapa principal continua)"""
+        self.devices = {}
+        self.device_signals = {}
+    
+    def slave_ids(self):
+        """Slave IDs servidos (principal primeiro)"""
+        extra = sorted(sid for sid in self.devices if sid != self.slave_id)
+        return ([self.slave_id] if self.slave_id is not None else []) + extra
+    
+    def _create_tables(self, store, arena=None):
+        """Tabelas compartilhadas com as faixas mapeadas de um dispositivo
+
+        Coils/DIs: bitset compactado; IR/HR: int32 - todas em shared memory com seqlock.
+        """
+        return {name: self._create_table(name, table, arena) for name, table in store.items()}
+    
+    def _create_table(self, name, table, arena=None):
+        return self._table_type(name)(len(table), table.values, lock=self.write_lock, arena=arena)
+    
+    @staticmethod
+    def _table_type(name):
+        return SharedBitTable if name in ('coils', 'di') else SharedRegisterTable
+    
+    def _create_arena(self, stores):
+        """Um bloco só para as tabelas de todos os dispositivos (ver SharedArena)"""
+        return SharedArena(sum(SharedArena.table_size(self._table_type(name).data_bytes(len(table)))
+                               for store in stores for name, table in store.items()))
+    
+    def start(self, port, baudrate, bytesize, parity, stopbits, slave_id,
+              transport='rtu', tcp_address=('127.0.0.1', 5020), pty_pacing=True, rtu_framer='fast',
+              turnaround_mode='min', turnaround_ms=0.0, turnaround_jitter_ms=0.0, metrics_address=None,
+              signal_rate=10.0, turnaround_spin_ms=0.0):
+        """Inicia servidor em processo separado com shared arrays
+
+        `transport`: 'rtu' (serial), 'tcp' ou 'rtu+tcp' (ambos sobre o mesmo datastore).
+        Os slave IDs de add_device()/clone_device() são servidos pelo mesmo processo.
+        Com `port == PTY_PORT` o RTU roda num par pty (mestre em client_port()),
+        com o tempo de fio do baudrate se `pty_pacing`.
+        `rtu_framer`: 'fast' (CRC por tabela, buffers pré-alocados) ou 'pymodbus' (stock).
+        `turnaround_mode`: 'asap', 'min', 'fixed' ou 'jitter' - tempo entre o fim da
+        requisição e a resposta (t3.5 do baudrate + turnaround_ms [+ jitter]).
+        `turnaround_spin_ms`: espera ativa antes do alvo nos modos fixed/jitter
+        (mais precisão, mas segura o event loop; 0 = desligada).
+        `metrics_address`: (host, porta) do endpoint /metrics (formato Prometheus); None = sem endpoint.
+        `signal_rate`: ticks por segundo (1 a 1000) dos geradores de sinal do mapa (signal_engine).
+
+        Não espera as portas abrirem: o resultado chega por poll_ready() (GUI,
+        com QSocketNotifier em ready_fileno()) ou wait_ready() (scripts).
+        """
         if self.running:
             return False, "Servidor já está rodando"
         
@@ -168,82 +673,625 @@ class ModbusServerMultiprocess:
             return False, "Datastore não criado"
         
         try:
-            # Criar arrays compartilhados (ctypes)
-            self.coils_array = mp.Array('i', self.store['coils'])
-            self.di_array = mp.Array('i', self.store['di'])
-            self.ir_array = mp.Array('i', self.store['ir'])
-            self.hr_array = mp.Array('i', self.store['hr'])
+            self.slave_id = slave_id
+            extra = [sid for sid in sorted(self.devices) if sid != slave_id]
+            if slave_id in self.devices:
+                print(f"⚠️ Slave ID {slave_id} já é o dispositivo principal - ignorado")
+            # Tabelas de todos os dispositivos numa arena só (fatias do mesmo bloco)
+            arena = self._create_arena([self.store] + [self.devices[sid][0] for sid in extra])
+            tables = self._create_tables(self.store, arena)
+            self.coils_array = tables['coils']
+            self.di_array = tables['di']
+            self.ir_array = tables['ir']
+            self.hr_array = tables['hr']
+            self.tracker = ChangeTracker({name: len(table) for name, table in self.store.items()}, lock=self.write_lock)
             
-            # Iniciar processo com permissões e FCs
-            self.process = mp.Process(
-                target=run_modbus_server,
-                args=(port, baudrate, bytesize, parity, stopbits, slave_id,
-                      self.coils_array, self.di_array, self.ir_array, self.hr_array,
-                      self.permissions['coils'], self.permissions['di'], 
-                      self.permissions['ir'], self.permissions['hr'],
-                      self.allowed_fcs['coils'], self.allowed_fcs['di'],
-                      self.allowed_fcs['ir'], self.allowed_fcs['hr'])
-            )
-            self.process.start()
+            # Dispositivos adicionais: mesmas regras/layouts do template, tabelas próprias
+            self.device_tables = {sid: self._create_tables(self.devices[sid][0], arena) for sid in extra}
             
-            # Aguardar inicialização
-            time.sleep(0.5)
+            devices = self._device_list()
+            # Histogramas de latência: o processo servidor grava, GUI e CLI (latency.py) leem
+            self.latency = LatencyHistograms()
             
-            self.running = True
-            print(f"✅ Servidor iniciado em processo separado (PID: {self.process.pid})")
-            return True, f"Servidor iniciado em {port} @ {baudrate} bps | Slave ID: {slave_id} | PID: {self.process.pid}"
+            return self._launch(port, baudrate, bytesize, parity, stopbits, devices, transport, tcp_address,
+                                pty_pacing, rtu_framer, turnaround_mode, turnaround_ms, turnaround_jitter_ms,
+                                metrics_address, signal_rate=signal_rate, turnaround_spin_ms=turnaround_spin_ms)
             
         except Exception as e:
             self.cleanup()
             return False, str(e)
     
-    def stop(self):
-        """Para servidor MATANDO o processo - INSTANTÂNEO!"""
+    def restart(self, port, baudrate, bytesize, parity, stopbits, slave_id,
+                transport='rtu', tcp_address=('127.0.0.1', 5020), pty_pacing=True, rtu_framer='fast',
+                turnaround_mode='min', turnaround_ms=0.0, turnaround_jitter_ms=0.0, metrics_address=None,
+                signal_rate=10.0, turnaround_spin_ms=0.0):
+        """Aplica nova configuração (porta, baudrate, slave ID, modo...) mantendo os valores
+
+        Mesmos parâmetros de start(). O processo atual é encerrado e o reserva
+        assume sobre as mesmas tabelas em shared memory - registradores, bits,
+        histogramas e contadores continuam (contadores recomeçam só se os
+        slave IDs mudarem). Sem servidor rodando equivale a start().
+        """
         if not self.running:
-            return
+            return self.start(port, baudrate, bytesize, parity, stopbits, slave_id, transport, tcp_address,
+                              pty_pacing, rtu_framer, turnaround_mode, turnaround_ms, turnaround_jitter_ms,
+                              metrics_address, signal_rate, turnaround_spin_ms)
+        if slave_id in self.device_tables:
+            return False, f"Slave ID {slave_id} já é usado por um dispositivo adicional"
         
-        self.running = False
+        try:
+            self._stop_process()
+            self._release_process()
+            old_ids = self.slave_ids()
+            self.slave_id = slave_id
+            if self.slave_ids() != old_ids and self.counters is not None:
+                self.counters.close()
+                self.counters = None
+            
+            # Mesmo par pty (o mestre não precisa reabrir); só o ritmo acompanha o baudrate
+            if self.loopback is not None and ('rtu' not in transport or port != PTY_PORT):
+                self.loopback.close()
+                self.loopback = None
+            elif self.loopback is not None:
+                self.loopback.set_timing(baudrate if pty_pacing else None, bytesize, parity, stopbits)
+            
+            return self._launch(port, baudrate, bytesize, parity, stopbits, self._device_list(), transport,
+                                tcp_address, pty_pacing, rtu_framer, turnaround_mode, turnaround_ms,
+                                turnaround_jitter_ms, metrics_address, open_timeout=2.0, signal_rate=signal_rate,
+                                turnaround_spin_ms=turnaround_spin_ms)
         
-        if self.process and self.process.is_alive():
-            print(f"💀 Matando processo {self.process.pid}...")
-            self.process.kill()
-            self.process.join(timeout=2)
-            print(f"💀 Processo morto - Porta liberada!")
+        except Exception as e:
+            self.running = False
+            self.cleanup()
+            return False, str(e)
+    
+    def reload_datastore(self, reset=None, timeout=2.0, **kwargs):
+        """Troca o mapa principal (argumentos de create_datastore) sem parar o servidor
+
+        `reset` é {tabela: endereços de datastore} que recebem o valor inicial do
+        novo mapa (TableDiff.words de map_reload.diff_maps()); os demais
+        endereços mapeados nos dois mapas mantêm o valor atual. Os clones do
+        mapa principal acompanham (inclusive nos geradores de sinal);
+        dispositivos com CSV próprio não mudam.
+
+        Tabela com os mesmos segmentos fica no mesmo bloco de shared memory (só
+        as words de `reset` são regravadas). Shared memory não cresce no lugar,
+        então tabela com segmentos diferentes ganha um bloco novo, e o processo
+        servidor copia os valores mantidos ao trocar tabelas, regras e
+        contadores de uma vez entre duas requisições. ChangeTracker e contadores
+        só são recriados se os tamanhos mudarem (contagens das tabelas mantidas
+        continuam). Retorna (sucesso, mensagem); em falha o servidor é parado.
+        """
+        old_store = self.store
+        self.create_datastore(**kwargs)
+        for sid, (store, rules) in list(self.devices.items()):
+            if store is old_store:
+                self.devices[sid] = (self.store, self.rules)
+        if not self.running:
+            return True, "Mapa recarregado"
+        
+        reset = reset or {}
+        migrations = []
+        retired = []
+        kept = []
+        relocated = []
+        
+        def reload_tables(sid, tables):
+            result = {}
+            for name, table in tables.items():
+                old_layout, new_table = old_store[name].layout, self.store[name]
+                layout = new_table.layout
+                words = reset.get(name, ())
+                if old_layout.segments() == layout.segments():
+                    positions = [pos for pos in map(layout.index, words) if pos >= 0]
+                    if positions:
+                        table.write_pieces([(i, pos, 1) for i, pos in enumerate(positions)],
+                                           [new_table.values[pos] for pos in positions])
+                    result[name] = table
+                    kept.append((sid, name))
+                else:
+                    relocated.append((result, name))
+                    migrations.append((sid, name, migration_plan(old_layout, layout, words)))
+                    retired.append(table)
+            return result
+        
+        try:
+            tables = reload_tables(self.slave_id, {'coils': self.coils_array, 'di': self.di_array,
+                                                   'ir': self.ir_array, 'hr': self.hr_array})
+            for sid, device_tables in self.device_tables.items():
+                if self.devices[sid][0] is self.store:
+                    self.device_tables[sid] = reload_tables(sid, device_tables)
+                else:
+                    kept.extend((sid, name) for name in device_tables)
+            # Tabelas realocadas de todos os dispositivos numa arena nova só
+            if relocated:
+                arena = self._create_arena([{name: self.store[name]} for _, name in relocated])
+                for result, name in relocated:
+                    result[name] = self._create_table(name, self.store[name], arena)
+            self.coils_array, self.di_array = tables['coils'], tables['di']
+            self.ir_array, self.hr_array = tables['ir'], tables['hr']
+            
+            sizes = {name: len(table) for name, table in self.store.items()}
+            if sizes != self.tracker.sizes:
+                retired.append(self.tracker)
+                self.tracker = ChangeTracker(sizes, lock=self.write_lock)
+            devices = self._device_list()
+            counter_sizes = {device.slave_id: {name: layout.size for name, layout in device.layouts.items()}
+                             for device in devices}
+            if counter_sizes != self.counters.sizes:
+                previous = self.counters
+                retired.append(previous)
+                self.counters = None
+                devices = self._device_list()
+                self.counters.copy_from(previous, kept)
+            
+            buffer = io.BytesIO()
+            _LockPickler(buffer, self.write_lock).dump(('reload', devices, migrations))
+            self.commands.send_bytes(buffer.getvalue())
+            if not self.commands.poll(timeout):
+                raise TimeoutError(f"processo servidor não respondeu em {timeout:.0f}s")
+            status, detail = self.commands.recv()
+            if status != 'reloaded':
+                raise RuntimeError(detail)
+        except Exception as e:
+            for item in retired:
+                item.close()
+            self.stop()
+            return False, f"Falha ao recarregar o mapa: {e}"
         
+        for item in retired:
+            item.close()
+        return True, f"Mapa recarregado | {len(migrations)} tabela(s) realocada(s)"
+    
+    def _device_list(self):
+        """DeviceTables do principal e dos adicionais sobre as tabelas atuais (cria os contadores se preciso)"""
+        layouts = {name: table.layout for name, table in self.store.items()}
+        tables = {'coils': self.coils_array, 'di': self.di_array, 'ir': self.ir_array, 'hr': self.hr_array}
+        devices = [DeviceTables(self.slave_id, layouts, tables, self.rules, self.tracker, signals=self.signals)]
+        for sid, device_tables in sorted(self.device_tables.items()):
+            store, rules = self.devices[sid]
+            # Clones do principal seguem o plano atual dele (recarga do mapa troca os dois)
+            signals = self.signals if store is self.store else self.device_signals.get(sid)
+            devices.append(DeviceTables(sid, {name: table.layout for name, table in store.items()},
+                                        device_tables, rules, signals=signals))
+        
+        # Contadores por FC e por endereço de todos os dispositivos num bloco só
+        if self.counters is None:
+            self.counters = RequestCounters({device.slave_id: {name: layout.size for name, layout in device.layouts.items()}
+                                             for device in devices})
+        for device in devices:
+            device.counters = self.counters
+        self.counter_layouts = {device.slave_id: device.layouts for device in devices}
+        return devices
+    
+    def _launch(self, port, baudrate, bytesize, parity, stopbits, devices, transport, tcp_address,
+                pty_pacing, rtu_framer, turnaround_mode, turnaround_ms, turnaround_jitter_ms,
+                metrics_address, open_timeout=0.0, signal_rate=10.0, turnaround_spin_ms=0.0):
+        """Entrega a configuração ao processo reserva (ou a um novo) e cria o próximo reserva"""
+        # Porta serial virtual: servidor numa ponta, mestre/benchmark na outra
+        if 'rtu' in transport and port == PTY_PORT:
+            if self.loopback is None:
+                self.loopback = PtyLoopback(baudrate if pty_pacing else None, bytesize, parity, stopbits)
+            port = self.loopback.server_port
+            print(f"🔌 Loopback pty: servidor em {port} | mestre em {self.loopback.client_port}")
+        
+        turnaround = TurnaroundPolicy(turnaround_mode, turnaround_ms, turnaround_jitter_ms,
+                                      baudrate, bytesize, parity, stopbits, turnaround_spin_ms)
+        
+        worker = self.standby if self.standby is not None and self.standby.alive() else None
+        warm = worker is not None
+        if worker is None:
+            if self.standby is not None:
+                self.standby.close()
+            worker = StandbyWorker(self.write_lock)
+        self.standby = None
+        self.process = worker.process
+        self.commands = worker.commands
+        self.notify_reader, self.notify_writer = worker.notify_reader, worker.notify_writer
+        self.stats_queue = worker.stats_queue
+        self.ready_reader = worker.ready_reader
+        self.ready_buffer = b''
+        self.last_connection_stats = []
+        worker.launch(port=port, baudrate=baudrate, bytesize=bytesize, parity=parity, stopbits=stopbits,
+                      devices=devices, transport=transport, tcp_address=tuple(tcp_address),
+                      rtu_framer=rtu_framer, turnaround=turnaround, latency=self.latency,
+                      metrics_address=tuple(metrics_address) if metrics_address else None,
+                      open_timeout=open_timeout, signal_rate=signal_rate)
+        
+        self.running = True
+        self.ready = False
+        print(f"⏳ Processo servidor {'reserva ' if warm else ''}assumiu (PID: {self.process.pid}) - aguardando portas")
+        endpoints = []
+        if self.loopback is not None:
+            endpoints.append(f"pty {self.loopback.client_port} @ {baudrate} bps")
+        elif 'rtu' in transport:
+            endpoints.append(f"{port} @ {baudrate} bps")
+        if 'tcp' in transport:
+            endpoints.append(f"TCP {tcp_address[0]}:{tcp_address[1]}")
+        ids = ', '.join(str(device.slave_id) for device in devices)
+        self.ready_message = f"Servidor iniciado em {' + '.join(endpoints)} | Slave ID: {ids} | PID: {self.process.pid}"
+        
+        if self.warm_standby:
+            self.standby = StandbyWorker(self.write_lock)
+        return True, f"Iniciando servidor em {' + '.join(endpoints)} (PID: {self.process.pid})"
+    
+    def ready_fileno(self):
+        """Socket que fica legível quando o processo responde ao handshake (para QSocketNotifier)"""
+        return self.ready_reader.fileno() if self.ready_reader is not None else None
+    
+    def poll_ready(self):
+        """Resultado do handshake sem bloquear: None enquanto inicia, senão (sucesso, mensagem)
+
+        A mensagem termina quando o processo fecha a ponta dele (EOF); EOF sem
+        mensagem é processo que morreu. Em caso de erro (porta ocupada,
+        processo morreu) o servidor já é parado.
+        """
+        if self.ready:
+            return True, self.ready_message
+        if self.ready_reader is None:
+            return False, "Servidor não está rodando"
+        try:
+            while True:
+                data = self.ready_reader.recv(4096)
+                if not data:
+                    break
+                self.ready_buffer += data
+        except (BlockingIOError, InterruptedError):
+            return None
+        except OSError:
+            pass
+        try:
+            status, detail = pickle.loads(self.ready_buffer)
+        except Exception:
+            self.process.join(timeout=1)
+            status, detail = 'error', f"Processo servidor terminou na inicialização (código {self.process.exitcode})"
+        self.ready_reader.close()
+        self.ready_reader = None
+        self.ready_buffer = b''
+        if status == 'ready':
+            self.ready = True
+            print(f"✅ Servidor pronto (PID: {detail})")
+            return True, self.ready_message
+        self.stop()
+        return False, detail
+    
+    def wait_ready(self, timeout=10.0):
+        """poll_ready() bloqueando até `timeout` segundos - para scripts e testes sem GUI"""
+        deadline = time.monotonic() + timeout
+        while True:
+            result = self.poll_ready()
+            if result is not None:
+                return result
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not wait_objects([self.ready_reader], remaining):
+                self.stop()
+                return False, f"Servidor não respondeu em {timeout:.0f}s"
+    
+    def stop(self, timeout=2.0):
+        """Para o servidor (ver _stop_process()) - o processo sai em poucos ms
+
+        Devolve o tempo até o processo sair em ms (None se não rodava). O
+        processo reserva continua pronto para o próximo start().
+        """
+        if not self.running:
+            return None
+        
+        exit_ms = self._stop_process(timeout)
         self.cleanup()
+        return exit_ms
+    
+    def shutdown(self):
+        """stop() e descarta o processo reserva (fechamento da aplicação)"""
+        self.stop()
+        if self.standby is not None:
+            self.standby.close()
+        self.standby = None
+    
+    def _stop_process(self, timeout=2.0):
+        """Encerra o processo servidor: pedido pelo pipe de comando, depois terminate() e só então kill()
+
+        O pedido ('stop',) e o SIGTERM (POSIX) são atendidos no event loop,
+        fora de qualquer seção de escrita, e o processo sai com código 0.
+        Saída com outro código (kill, terminate no Windows, queda) pode ter
+        deixado o lock de escrita preso e contadores seqlock ímpares:
+        _recover_write_lock() recria um e acerta os outros. Espera o
+        `sentinel` do processo (fica pronto quando ele termina e o sistema
+        fecha os descritores, inclusive a porta serial). Devolve o tempo até o
+        processo sair em ms.
+        """
+        self.running = False
+        self.ready = False
+        
+        process = self.process
+        if process is None:
+            return 0.0
+        exit_ms = 0.0
+        if process.is_alive():
+            print(f"🛑 Parando processo {process.pid}...")
+            started = time.perf_counter()
+            deadline = started + timeout
+            
+            def wait_exit(limit):
+                return bool(wait_objects([process.sentinel], max(0.0, min(limit, deadline - time.perf_counter()))))
+            
+            exited = False
+            if self.commands is not None and not self.commands.closed:
+                try:
+                    self.commands.send_bytes(pickle.dumps(('stop',)))
+                    exited = wait_exit(self.GRACEFUL_STOP_TIMEOUT)
+                except OSError:
+                    pass
+            if not exited:
+                process.terminate()
+                exited = wait_exit(self.GRACEFUL_STOP_TIMEOUT)
+            if not exited:
+                print(f"💀 Processo {process.pid} não encerrou - matando")
+                process.kill()
+                exited = wait_exit(timeout)
+            if exited:
+                process.join()
+                exit_ms = (time.perf_counter() - started) * 1000
+                print(f"🛑 Processo encerrado em {exit_ms:.1f} ms - Porta liberada!")
+            else:
+                exit_ms = timeout * 1000
+                print(f"⚠️ Processo {process.pid} não saiu em {timeout:.0f}s")
+        if process.exitcode != 0:
+            self._recover_write_lock()
+        return exit_ms
+    
+    def _recover_write_lock(self):
+        """Depois de um processo servidor encerrado à força: lock de escrita novo e seqlocks pares
+
+        Um processo morto dentro de uma seção de escrita deixa o mp.Lock preso
+        (ninguém mais o libera) e o contador da tabela ímpar (leitores
+        esperariam para sempre). As tabelas e o tracker passam a usar um lock
+        novo, os contadores ímpares voltam a par (os dados da escrita
+        interrompida podem estar pela metade) e o processo reserva, que
+        herdou o lock antigo, é descartado.
+        """
+        print("⚠️ Processo servidor encerrado à força - recriando o lock de escrita")
+        self.write_lock = mp.Lock()
+        tables = [self.coils_array, self.di_array, self.ir_array, self.hr_array]
+        tables += [table for device_tables in self.device_tables.values() for table in device_tables.values()]
+        for table in tables:
+            if table is not None:
+                table.lock = self.write_lock
+                table.repair()
+        if self.tracker is not None:
+            self.tracker.lock = self.write_lock
+        if self.standby is not None:
+            self.standby.close()
+            self.standby = None
+    
+    def _release_process(self):
+        """Fecha o que era do processo que saiu (pipes, socket de notificação, fila)"""
+        if self.commands is not None:
+            self.commands.close()
+        self.commands = None
+        if self.ready_reader is not None:
+            self.ready_reader.close()
+        self.ready_reader = None
+        self.ready_buffer = b''
+        for sock in (self.notify_reader, self.notify_writer):
+            if sock is not None:
+                sock.close()
+        self.notify_reader = None
+        self.notify_writer = None
+        if self.stats_queue is not None:
+            self.stats_queue.cancel_join_thread()
+            self.stats_queue.close()
+        self.stats_queue = None
+        self.process = None
     
     def cleanup(self):
         """Limpa recursos"""
+        self._release_process()
+        for table in (self.coils_array, self.di_array, self.ir_array, self.hr_array):
+            if table is not None:
+                table.close()
+        for tables in self.device_tables.values():
+            for table in tables.values():
+                table.close()
+        self.device_tables = {}
+        if self.tracker is not None:
+            self.tracker.close()
+        self.tracker = None
+        if self.loopback is not None:
+            self.loopback.close()
+        self.loopback = None
+        if self.latency is not None:
+            self.latency.close()
+        self.latency = None
+        if self.counters is not None:
+            self.counters.close()
+        self.counters = None
         self.coils_array = None
         self.di_array = None
         self.ir_array = None
         self.hr_array = None
-        self.process = None
     
-    def set_value(self, function_code, address, value):
+    def client_port(self):
+        """Ponta do mestre quando o servidor roda no loopback pty (None caso contrário)"""
+        return self.loopback.client_port if self.loopback is not None else None
+    
+    def latency_summary(self, merge_fcs=False):
+        """Latência por estágio (decode, check, datastore, encode, write, total) e FC
+
+        Lista de dicts com count, mean_us, p50_us, p90_us, p99_us e max_us -
+        ver latency.LatencyHistograms.summary(). Vazia sem servidor rodando.
+        """
+        return self.latency.summary(merge_fcs=merge_fcs) if self.latency is not None else []
+    
+    def reset_latency(self):
+        if self.latency is not None:
+            self.latency.reset()
+    
+    def fc_counts(self):
+        """{fc: {'requests', 'responses', 'exceptions'}} desde o início (ou reset_counters())"""
+        return self.counters.fc_counts() if self.counters is not None else {}
+    
+    def access_counts(self, fc, slave_id=None):
+        """Acessos Modbus por endereço (base0) da tabela do FC: {base0: acessos} dos acessados"""
+        if self.counters is None:
+            return {}
+        table = self.FC_TABLES[fc]
+        sid = self.slave_id if slave_id is None else slave_id
+        layout = self.counter_layouts[sid][table]
+        counts = self.counters.access_counts(sid, table)
+        return {layout.address_of(pos) - 1: n for pos, n in enumerate(counts) if n}
+    
+    def dump_counters(self, path=None):
+        """Snapshot dos contadores para análise offline (JSON, ou CSV se `path` terminar em .csv)"""
+        if self.counters is None:
+            return None
+        return dump_counters(self.counters, self.counter_layouts, path)
+    
+    def reset_counters(self):
+        if self.counters is not None:
+            self.counters.reset()
+    
+    def connection_stats(self):
+        """Estatísticas por conexão (RTU/TCP) publicadas pelo processo servidor
+
+        Lista de dicts com peer, server, active, connected_at, requests,
+        exceptions, bytes_in e bytes_out; atualizada ~1x por segundo.
+        """
+        if self.stats_queue is not None:
+            try:
+                while True:
+                    self.last_connection_stats = self.stats_queue.get_nowait()
+            except (queue.Empty, OSError, ValueError):
+                pass
+        return self.last_connection_stats
+    
+    def _resolve(self, function_code, slave_id=None):
+        """Retorna (SegmentedTable, shared array) para o function code (None = dispositivo principal)"""
+        name = self.FC_TABLES.get(function_code)
+        if name is None:
+            return None, None
+        if slave_id is None or slave_id == self.slave_id:
+            return self.store[name], getattr(self, f"{name}_array")
+        tables = self.device_tables.get(slave_id)
+        if tables is None:
+            return None, None
+        return self.devices[slave_id][0][name], tables[name]
+    
+    def set_value(self, function_code, address, value, slave_id=None):
         """Define valor via shared array"""
         if not self.running:
             return
         
         try:
-            array_map = {1: self.coils_array, 2: self.di_array, 3: self.hr_array, 4: self.ir_array}
-            array = array_map.get(function_code)
-            if array and address < len(array):
-                array[address] = value
+            table, array = self._resolve(function_code, slave_id)
+            if array is not None:
+                index = table.layout.index(address)
+                if index >= 0:
+                    array[index] = value
         except Exception as e:
             print(f"⚠️ Erro ao definir valor: {e}")
     
-    def get_value(self, function_code, address):
+    def get_value(self, function_code, address, slave_id=None):
         """Obtém valor via shared array"""
         if not self.running:
             return None
         
         try:
-            array_map = {1: self.coils_array, 2: self.di_array, 3: self.hr_array, 4: self.ir_array}
-            array = array_map.get(function_code)
-            if array and address < len(array):
-                return array[address]
+            table, array = self._resolve(function_code, slave_id)
+            if array is not None:
+                index = table.layout.index(address)
+                return array[index] if index >= 0 else 0
         except Exception as e:
             print(f"⚠️ Erro ao obter valor: {e}")
         
         return None
+    
+    def set_values(self, function_code, start, values, slave_id=None):
+        """Define faixa de valores numa única seção de escrita da tabela"""
+        if not self.running:
+            return
+        
+        try:
+            table, array = self._resolve(function_code, slave_id)
+            if array is not None:
+                array.write_pieces(table.layout.pieces(start, len(values)), list(values))
+        except Exception as e:
+            print(f"⚠️ Erro ao definir valores: {e}")
+    
+    def get_values(self, function_code, start, count, slave_id=None):
+        """Obtém faixa de valores numa única leitura consistente (lacunas valem 0)"""
+        if not self.running:
+            return None
+        
+        try:
+            table, array = self._resolve(function_code, slave_id)
+            if array is not None:
+                return array.read_pieces(table.layout.pieces(start, count), count)
+        except Exception as e:
+            print(f"⚠️ Erro ao obter valores: {e}")
+        
+        return None
+    
+    def apply_batch(self, writes, slave_id=None):
+        """Aplica [(function_code, start, values), ...] em várias tabelas de forma atômica
+
+        Todas as tabelas compartilham o mesmo lock de escrita; os contadores seqlock
+        das tabelas afetadas ficam ímpares até o fim do lote, então o mestre nunca
+        lê um estado pela metade. `slave_id` escolhe o dispositivo (None = principal).
+        """
+        if not self.running:
+            return
+        
+        try:
+            resolved = []
+            for function_code, start, values in writes:
+                table, array = self._resolve(function_code, slave_id)
+                if array is not None:
+                    values = list(values)
+                    resolved.append((array, table.layout.pieces(start, len(values)), values))
+            arrays = {id(array): array for array, _, _ in resolved}.values()
+            with self.write_lock:
+                for array in arrays:
+                    array.open_write()
+                try:
+                    for array, pieces, values in resolved:
+                        for rel, pos, n in pieces:
+                            array.store(pos, values[rel:rel + n])
+                finally:
+                    for array in arrays:
+                        array.close_write()
+        except Exception as e:
+            print(f"⚠️ Erro ao aplicar lote: {e}")
+    
+    def change_sequence(self):
+        """Número de sequência global de escritas Modbus (None se parado)"""
+        if not self.running or self.tracker is None:
+            return None
+        return self.tracker.sequence
+    
+    def notification_fileno(self):
+        """Descritor que fica legível quando o servidor escreve algo (para QSocketNotifier)"""
+        return self.notify_reader.fileno() if self.notify_reader else None
+    
+    def drain_notifications(self):
+        """Consome os bytes de notificação e reabilita o próximo aviso do servidor"""
+        try:
+            while self.notify_reader.recv(64):
+                pass
+        except (BlockingIOError, InterruptedError):
+            pass
+        self.tracker.acknowledge()
+    
+    def notification_latency_ms(self):
+        """Tempo desde a notificação do servidor até agora (ms)"""
+        if self.tracker is None or not self.tracker.notified_at:
+            return None
+        return (time.perf_counter_ns() - self.tracker.notified_at) / 1e6
+    
+    def collect_changes(self):
+        """Retorna {tabela: [(endereço, valor), ...]} escritos pelo Modbus desde a última coleta"""
+        changes = {}
+        for name, positions in self.tracker.collect().items():
+            array = getattr(self, f"{name}_array")
+            layout = self.store[name].layout
+            changes[name] = [(layout.address_of(pos), array[pos]) for pos in positions]
+        return changes
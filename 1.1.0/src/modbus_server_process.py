@@ -2,8 +2,9 @@
 import asyncio
 import sys
 from pymodbus.server.async_io import StartSerialServer
-from pymodbus.datastore import ModbusSlaveContext, ModbusServerContext, ModbusSequentialDataBlock
+from pymodbus.datastore import ModbusSlaveContext, ModbusServerContext
 from pymodbus.transaction import ModbusRtuFramer
+from segmented_store import SegmentedDataBlock
 import pickle
 
 async def run_server(port, baudrate, bytesize, parity, stopbits, slave_id, datastore_file):
@@ -13,12 +14,12 @@ async def run_server(port, baudrate, bytesize, parity, stopbits, slave_id, datas
     with open(datastore_file, 'rb') as f:
         data = pickle.load(f)
     
-    # Criar datastore
+    # Criar datastore segmentado (SegmentedTable por tabela)
     store = ModbusSlaveContext(
-        co=ModbusSequentialDataBlock(0, data['coils']),
-        di=ModbusSequentialDataBlock(0, data['di']),
-        ir=ModbusSequentialDataBlock(0, data['ir']),
-        hr=ModbusSequentialDataBlock(0, data['hr'])
+        co=SegmentedDataBlock(data['coils'].layout, list(data['coils'].values)),
+        di=SegmentedDataBlock(data['di'].layout, list(data['di'].values)),
+        ir=SegmentedDataBlock(data['ir'].layout, list(data['ir'].values)),
+        hr=SegmentedDataBlock(data['hr'].layout, list(data['hr'].values))
     )
     
     context = ModbusServerContext(slaves={slave_id: store, 0: store}, single=False)
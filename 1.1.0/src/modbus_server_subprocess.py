@@ -4,7 +4,6 @@ import pickle
 import tempfile
 import os
 import sys
-from pymodbus.datastore import ModbusSlaveContext, ModbusSequentialDataBlock
 
 class ModbusServerSubprocess:
     """Servidor Modbus que roda em processo separado - pode ser morto instantaneamente"""
@@ -102,3 +101,15 @@ class ModbusServerSubprocess:
     def get_value(self, function_code, address):
         """Obtém valor - NÃO SUPORTADO em subprocess"""
         return None
+    
+    def set_values(self, function_code, start, values):
+        """Define faixa de valores - NÃO SUPORTADO em subprocess"""
+        pass
+    
+    def get_values(self, function_code, start, count):
+        """Obtém faixa de valores - NÃO SUPORTADO em subprocess"""
+        return None
+    
+    def apply_batch(self, writes):
+        """Aplica lote de escritas - NÃO SUPORTADO em subprocess"""
+        pass
@@ -0,0 +1,302 @@
+"""Permissões do mapa compiladas por tabela - validação de requisições sem parsing no caminho quente"""
+import operator
+from array import array
+from bisect import bisect_left, bisect_right
+from pymodbus.pdu import ModbusExceptions
+
+# Permissão assumida quando a coluna Permissao está vazia
+DEFAULT_PERMISSIONS = {'coils': 'R/W', 'di': 'R', 'ir': 'R', 'hr': 'R/W'}
+
+# Function codes de escrita -> tabela
+WRITE_TABLES = {5: 'coils', 15: 'coils', 6: 'hr', 16: 'hr'}
+
+
+def request_span(request):
+    """Retorna (endereço datastore, quantidade) de uma requisição pymodbus (base0 + 1)"""
+    values = getattr(request, 'values', None)
+    if values is not None and request.function_code in (15, 16):
+        count = len(values)
+    else:
+        count = getattr(request, 'count', 1)
+    return request.address + 1, count
+
+
+class PermissionTable:
+    """Bitmap de escrita por posição do buffer compacto (SegmentLayout)
+
+    `writable` tem 1 byte por posição (0/1) - validar uma faixa inteira é um
+    memchr por segmento (`0 in writable[a:b]`), sem dict nem strings por endereço.
+    Com `strict` falso, endereços fora do mapa (lacunas e bandas de guarda)
+    aceitam a escrita como antes das permissões compiladas (o valor em lacuna
+    é descartado); só registradores do mapa sem W são recusados.
+    """
+
+    def __init__(self, layout, permissions, default='R', strict=True):
+        self.layout = layout
+        self.strict = strict
+        self.writable = bytearray(layout.size) if strict else bytearray(b'\x01') * layout.size
+        for addr, perm in permissions.items():
+            pos = layout.index(addr)
+            if pos < 0:
+                continue
+            self.writable[pos] = 1 if 'W' in (perm or default).upper() else 0
+
+    def check_write(self, address, count):
+        """Código de exceção Modbus para escrita em [address, address+count) ou None se permitida
+
+        Registrador somente leitura -> ILLEGAL DATA ADDRESS (02); endereço não
+        mapeado também, se `strict`.
+        """
+        covered = 0
+        for _, pos, n in self.layout.pieces(address, count):
+            if 0 in self.writable[pos:pos + n]:
+                return ModbusExceptions.IllegalAddress
+            covered += n
+        if covered != count and self.strict:
+            return ModbusExceptions.IllegalAddress
+        return None
+
+
+# Function codes de leitura -> tabela
+READ_TABLES = {1: 'coils', 2: 'di', 3: 'hr', 4: 'ir'}
+FC_TABLES = {**READ_TABLES, **WRITE_TABLES}
+
+# FCs naturais de cada tabela (usados quando a coluna FCs está vazia)
+NATURAL_FCS = {'coils': {1, 5, 15}, 'di': {2}, 'ir': {4}, 'hr': {3, 6, 16}}
+
+
+def parse_fcs(text):
+    """'3/6/16' -> {3, 6, 16} (aceita / , ; ou espaço como separador)"""
+    result = set()
+    for part in str(text or '').replace(',', '/').replace(';', '/').replace(' ', '/').split('/'):
+        part = part.strip()
+        if part.isdigit():
+            result.add(int(part))
+    return result
+
+
+class FunctionCodeTable:
+    """Tabela de despacho (function code, endereço) -> permitido/negado, compilada no carregamento
+
+    Para cada FC guarda um bytearray `denied` sobre o buffer compacto da tabela
+    correspondente (1 = registrador mapeado cuja coluna FCs não lista esse FC).
+    FCs sem nenhum endereço negado não guardam bitmap e passam direto, então
+    leituras grandes FC03/FC04 não pagam nada quando o mapa permite o FC.
+    """
+
+    def __init__(self, layouts, fcs):
+        parsed = {table: {addr: parse_fcs(text) for addr, text in entries.items()}
+                  for table, entries in fcs.items()}
+        
+        # FCs aceitos pelo dispositivo: união da coluna FCs (vazia = FCs naturais da tabela)
+        self.supported = set()
+        declared = False
+        for table, entries in parsed.items():
+            for allowed in entries.values():
+                declared = declared or bool(allowed)
+                self.supported |= allowed or NATURAL_FCS[table]
+        # Mapa sem coluna FCs preenchida: aceita tudo como antes
+        if not declared:
+            self.supported = None
+        
+        self.denied = {}
+        for fc, table in FC_TABLES.items():
+            layout = layouts[table]
+            denied = bytearray(layout.size)
+            for addr, allowed in parsed.get(table, {}).items():
+                if allowed and fc not in allowed:
+                    pos = layout.index(addr)
+                    if pos >= 0:
+                        denied[pos] = 1
+            self.denied[fc] = (layout, denied) if 1 in denied else None
+
+    def check(self, request):
+        """ILLEGAL FUNCTION (01) se o dispositivo não aceitaria a requisição, senão None"""
+        fc = request.function_code
+        if self.supported is not None and fc not in self.supported:
+            return ModbusExceptions.IllegalFunction
+        entry = self.denied.get(fc)
+        if entry is None:
+            return None
+        layout, denied = entry
+        address, count = request_span(request)
+        for _, pos, n in layout.pieces(address, count):
+            if 1 in denied[pos:pos + n]:
+                return ModbusExceptions.IllegalFunction
+        return None
+
+
+# Faixa representável por um registrador (int16 com sinal .. uint16)
+REGISTER_MIN = -32768
+REGISTER_MAX = 65535
+
+# Custo de conferir um trecho de limites iguais (fatia + min/max) em elementos
+# comparados um a um: pedidos que cruzam muitos trechos curtos (um Intervalo
+# diferente por registrador) voltam à comparação elemento a elemento
+RUN_COST = 16
+
+
+def uint16_limits(lo, hi, signed):
+    """Faixa aceita de um registrador no valor uint16 do PDU: (mínimo, máximo, lacuna)
+
+    Com sinal, os negativos ficam acima de 0x7FFF: um intervalo que cruza o zero
+    aceita [0, hi] e [lo + 0x10000, 0xFFFF], e `lacuna` é o par (hi, lo + 0x10000)
+    que delimita os valores recusados entre os dois.
+    """
+    if not signed:
+        return max(lo, 0), min(hi, 0xFFFF), None
+    hi = min(hi, 0x7FFF)
+    if lo >= 0:
+        return lo, hi, None
+    if hi < 0:
+        return lo + 0x10000, hi + 0x10000, None
+    return 0, 0xFFFF, (hi, lo + 0x10000)
+
+
+class BoundsTable:
+    """Limites Intervalo/Minimo/Maximo compilados em arrays por posição do buffer compacto
+
+    `lo`/`hi` são array('i') alinhados ao SegmentLayout (posições sem limite ficam
+    com a faixa inteira do registrador). Os limites estão na mesma unidade do
+    ValorInicial (valor bruto do registrador). Posições com mínimo negativo são
+    marcadas em `signed` e o valor recebido é interpretado como int16.
+
+    Na compilação, posições vizinhas com o mesmo limite viram um trecho
+    (`run_starts`/`run_ends`/`run_limits`) já convertido para a faixa uint16 do
+    PDU. Validar um FC16 de 123 registradores com o mesmo Intervalo é então um
+    min()/max() da fatia (em C), sem conversão de sinal por valor.
+    """
+
+    def __init__(self, layout, bounds):
+        self.layout = layout
+        self.lo = array('i', [REGISTER_MIN]) * layout.size
+        self.hi = array('i', [REGISTER_MAX]) * layout.size
+        self.signed = bytearray(layout.size)
+        self.active = False
+        for addr, (minimo, maximo) in bounds.items():
+            pos = layout.index(addr)
+            if pos < 0 or (minimo is None and maximo is None):
+                continue
+            if minimo is not None:
+                # Limites fracionários arredondam para dentro da faixa
+                self.lo[pos] = max(REGISTER_MIN, -int(-minimo // 1))
+                self.signed[pos] = minimo < 0
+            if maximo is not None:
+                self.hi[pos] = min(REGISTER_MAX, int(maximo // 1))
+            self.active = True
+
+        # Trechos de posições contíguas com o mesmo limite (posições livres ficam de fora)
+        self.run_starts = []
+        self.run_ends = []
+        self.run_limits = []
+        free = (REGISTER_MIN, REGISTER_MAX, 0)
+        last = None
+        for pos in range(layout.size if self.active else 0):
+            key = (self.lo[pos], self.hi[pos], self.signed[pos])
+            if key == free:
+                continue
+            if key == last and self.run_ends[-1] == pos:
+                self.run_ends[-1] = pos + 1
+                continue
+            self.run_starts.append(pos)
+            self.run_ends.append(pos + 1)
+            self.run_limits.append(uint16_limits(*key))
+            last = key
+
+    def check_values(self, address, values):
+        """ILLEGAL DATA VALUE (03) se algum valor sair do Intervalo do mapa, senão None"""
+        if not self.active:
+            return None
+        for rel, pos, n in self.layout.pieces(address, len(values)):
+            end = pos + n
+            first = bisect_right(self.run_ends, pos)
+            last = bisect_left(self.run_starts, end)
+            if last - first > 1 + n // RUN_COST:
+                if not self._each_inside(values[rel:rel + n], pos):
+                    return ModbusExceptions.IllegalValue
+                continue
+            for i in range(first, last):
+                start = max(pos, self.run_starts[i])
+                stop = min(end, self.run_ends[i])
+                if not self._run_inside(values[rel + start - pos:rel + stop - pos], self.run_limits[i]):
+                    return ModbusExceptions.IllegalValue
+        return None
+
+    @staticmethod
+    def _run_inside(chunk, limits):
+        """Valores de um trecho com limite único dentro da faixa uint16 aceita"""
+        low, high, gap = limits
+        if low and min(chunk) < low:
+            return False
+        if high < 0xFFFF and max(chunk) > high:
+            return False
+        if gap is not None:
+            ordered = sorted(chunk)
+            i = bisect_right(ordered, gap[0])
+            return i == len(ordered) or ordered[i] >= gap[1]
+        return True
+
+    def _each_inside(self, chunk, pos):
+        """Comparação elemento a elemento com `lo`/`hi` (limites fragmentados)"""
+        n = len(chunk)
+        signed = self.signed[pos:pos + n]
+        if 1 in signed:
+            chunk = [v - 0x10000 if s and v > 0x7FFF else v for v, s in zip(chunk, signed)]
+        return (all(map(operator.le, self.lo[pos:pos + n], chunk))
+                and all(map(operator.le, chunk, self.hi[pos:pos + n])))
+
+
+class DeviceRules:
+    """Regras compiladas de um dispositivo (FCs, permissões e limites)
+
+    Imutáveis depois de compiladas: slave IDs clonados do mesmo mapa usam a
+    mesma instância, e o contexto do servidor escolhe as regras pelo unit ID
+    num dict (O(1)).
+    """
+
+    def __init__(self, permissions, allowed_fcs, bounds=None):
+        self.permissions = permissions
+        self.allowed_fcs = allowed_fcs
+        self.bounds = bounds or {}
+
+    @classmethod
+    def compile(cls, layouts, perms=None, fcs=None, hr_bounds=None, strict=True):
+        """Compila {tabela: {endereço: texto}} do mapa nas tabelas de validação
+
+        `strict` falso aceita escritas fora do mapa (ver PermissionTable).
+        """
+        perms = perms or {}
+        fcs = fcs or {}
+        permissions = {
+            name: PermissionTable(layout, perms.get(name) or {}, DEFAULT_PERMISSIONS[name], strict)
+            for name, layout in layouts.items()
+        }
+        allowed_fcs = FunctionCodeTable(layouts, {name: fcs.get(name) or {} for name in layouts})
+        # Intervalo/Minimo/Maximo: só HR recebe valores arbitrários do mestre (FC06/FC16)
+        bounds = {'hr': BoundsTable(layouts['hr'], hr_bounds or {})}
+        return cls(permissions, allowed_fcs, bounds)
+
+    def check(self, request):
+        """Código de exceção Modbus para a requisição ou None se aceita"""
+        code = self.allowed_fcs.check(request)
+        if code is not None:
+            print(f"❌ BLOQUEADO: [ID {request.slave_id}] FC{request.function_code:02d} não aceito pelo mapa (exceção {code:02d})")
+            return code
+
+        table = WRITE_TABLES.get(request.function_code)
+        if table is None:
+            return None
+
+        address, count = request_span(request)
+        code = self.permissions[table].check_write(address, count)
+        if code is not None:
+            print(f"❌ BLOQUEADO: [ID {request.slave_id}] FC{request.function_code:02d} em {table} {address - 1}..{address + count - 2} (exceção {code:02d})")
+            return code
+
+        bounds = self.bounds.get(table)
+        if bounds is not None and request.function_code in (6, 16):
+            values = request.values if request.function_code == 16 else [request.value]
+            code = bounds.check_values(address, values)
+            if code is not None:
+                print(f"❌ BLOQUEADO: [ID {request.slave_id}] FC{request.function_code:02d} em {table} {address - 1}..{address + count - 2} fora do intervalo (exceção {code:02d})")
+        return code
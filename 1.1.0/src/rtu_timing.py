@@ -0,0 +1,139 @@
+"""Tempo de resposta (turnaround) do escravo RTU - agenda respostas no event loop com loop.call_at"""
+import asyncio
+import random
+import time
+
+from virtual_serial import char_time
+
+# Modos de turnaround aceitos na configuração
+#   asap   - responde assim que a requisição é processada (testes de vazão)
+#   min    - nunca antes do silêncio de 3,5 caracteres + turnaround_ms
+#   fixed  - exatamente silêncio + turnaround_ms após o fim da requisição
+#   jitter - silêncio + turnaround_ms + aleatório em [0, turnaround_jitter_ms]
+TURNAROUND_MODES = ('asap', 'min', 'fixed', 'jitter')
+
+# Acima de 19200 bps a especificação Modbus fixa t3.5 em 1,75 ms
+FIXED_T35_BAUD = 19200
+FIXED_T35 = 0.00175
+
+# call_at acorda com granularidade de ~1 ms (epoll). Nos modos fixed/jitter os
+# últimos `spin_ms` antes do alvo podem ser esperados em laço ativo, mas isso
+# trava o event loop (outras conexões e barramentos do processo) - desligado
+# por padrão; 1,5 ms cobre a granularidade quando só há uma conexão.
+DEFAULT_SPIN_MS = 0.0
+
+
+def silent_interval(baudrate, bytesize=8, parity='N', stopbits=1):
+    """t3.5 (segundos) para a configuração serial"""
+    if baudrate > FIXED_T35_BAUD:
+        return FIXED_T35
+    return 3.5 * char_time(baudrate, bytesize, parity, stopbits)
+
+
+class TurnaroundPolicy:
+    """Configuração do turnaround de um servidor RTU (compartilhada pelas conexões)"""
+
+    def __init__(self, mode='min', turnaround_ms=0.0, jitter_ms=0.0,
+                 baudrate=19200, bytesize=8, parity='N', stopbits=1, spin_ms=DEFAULT_SPIN_MS):
+        mode = str(mode or 'min').lower()
+        if mode not in TURNAROUND_MODES:
+            print(f"⚠️ turnaround_mode desconhecido: {mode!r} - usando 'min'")
+            mode = 'min'
+        self.mode = mode
+        self.turnaround = max(0.0, float(turnaround_ms or 0)) / 1000
+        self.jitter = max(0.0, float(jitter_ms or 0)) / 1000 if mode == 'jitter' else 0.0
+        self.spin = max(0.0, float(spin_ms or 0)) / 1000 if mode in ('fixed', 'jitter') else 0.0
+        self.char_time = char_time(baudrate, bytesize, parity, stopbits)
+        self.silence = silent_interval(baudrate, bytesize, parity, stopbits)
+
+    def delay(self):
+        """Atraso alvo entre o fim da requisição e o início da resposta (segundos)"""
+        delay = self.silence + self.turnaround
+        if self.jitter:
+            delay += random.uniform(0.0, self.jitter)
+        return delay
+
+    def describe(self):
+        if self.mode == 'asap':
+            return "asap"
+        text = f"{self.mode} {(self.silence + self.turnaround) * 1000:.2f} ms"
+        if self.jitter:
+            text += f" +0..{self.jitter * 1000:.2f} ms"
+        return text
+
+
+class TurnaroundScheduler:
+    """Agenda as respostas de uma conexão RTU e mede o turnaround obtido
+
+    `received()` marca o fim da requisição (último bloco lido da serial) e
+    `schedule(data, send)` chama `send(data)` no instante alvo com
+    loop.call_at. Várias requisições lidas de uma vez são respondidas na ordem
+    (o alvo nunca é anterior ao da resposta anterior); o tempo de fio fica a
+    cargo da serial (ou do PtyLoopback com ritmo). Sem `spin` na política a
+    resposta sai quando o event loop acordar (até ~1 ms depois do alvo).
+
+    `stats` acumula o turnaround medido (fim da requisição -> envio) e o erro
+    em relação ao alvo; nos modos fixed/jitter, respostas enviadas mais de um
+    caractere (ou 1 ms) depois do alvo contam como atrasadas.
+    """
+
+    def __init__(self, policy):
+        self.policy = policy
+        self.rx_end = None
+        self.last_target = 0.0
+        self.pending = 0
+        self._sum = 0.0
+        self.stats = {
+            'mode': policy.describe(),
+            'sent': 0,
+            'late': 0,
+            'avg_ms': 0.0,
+            'min_ms': None,
+            'max_ms': 0.0,
+            'max_error_ms': 0.0,
+        }
+        self._late_after = max(policy.char_time, 0.001)
+
+    def received(self):
+        self.rx_end = time.monotonic()
+
+    def schedule(self, data, send):
+        now = time.monotonic()
+        rx_end = self.rx_end if self.rx_end is not None else now
+        policy = self.policy
+        if policy.mode == 'asap':
+            send(data)
+            self._record(rx_end, now, now)
+            return
+
+        target = self.last_target = max(rx_end + policy.delay(), self.last_target)
+        if target <= now:
+            send(data)
+            self._record(rx_end, target, now)
+            return
+
+        self.pending += 1
+        # loop.time() é time.monotonic() no event loop padrão
+        asyncio.get_running_loop().call_at(target - policy.spin, self._emit, data, send, rx_end, target)
+
+    def _emit(self, data, send, rx_end, target):
+        self.pending -= 1
+        now = time.monotonic()
+        if self.policy.spin:
+            while now < target:
+                now = time.monotonic()
+        send(data)
+        self._record(rx_end, target, now)
+
+    def _record(self, rx_end, target, sent_at):
+        stats = self.stats
+        achieved = (sent_at - rx_end) * 1000
+        error = (sent_at - target) * 1000
+        stats['sent'] += 1
+        self._sum += achieved
+        stats['avg_ms'] = self._sum / stats['sent']
+        stats['min_ms'] = achieved if stats['min_ms'] is None else min(stats['min_ms'], achieved)
+        stats['max_ms'] = max(stats['max_ms'], achieved)
+        stats['max_error_ms'] = max(stats['max_error_ms'], error)
+        if self.policy.mode in ('fixed', 'jitter') and sent_at - target > self._late_after:
+            stats['late'] += 1
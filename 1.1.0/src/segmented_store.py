@@ -0,0 +1,130 @@
+"""Datastore segmentado - aloca apenas as faixas mapeadas do CSV (+ bandas de guarda)"""
+from bisect import bisect_right
+from pymodbus.datastore.store import BaseModbusDataBlock
+
+# Endereços de datastore no pymodbus são base0 + 1 (zero_mode=False)
+MAX_ADDRESS = 65536
+DEFAULT_GUARD = 16
+
+
+class SegmentLayout:
+    """Layout esparso: lista ordenada de faixas [inicio, fim) e sua posição no buffer compacto"""
+
+    def __init__(self, segments):
+        self.starts = []
+        self.ends = []
+        self.offsets = []
+        size = 0
+        for start, length in segments:
+            self.starts.append(start)
+            self.ends.append(start + length)
+            self.offsets.append(size)
+            size += length
+        self.size = size
+
+    @classmethod
+    def from_addresses(cls, addresses, guard=DEFAULT_GUARD):
+        """Agrupa endereços mapeados em segmentos, unindo faixas separadas por até 2x guard"""
+        segments = []
+        for addr in sorted(set(addresses)):
+            start = max(1, addr - guard)
+            end = min(MAX_ADDRESS + 1, addr + guard + 1)
+            if segments and start <= segments[-1][1]:
+                segments[-1][1] = max(segments[-1][1], end)
+            else:
+                segments.append([start, end])
+        return cls([(start, end - start) for start, end in segments])
+
+    def segments(self):
+        """Retorna lista de (inicio, tamanho)"""
+        return [(s, e - s) for s, e in zip(self.starts, self.ends)]
+
+    def index(self, address):
+        """Posição do endereço no buffer compacto ou -1 se cair em lacuna - O(log n)"""
+        i = bisect_right(self.starts, address) - 1
+        if i >= 0 and address < self.ends[i]:
+            return self.offsets[i] + address - self.starts[i]
+        return -1
+
+    def address_of(self, index):
+        """Inverso de index(): endereço correspondente a uma posição do buffer"""
+        i = bisect_right(self.offsets, index) - 1
+        return self.starts[i] + index - self.offsets[i]
+
+    def pieces(self, address, count):
+        """Divide [address, address+count) nos trechos mapeados
+
+        Retorna lista de (posição relativa no pedido, posição no buffer, quantidade).
+        Lacunas simplesmente não aparecem na lista.
+        """
+        end = address + count
+        i = max(bisect_right(self.starts, address) - 1, 0)
+        result = []
+        while i < len(self.starts) and self.starts[i] < end:
+            lo = max(address, self.starts[i])
+            hi = min(end, self.ends[i])
+            if lo < hi:
+                result.append((lo - address, self.offsets[i] + lo - self.starts[i], hi - lo))
+            i += 1
+        return result
+
+    def read(self, buffer, address, count):
+        """Lê faixa do buffer compacto - lacunas retornam 0"""
+        result = [0] * count
+        for rel, pos, n in self.pieces(address, count):
+            result[rel:rel + n] = buffer[pos:pos + n]
+        return result
+
+    def write(self, buffer, address, values):
+        """Escreve faixa no buffer compacto - escritas em lacunas são descartadas"""
+        for rel, pos, n in self.pieces(address, len(values)):
+            buffer[pos:pos + n] = values[rel:rel + n]
+
+
+class SegmentedTable:
+    """Layout + valores iniciais compactos de uma tabela Modbus"""
+
+    def __init__(self, layout, values):
+        self.layout = layout
+        self.values = values
+
+    @classmethod
+    def from_values(cls, initial_values, guard=DEFAULT_GUARD):
+        """Cria tabela a partir de {endereço_datastore: valor}"""
+        layout = SegmentLayout.from_addresses(initial_values.keys(), guard)
+        values = [0] * layout.size
+        for addr, value in initial_values.items():
+            values[layout.index(addr)] = value
+        return cls(layout, values)
+
+    def __len__(self):
+        return self.layout.size
+
+
+class SegmentedDataBlock(BaseModbusDataBlock):
+    """DataBlock sobre buffer compacto - todo o espaço de endereços é válido, lacunas valem 0"""
+
+    def __init__(self, layout, values):
+        self.layout = layout
+        self.values = values
+        self.address = 1
+        self.default_value = 0
+
+    def validate(self, address, count=1):
+        return 1 <= address and address + count <= MAX_ADDRESS + 1
+
+    def reset(self):
+        self.values[:] = [self.default_value] * self.layout.size
+
+    def getValues(self, address, count=1):
+        return self.layout.read(self.values, address, count)
+
+    def setValues(self, address, values):
+        if not isinstance(values, list):
+            values = [values]
+        self.layout.write(self.values, address, values)
+
+    def __iter__(self):
+        for start, length in self.layout.segments():
+            for i, value in enumerate(self.layout.read(self.values, start, length)):
+                yield start + i, value
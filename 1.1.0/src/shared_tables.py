@@ -0,0 +1,486 @@
+"""Tabelas em shared memory (multiprocessing.shared_memory) compartilhadas entre GUI e processo servidor
+
+Cada bloco começa com um contador de versão (seqlock) de 8 bytes seguido dos dados.
+Escritores (servidor e GUI) serializam entre si por um mp.Lock e deixam o contador
+ímpar durante a escrita; leitores copiam o trecho pedido sem lock e repetem a cópia
+se o contador mudou no meio.
+"""
+import logging
+import multiprocessing as mp
+import time
+from array import array
+from multiprocessing import shared_memory
+
+HEADER_SIZE = 8
+# Espera máxima de um leitor por uma escrita em andamento (escritas duram microssegundos)
+SEQLOCK_TIMEOUT = 0.5
+# Pausa entre tentativas do leitor: dobra a partir de SEQLOCK_BACKOFF até SEQLOCK_MAX_BACKOFF (s)
+SEQLOCK_BACKOFF = 50e-6
+SEQLOCK_MAX_BACKOFF = 2e-3
+
+log = logging.getLogger(__name__)
+
+# Cabeçalho do ChangeTracker: sequência, notificação pendente, instante da notificação (ns)
+TRACKER_HEADER_SIZE = 24
+_SEQ, _PENDING, _NOTIFIED_AT = 0, 1, 2
+
+# Tradução ASCII '0'/'1' <-> bytes 0/1 (desempacota/empacota bits sem loop Python)
+_ASCII_TO_BIT = bytes.maketrans(b'01', b'\x00\x01')
+_BIT_TO_ASCII = bytes([0x30] + [0x31] * 255)
+
+
+class SharedArena:
+    """Um bloco de shared memory repartido entre várias tabelas
+
+    Um SharedMemory POSIX segura dois descritores até close() (o do arquivo e
+    a cópia do mmap), em cada processo que o abre. Com centenas de
+    dispositivos, um bloco por tabela passa do limite de select() (1024) do
+    pyserial. Tabelas criadas com `arena` ocupam fatias alinhadas de um
+    bloco só, que cada processo abre uma vez pelo nome (`attach()`). O bloco
+    é liberado quando a última tabela dele é fechada (e removido, no dono).
+    """
+
+    _attached = {}  # nome -> SharedArena aberta neste processo
+
+    def __init__(self, nbytes=None, name=None):
+        if name is None:
+            self.shm = shared_memory.SharedMemory(create=True, size=max(8, nbytes))
+            self.owner = True
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+            self.owner = False
+        self.used = 0
+        self.refs = 0
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    @staticmethod
+    def table_size(nbytes):
+        """Bytes ocupados na arena por uma tabela de `nbytes` de dados (cabeçalho + alinhamento de 8)"""
+        return (HEADER_SIZE + nbytes + 7) & ~7
+
+    @classmethod
+    def attach(cls, name):
+        arena = cls._attached.get(name)
+        if arena is None:
+            arena = cls._attached[name] = cls(name=name)
+        return arena
+
+    def allocate(self, nbytes):
+        """Offset de uma fatia nova para uma tabela de `nbytes` de dados"""
+        offset = self.used
+        self.used += self.table_size(nbytes)
+        if self.used > self.shm.size:
+            raise MemoryError(f"arena {self.name} cheia ({self.shm.size} bytes)")
+        return offset
+
+    def release(self):
+        """Uma tabela a menos usando o bloco - na última, fecha (e remove, se dono)"""
+        self.refs -= 1
+        if self.refs > 0:
+            return
+        if self._attached.get(self.name) is self:
+            del self._attached[self.name]
+        try:
+            self.shm.close()
+            if self.owner:
+                self.shm.unlink()
+        except Exception:
+            pass
+
+
+class SharedTable:
+    """Base: bloco de shared memory com cabeçalho seqlock + região de dados
+
+    Com `arena` (SharedArena) a tabela é uma fatia do bloco compartilhado em
+    `offset` (None = aloca uma fatia nova) em vez de um bloco próprio.
+    """
+
+    def __init__(self, size, nbytes, name=None, lock=None, arena=None, offset=None):
+        self.size = size
+        self.nbytes = nbytes
+        self.arena = arena
+        if arena is not None:
+            self.shm = None
+            self.owner = offset is None
+            self.offset = arena.allocate(nbytes) if offset is None else offset
+            arena.refs += 1
+            buf = arena.shm.buf
+        else:
+            if name is None:
+                self.shm = shared_memory.SharedMemory(create=True, size=HEADER_SIZE + max(1, nbytes))
+                self.owner = True
+            else:
+                self.shm = shared_memory.SharedMemory(name=name)
+                self.owner = False
+            self.offset = 0
+            buf = self.shm.buf
+        self.lock = lock if lock is not None else mp.Lock()
+        base = self.offset
+        self._seq = buf[base:base + HEADER_SIZE].cast('Q')
+        self._data = buf[base + HEADER_SIZE:base + HEADER_SIZE + nbytes]
+        if self.owner:
+            self._seq[0] = 0
+            self._data[:] = bytes(nbytes)
+
+    def __reduce__(self):
+        if self.arena is not None:
+            return (self.__class__._attach_slice, (self.size, self.arena.name, self.offset, self.lock))
+        return (self.__class__._attach, (self.size, self.shm.name, self.lock))
+
+    @classmethod
+    def _attach(cls, size, name, lock):
+        return cls(size, None, name, lock)
+
+    @classmethod
+    def _attach_slice(cls, size, name, offset, lock):
+        return cls(size, None, lock=lock, arena=SharedArena.attach(name), offset=offset)
+
+    def __len__(self):
+        return self.size
+
+    @property
+    def version(self):
+        """Contador de versão (par = estável)"""
+        return self._seq[0]
+
+    def begin_write(self):
+        self.lock.acquire()
+        self.open_write()
+
+    def end_write(self):
+        self.close_write()
+        self.lock.release()
+
+    def open_write(self):
+        """Marca início de escrita (contador ímpar) - chamador já segura o lock"""
+        self._seq[0] += 1
+
+    def close_write(self):
+        """Marca fim de escrita (contador par) - chamador já segura o lock"""
+        self._seq[0] += 1
+
+    def repair(self):
+        """Contador ímpar deixado por um escritor morto no meio da escrita -> par (dados como ficaram)"""
+        if self._seq[0] & 1:
+            self._seq[0] += 1
+
+    def _consistent(self, reader):
+        """Executa `reader` sob o protocolo seqlock (repete se houve escrita concorrente)
+
+        Entre tentativas cede a CPU ao escritor (sleep(0) e depois pausas
+        crescentes). Depois de SEQLOCK_TIMEOUT segundos com o contador ímpar
+        (escritor que morreu no meio da escrita) levanta TimeoutError em vez
+        de devolver dados pela metade - no servidor a requisição responde
+        SLAVE DEVICE FAILURE (04).
+        """
+        deadline = None
+        delay = 0.0
+        while True:
+            before = self._seq[0]
+            if not before & 1:
+                result = reader()
+                if self._seq[0] == before:
+                    return result
+            now = time.monotonic()
+            if deadline is None:
+                deadline = now + SEQLOCK_TIMEOUT
+            elif now > deadline:
+                log.error("Tabela em shared memory sem leitura consistente em %.1f s (versão %d%s) - leitura recusada",
+                          SEQLOCK_TIMEOUT, before, ", escrita inacabada" if before & 1 else "")
+                raise TimeoutError(f"tabela em shared memory sem leitura consistente (versão {before})")
+            time.sleep(delay)
+            delay = min(max(delay * 2, SEQLOCK_BACKOFF), SEQLOCK_MAX_BACKOFF)
+
+    def read_pieces(self, pieces, count):
+        """Lê trechos (rel, pos, n) de SegmentLayout.pieces() numa única leitura consistente"""
+        def reader():
+            result = [0] * count
+            for rel, pos, n in pieces:
+                result[rel:rel + n] = self.load(pos, n)
+            return result
+        return self._consistent(reader)
+
+    def write_pieces(self, pieces, values):
+        """Grava trechos (rel, pos, n) de `values` numa única seção de escrita"""
+        self.begin_write()
+        try:
+            for rel, pos, n in pieces:
+                self.store(pos, values[rel:rel + n])
+        finally:
+            self.end_write()
+
+    @property
+    def region(self):
+        """(memoryview do bloco inteiro, offset do cabeçalho) - tabelas do mesmo bloco gravadas juntas (numpy)"""
+        shm = self.arena.shm if self.arena is not None else self.shm
+        return shm.buf, self.offset
+
+    def _views(self):
+        return [self._seq, self._data]
+
+    def close(self):
+        """Libera o mapeamento (e remove o bloco se for o dono)"""
+        for view in self._views():
+            try:
+                view.release()
+            except Exception:
+                pass
+        if self.arena is not None:
+            arena, self.arena = self.arena, None
+            arena.release()
+            return
+        try:
+            self.shm.close()
+            if self.owner:
+                self.shm.unlink()
+        except Exception:
+            pass
+
+
+class SharedRegisterTable(SharedTable):
+    """Registradores (IR/HR) como int32 em shared memory
+
+    Comporta-se como sequência indexável por posição do buffer compacto
+    (SegmentLayout), então pode ser usado como `values` de SegmentedDataBlock.
+    """
+
+    ITEMSIZE = 4
+
+    def __init__(self, size, values=None, name=None, lock=None, arena=None, offset=None):
+        super().__init__(size, self.data_bytes(size), name, lock, arena, offset)
+        self._regs = self._data.cast('i')
+        if self.owner and values:
+            self._regs[:len(values)] = array('i', values)
+
+    @classmethod
+    def data_bytes(cls, size):
+        return size * cls.ITEMSIZE
+
+    def _views(self):
+        return [self._regs] + super()._views()
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return self._consistent(lambda: self._regs[key].tolist())
+        return self._regs[key]
+
+    def load(self, pos, count):
+        """Lê faixa sem seqlock - use read_pieces() para leitura consistente"""
+        return self._regs[pos:pos + count].tolist()
+
+    def store(self, pos, values):
+        """Grava faixa sem lock - chamador deve estar entre begin_write()/end_write()"""
+        self._regs[pos:pos + len(values)] = array('i', values)
+
+    def __setitem__(self, key, value):
+        self.begin_write()
+        try:
+            if isinstance(key, slice):
+                self._regs[key] = array('i', value)
+            else:
+                self._regs[key] = value
+        finally:
+            self.end_write()
+
+
+class SharedBitTable(SharedTable):
+    """Bitset compactado (1 bit por coil/DI) em shared memory
+
+    Comporta-se como sequência indexável por posição do buffer compacto
+    (SegmentLayout), então pode ser usado como `values` de SegmentedDataBlock.
+    Leituras e escritas de faixas convertem o trecho de bytes inteiro de uma vez.
+    """
+
+    def __init__(self, size, values=None, name=None, lock=None, arena=None, offset=None):
+        super().__init__(size, self.data_bytes(size), name, lock, arena, offset)
+        if self.owner and values:
+            self._write_bits(0, list(values))
+
+    @staticmethod
+    def data_bytes(size):
+        return (size + 7) // 8
+
+    @staticmethod
+    def unpack(data, pos, count):
+        """Desempacota `count` bits de `data` a partir da posição `pos`"""
+        if count <= 0:
+            return []
+        first = pos >> 3
+        last = (pos + count + 7) >> 3
+        word = int.from_bytes(data[first:last], 'little') >> (pos & 7)
+        bits = format(word & ((1 << count) - 1), f'0{count}b')
+        return list(bits[::-1].encode().translate(_ASCII_TO_BIT))
+
+    def read_bits(self, pos, count):
+        """Desempacota `count` bits a partir da posição `pos`"""
+        return self._consistent(lambda: self.unpack(self._data, pos, count))
+
+    def load(self, pos, count):
+        """Lê faixa sem seqlock - use read_pieces() para leitura consistente"""
+        return self.unpack(self._data, pos, count)
+
+    def store(self, pos, values):
+        """Grava faixa sem lock - chamador deve estar entre begin_write()/end_write()"""
+        self._write_bits(pos, values)
+
+    def _write_bits(self, pos, values):
+        count = len(values)
+        if count <= 0:
+            return
+        first = pos >> 3
+        last = (pos + count + 7) >> 3
+        shift = pos & 7
+        new = int(bytes(values).translate(_BIT_TO_ASCII)[::-1], 2) << shift
+        mask = ((1 << count) - 1) << shift
+        word = int.from_bytes(self._data[first:last], 'little')
+        word = (word & ~mask) | new
+        self._data[first:last] = word.to_bytes(last - first, 'little')
+
+    def write_bits(self, pos, values):
+        """Empacota e grava `values` (0/1 ou bool) a partir da posição `pos`"""
+        self.begin_write()
+        try:
+            self._write_bits(pos, values)
+        finally:
+            self.end_write()
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            start, stop, _ = key.indices(self.size)
+            return self.read_bits(start, stop - start)
+        return self.read_bits(key, 1)[0]
+
+    def __setitem__(self, key, value):
+        if isinstance(key, slice):
+            start, _, _ = key.indices(self.size)
+            self.write_bits(start, list(value))
+        else:
+            self.write_bits(key, [1 if value else 0])
+
+
+class ChangeTracker:
+    """Bitmap de posições alteradas por tabela + número de sequência global de mudanças
+
+    Marcado pelo processo servidor dentro da seção de escrita das tabelas (mesmo lock);
+    a GUI compara `sequence` com o último valor visto e só chama collect() quando mudou.
+
+    Com um socket de notificação (socketpair) o servidor acorda a GUI com 1 byte;
+    a flag `pending` coalesce rajadas de escritas numa única notificação até a
+    GUI chamar acknowledge().
+    """
+
+    def __init__(self, sizes, name=None, lock=None):
+        self.sizes = dict(sizes)
+        self.offsets = {}
+        nbytes = 0
+        for table, size in self.sizes.items():
+            self.offsets[table] = nbytes
+            nbytes += (size + 7) // 8
+        if name is None:
+            self.shm = shared_memory.SharedMemory(create=True, size=TRACKER_HEADER_SIZE + max(1, nbytes))
+            self.owner = True
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+            self.owner = False
+        self.lock = lock if lock is not None else mp.Lock()
+        self.notify_socket = None
+        self._header = self.shm.buf[:TRACKER_HEADER_SIZE].cast('Q')
+        self._bitmap = self.shm.buf[TRACKER_HEADER_SIZE:TRACKER_HEADER_SIZE + nbytes]
+        if self.owner:
+            self._header[:] = array('Q', [0, 0, 0])
+            self._bitmap[:] = bytes(nbytes)
+
+    def __reduce__(self):
+        return (ChangeTracker, (self.sizes, self.shm.name, self.lock))
+
+    @property
+    def sequence(self):
+        """Número de sequência global - muda a cada escrita vinda do Modbus"""
+        return self._header[_SEQ]
+
+    @property
+    def notified_at(self):
+        """perf_counter_ns() da última notificação enviada pelo servidor"""
+        return self._header[_NOTIFIED_AT]
+
+    def notify(self):
+        """Acorda a GUI (1 byte no socket) se não houver notificação pendente"""
+        if self.notify_socket is None or self._header[_PENDING]:
+            return
+        self._header[_PENDING] = 1
+        self._header[_NOTIFIED_AT] = time.perf_counter_ns()
+        try:
+            self.notify_socket.send(b'\x01')
+        except OSError:
+            pass
+
+    def acknowledge(self):
+        """Chamado pela GUI antes de collect(): libera a próxima notificação"""
+        self._header[_PENDING] = 0
+
+    def mark(self, table, pieces):
+        """Marca trechos (rel, pos, n) de SegmentLayout.pieces() - chamador segura o lock"""
+        base = self.offsets[table] * 8
+        for _, pos, count in pieces:
+            start = base + pos
+            first = start >> 3
+            last = (start + count + 7) >> 3
+            word = int.from_bytes(self._bitmap[first:last], 'little')
+            word |= ((1 << count) - 1) << (start & 7)
+            self._bitmap[first:last] = word.to_bytes(last - first, 'little')
+        self._header[_SEQ] += 1
+
+    @staticmethod
+    def mask(positions):
+        """Máscara (int) de posições de uma tabela, pré-calculada para mark_mask()"""
+        mask = 0
+        for pos in positions:
+            mask |= 1 << pos
+        return mask
+
+    def mark_mask(self, table, mask):
+        """Marca de uma vez as posições de uma máscara de mask() - chamador segura o lock"""
+        first = self.offsets[table]
+        last = first + (self.sizes[table] + 7) // 8
+        word = int.from_bytes(self._bitmap[first:last], 'little') | mask
+        self._bitmap[first:last] = word.to_bytes(last - first, 'little')
+        self._header[_SEQ] += 1
+
+    def collect(self):
+        """Retorna {tabela: [posições]} marcadas desde a última coleta e limpa o bitmap"""
+        changes = {}
+        with self.lock:
+            for table, size in self.sizes.items():
+                first = self.offsets[table]
+                last = first + (size + 7) // 8
+                chunk = bytes(self._bitmap[first:last])
+                if chunk.count(0) != len(chunk):
+                    self._bitmap[first:last] = bytes(last - first)
+                changes[table] = chunk
+        result = {}
+        for table, chunk in changes.items():
+            positions = []
+            dirty = int.from_bytes(chunk, 'little')
+            while dirty:
+                low = dirty & -dirty
+                positions.append(low.bit_length() - 1)
+                dirty ^= low
+            result[table] = positions
+        return result
+
+    def close(self):
+        """Libera o mapeamento (e remove o bloco se for o dono)"""
+        for view in (self._header, self._bitmap):
+            try:
+                view.release()
+            except Exception:
+                pass
+        try:
+            self.shm.close()
+            if self.owner:
+                self.shm.unlink()
+        except Exception:
+            pass
@@ -0,0 +1,667 @@
+"""Geradores de sinal - IRs e DIs variando no tempo, calculados no processo servidor
+
+Um registrador ganha gerador pela coluna Sinal do CSV ou pelo arquivo
+<mapa>.sinais.json ao lado dele ({"Objeto" ou "IREG:base0": sinal}, que
+prevalece sobre a coluna; sinal vazio desliga). O sinal é o texto
+`tipo(parâmetros)` ou um objeto {"tipo": ..., parâmetro: valor}:
+
+    sine(mean=0, amp=1, period=10, phase=0)     senoide (phase em graus)
+    ramp(start=0, stop=100, period=10)          dente de serra
+    random_walk(start, step=1, min, max)        passeio aleatório (step = desvio em 1 s, start = ValorInicial)
+    step(before=0, after=1, at=1)               degrau em `at` segundos
+    square(low=0, high=1, period=2, duty=0.5)   onda quadrada
+    noise(mean=0, std=1)                        ruído gaussiano
+    derived(Tensao * Corrente / 1000)           expressão sobre outros registradores e t
+
+Parâmetros sem nome seguem a ordem acima; tempos em segundos desde o início
+do servidor. Valores em unidade de engenharia: Resolucao/Offset e
+Tipo_de_Dados são aplicados na codificação (inteiros saturam no tipo) e DI
+vale 1 com sinal >= 0.5. Uma expressão derived usa o Objeto (quando é um
+identificador) ou IR12, HR3, DI0, CO5 (base0) de qualquer tabela, `t` e as
+funções de FUNCTIONS.
+
+compile_signals() roda no carregamento do mapa, sem numpy, e gera um
+SignalPlan picklável. No processo servidor o SignalEngine avalia cada tipo de
+gerador para todos os registradores e dispositivos clonados numa chamada
+numpy e grava cada tabela com uma escrita em bloco por tick.
+"""
+import ast
+import asyncio
+import json
+import math
+import os
+import re
+
+try:
+    import numpy as np
+except ImportError:  # Só o SignalEngine (processo servidor) precisa; o mapa compila sem
+    np = None
+
+from shared_tables import HEADER_SIZE
+
+# Tipo -> parâmetros (nome, default) na ordem posicional
+GENERATORS = {
+    'sine': (('mean', 0.0), ('amp', 1.0), ('period', 10.0), ('phase', 0.0)),
+    'ramp': (('start', 0.0), ('stop', 100.0), ('period', 10.0)),
+    'random_walk': (('start', None), ('step', 1.0), ('min', -math.inf), ('max', math.inf)),
+    'step': (('before', 0.0), ('after', 1.0), ('at', 1.0)),
+    'square': (('low', 0.0), ('high', 1.0), ('period', 2.0), ('duty', 0.5)),
+    'noise': (('mean', 0.0), ('std', 1.0)),
+    'derived': (('expr', None),),
+}
+# Funções aceitas nas expressões derived (nome -> atributo do numpy)
+FUNCTIONS = {
+    'abs': 'abs', 'min': 'minimum', 'max': 'maximum', 'clip': 'clip', 'where': 'where',
+    'sqrt': 'sqrt', 'exp': 'exp', 'log': 'log', 'sin': 'sin', 'cos': 'cos',
+    'floor': 'floor', 'round': 'round', 'pi': 'pi',
+}
+# Tipo no CSV -> tabela; só as tabelas de entrada têm gerador (HR/coils o mestre escreve)
+TABLES = {'COIL': 'coils', 'DISC': 'di', 'IREG': 'ir', 'HREG': 'hr'}
+DRIVEN = ('ir', 'di')
+PREFIXES = {'coils': 'CO', 'di': 'DI', 'ir': 'IR', 'hr': 'HR'}
+SIDECAR_SUFFIX = '.sinais.json'
+MIN_RATE, MAX_RATE = 1.0, 1000.0
+# Valores gravados por seção de escrita: o lock de escrita (Modbus, GUI,
+# recarga) fica livre entre um trecho de dispositivos e o próximo
+WRITE_CHUNK = 8192
+# Fração do período que um tick pode ocupar do event loop; acima disso a
+# cadência é reduzida (o resto do tempo fica para as requisições Modbus)
+TICK_BUDGET = 0.5
+OVERRUN_LOG_INTERVAL = 5.0
+
+# Formato struct do RegisterCodec -> tipo numpy (a ordem vem de word_order)
+NUMPY_FORMATS = {'h': 'i2', 'H': 'u2', 'i': 'i4', 'I': 'u4', 'f': 'f4', 'd': 'f8'}
+
+_CALL_RE = re.compile(r'^\s*(\w+)\s*\((.*)\)\s*$', re.S)
+
+
+def _number(value):
+    if isinstance(value, (int, float)):
+        return float(value)
+    text = str(value).strip().lower()
+    if text in ('inf', '+inf', '-inf'):
+        return float(text)
+    return float(text.replace(',', '.'))
+
+
+def parse_signal(spec):
+    """'sine(amp=5, period=60)' ou {"tipo": "sine", ...} -> (tipo, {parâmetro: valor}) com os defaults"""
+    positional = []
+    if isinstance(spec, dict):
+        given = dict(spec)
+        kind = str(given.pop('tipo', given.pop('kind', ''))).strip().lower()
+        expr = given.pop('expr', '')
+    else:
+        match = _CALL_RE.match(str(spec))
+        if not match:
+            raise ValueError(f"sinal inválido: {spec!r} (esperado tipo(parâmetros))")
+        kind, expr = match.group(1).lower(), match.group(2).strip()
+        given = {}
+        if kind != 'derived':
+            for item in filter(None, (part.strip() for part in expr.split(','))):
+                key, sep, value = item.partition('=')
+                if sep:
+                    given[key.strip()] = value
+                elif given:
+                    raise ValueError(f"parâmetro sem nome depois de nomeado: {item!r}")
+                else:
+                    positional.append(item)
+    if kind not in GENERATORS:
+        raise ValueError(f"gerador desconhecido: {kind!r} ({', '.join(GENERATORS)})")
+    if kind == 'derived':
+        if not str(expr).strip():
+            raise ValueError("derived sem expressão")
+        return kind, {'expr': str(expr).strip()}
+
+    params = dict(GENERATORS[kind])
+    names = [name for name, _ in GENERATORS[kind]]
+    if len(positional) > len(names):
+        raise ValueError(f"{kind} aceita no máximo {len(names)} parâmetros ({', '.join(names)})")
+    given.update(zip(names, positional))
+    for key, value in given.items():
+        if key not in params:
+            raise ValueError(f"parâmetro desconhecido para {kind}: {key!r} ({', '.join(names)})")
+        try:
+            params[key] = _number(value)
+        except ValueError:
+            raise ValueError(f"{key}={value!r} não é número") from None
+    if params.get('period', 1.0) <= 0:
+        raise ValueError("period deve ser > 0")
+    return kind, params
+
+
+def load_sidecar(csv_path):
+    """Sinais do arquivo <mapa>.sinais.json ao lado do CSV ({} se não existir)"""
+    path = os.path.splitext(csv_path)[0] + SIDECAR_SUFFIX
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r', encoding='utf-8') as f:
+        try:
+            data = json.load(f)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"{os.path.basename(path)}: {e}") from None
+    if not isinstance(data, dict):
+        raise ValueError(f"{os.path.basename(path)}: esperado objeto {{registrador: sinal}}")
+    return data
+
+
+def signal_specs(maps, sidecar=None):
+    """{(tabela, base0): sinal} da coluna Sinal e do arquivo lateral (chave Objeto ou TIPO:base0)"""
+    specs = {}
+    names = {}
+    for table, reg_map in maps.items():
+        for addr, reg in reg_map.items():
+            names.setdefault(reg['nome'], (table, addr))
+            if reg.get('sinal'):
+                specs[(table, addr)] = reg['sinal']
+    for key, spec in (sidecar or {}).items():
+        kind, sep, base0 = str(key).partition(':')
+        if sep and kind.strip().upper() in TABLES and base0.strip().isdigit():
+            target = (TABLES[kind.strip().upper()], int(base0))
+            if target[1] not in maps[target[0]]:
+                raise ValueError(f"sinal para {key}: endereço fora do mapa")
+        elif key in names:
+            target = names[key]
+        else:
+            raise ValueError(f"sinal para {key!r}: registrador não existe no mapa")
+        if spec in (None, ''):
+            specs.pop(target, None)
+        else:
+            specs[target] = spec
+    return specs
+
+
+class Signal:
+    """Registrador gravado (kind) ou só lido por expressões derived (kind None) pelo SignalEngine
+
+    `codec` é (tipo, formato struct, words, word_order, byte_order) do
+    RegisterCodec - None para bits - e `positions` as posições das suas words
+    (ou do bit) no buffer compacto da tabela. Sem numpy e sem struct: passa
+    pelo pickle junto com os DeviceTables.
+    """
+
+    def __init__(self, table, addr, name, kind, params, codec, scale, offset, positions):
+        self.table = table
+        self.addr = addr
+        self.name = name
+        self.kind = kind
+        self.params = params
+        self.codec = codec
+        self.scale = scale
+        self.offset = offset
+        self.positions = positions
+
+    @property
+    def key(self):
+        return (self.table, self.addr)
+
+
+class SignalPlan:
+    """Geradores de um mapa: `signals` (derived por último, em ordem de dependência) e `inputs` lidos das tabelas"""
+
+    def __init__(self, signals, inputs):
+        self.signals = signals
+        self.inputs = inputs
+
+    def __len__(self):
+        return len(self.signals)
+
+
+def _references(expr, names):
+    """[(nome, (tabela, base0))] dos registradores usados numa expressão derived"""
+    try:
+        tree = ast.parse(expr, mode='eval')
+    except SyntaxError as e:
+        raise ValueError(f"expressão inválida: {e.msg}") from None
+    refs = {}
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Attribute):
+            raise ValueError("atributos não são permitidos na expressão")
+        if isinstance(node, ast.Name) and node.id != 't' and node.id not in FUNCTIONS:
+            if node.id not in names:
+                raise ValueError(f"nome desconhecido na expressão: {node.id}")
+            refs[node.id] = names[node.id]
+    return sorted(refs.items())
+
+
+def compile_signals(device, specs):
+    """SignalPlan dos `specs` ({(tabela, base0): sinal}) sobre um DeviceMap - None sem geradores
+
+    Erros (tipo/parâmetro/expressão inválidos, dependência circular) viram
+    ValueError com o registrador, para o carregamento do mapa falhar com a
+    mensagem em vez de o servidor ignorar o sinal.
+    """
+    if not specs:
+        return None
+    maps = {'coils': device.coils_map, 'di': device.di_map, 'ir': device.ir_map, 'hr': device.hr_map}
+    types = {'ir': device.ir_types, 'hr': device.hr_types}
+    names = {}
+    for table, reg_map in maps.items():
+        for addr, reg in reg_map.items():
+            if reg['nome'].isidentifier() and reg['nome'] != 't' and reg['nome'] not in FUNCTIONS:
+                names.setdefault(reg['nome'], (table, addr))
+    for table, reg_map in maps.items():
+        names.update({f"{PREFIXES[table]}{addr}": (table, addr) for addr in reg_map})
+
+    def describe(table, addr, kind=None, params=None):
+        reg = maps[table][addr]
+        layout = device.tables[table].layout
+        if table in ('coils', 'di'):
+            return Signal(table, addr, reg['nome'], kind, params, None, 1.0, 0.0, [layout.index(addr + 1)])
+        codec = types[table].codecs[addr]
+        if codec.is_string:
+            raise ValueError(f"{codec.kind} não aceita sinal numérico")
+        i = types[table].slot[addr]
+        return Signal(table, addr, reg['nome'], kind, params,
+                      (codec.kind, codec.fmt, codec.count, codec.word_order, codec.byte_order),
+                      types[table].scale[i], types[table].offset[i],
+                      [layout.index(addr + 1 + k) for k in range(codec.count)])
+
+    signals = {}
+    for (table, addr), spec in sorted(specs.items()):
+        reg = maps[table][addr]
+        try:
+            if table not in DRIVEN:
+                raise ValueError("só IREG e DISC têm gerador (HREG/COIL são escritos pelo mestre)")
+            kind, params = parse_signal(spec)
+            if kind == 'derived':
+                params['refs'] = _references(params['expr'], names)
+            signal = describe(table, addr, kind, params)
+            if kind == 'random_walk' and params['start'] is None:
+                initial = reg['valor_inicial'] if table == 'di' else types[table].initial_value(addr, reg)
+                params['start'] = initial * signal.scale + signal.offset
+        except ValueError as e:
+            raise ValueError(f"Sinal de {reg['nome']} ({table.upper()} {addr}): {e}") from None
+        signals[(table, addr)] = signal
+
+    # derived depois das fontes e das derived de que dependem (DFS; ciclo é erro)
+    ordered = [signal for signal in signals.values() if signal.kind != 'derived']
+    state = {}
+
+    def visit(signal, path):
+        if state.get(signal.key) == 'done':
+            return
+        if state.get(signal.key) == 'visiting':
+            raise ValueError(f"Sinais derived em ciclo: {' -> '.join(path + [signal.name])}")
+        state[signal.key] = 'visiting'
+        for _, key in signal.params['refs']:
+            dependency = signals.get(key)
+            if dependency is not None and dependency.kind == 'derived':
+                visit(dependency, path + [signal.name])
+        state[signal.key] = 'done'
+        ordered.append(signal)
+
+    for signal in signals.values():
+        if signal.kind == 'derived':
+            visit(signal, [])
+
+    inputs = {}
+    for signal in ordered:
+        if signal.kind == 'derived':
+            for _, key in signal.params['refs']:
+                if key not in signals and key not in inputs:
+                    inputs[key] = describe(*key)
+    return SignalPlan(ordered, list(inputs.values()))
+
+
+class _Codec:
+    """Codificação vetorizada de um Tipo_de_Dados: valores de engenharia (dispositivos x n) <-> words
+
+    Espelha o RegisterCodec: o tipo numpy na ordem das words e a view em
+    uint16 na ordem dos bytes de cada word.
+    """
+
+    def __init__(self, codec):
+        kind, fmt, self.count, word_order, byte_order = codec
+        endian = '>' if word_order == 'big' else '<'
+        self.dtype = np.dtype(endian + NUMPY_FORMATS[fmt])
+        self.words = np.dtype(('<' if word_order != byte_order else '>') + 'u2')
+        self.wrap = kind == 'word'
+        if self.wrap:
+            # word aceita de -32768 a 65535, como no mapa
+            self.bounds = (-32768, 65535)
+        elif self.dtype.kind in 'iu':
+            info = np.iinfo(self.dtype)
+            self.bounds = (info.min, info.max)
+        else:
+            self.bounds = None
+
+    def encode(self, values, scale, offset):
+        raw = values - offset  # Cópia nova: o resto é feito no lugar (sem temporários por tick)
+        raw /= scale
+        if self.bounds is not None:
+            np.rint(raw, out=raw)
+            np.clip(raw, *self.bounds, out=raw)
+            raw[np.isnan(raw)] = 0
+            if self.wrap:
+                raw = raw.astype(np.int64) & 0xFFFF
+        return raw.astype(self.dtype).view(self.words)
+
+    def decode(self, words, scale, offset):
+        raw = np.ascontiguousarray(words, dtype=self.words).view(self.dtype)
+        return raw.astype(float) * scale + offset
+
+
+class _Block:
+    """Uma tabela de vários dispositivos dentro do mesmo bloco de shared memory
+
+    Com as tabelas numa SharedArena (start() do servidor) os dispositivos caem
+    todos num bloco só: o seqlock das tabelas e os valores de um trecho de
+    dispositivos são gravados com um índice numpy cada, em vez de um laço
+    por dispositivo. `rows` são as linhas (dispositivos) do grupo que estão
+    neste bloco.
+    """
+
+    def __init__(self, buf, rows, offsets, bits):
+        self.buf = buf
+        self.rows = np.array(rows)
+        self.bits = bits
+        offsets = np.array(offsets)
+        self.seq = np.frombuffer(buf, np.uint64, count=len(buf) // 8)
+        self.seq_index = offsets // 8
+        if bits:
+            self.data = np.frombuffer(buf, np.uint8)
+            self.base = (offsets + HEADER_SIZE) * 8
+        else:
+            self.data = np.frombuffer(buf, np.int32, count=len(buf) // 4)
+            self.base = (offsets + HEADER_SIZE) // 4
+
+    def index(self, positions):
+        """Posições do buffer compacto -> índices absolutos (linhas x posições) de words ou bits no bloco"""
+        return self.base[:, None] + np.asarray(positions, dtype=np.int64)[None, :]
+
+    def read(self, index):
+        if self.bits:
+            return (self.data[index >> 3] >> (index & 7).astype(np.uint8)) & 1
+        return self.data[index]
+
+    def chunks(self, width):
+        """Fatias de `rows` com até WRITE_CHUNK valores (de `width` por dispositivo) cada"""
+        step = max(1, WRITE_CHUNK // max(1, width))
+        return [slice(start, start + step) for start in range(0, len(self.rows), step)]
+
+    def open_write(self, part):
+        self.seq[self.seq_index[part]] += 1  # ímpar: leitores (GUI) repetem a cópia
+
+    def close_write(self, part):
+        self.seq[self.seq_index[part]] += 1
+
+
+class _BitWriter:
+    """Grava bits espalhados num bloco de uma vez: bytes afetados limpos pela máscara e somados (OR) por reduceat"""
+
+    def __init__(self, block, index):
+        flat = index.ravel()
+        self.order = np.argsort(flat >> 3, kind='stable')
+        data_bytes = (flat >> 3)[self.order]
+        self.bytes, self.starts = np.unique(data_bytes, return_index=True)
+        self.masks = (np.uint8(1) << (flat & 7).astype(np.uint8))[self.order]
+        self.clear = ~np.bitwise_or.reduceat(self.masks, self.starts)
+        self.block = block
+
+    def write(self, bits):
+        ones = np.add.reduceat(bits.ravel()[self.order] * self.masks, self.starts, dtype=np.uint8)
+        data = self.block.data
+        data[self.bytes] = (data[self.bytes] & self.clear) | ones
+
+
+class _SignalGroup:
+    """Um SignalPlan aplicado a N dispositivos (clones do mesmo mapa): matriz dispositivos x sinais"""
+
+    def __init__(self, plan, devices, rng):
+        self.devices = devices
+        self.rng = rng
+        signals = plan.signals
+        self.values = np.zeros((len(devices), len(signals)))
+        self.column = {signal.key: i for i, signal in enumerate(signals)}
+        self.functions = {name: getattr(np, attr) for name, attr in FUNCTIONS.items()}
+        blocks = {}
+
+        def table_blocks(table):
+            if table not in blocks:
+                grouped = {}
+                for row, device in enumerate(devices):
+                    buf, offset = device.arrays[table].region
+                    entry = grouped.setdefault(id(buf), (buf, [], []))
+                    entry[1].append(row)
+                    entry[2].append(offset)
+                blocks[table] = [_Block(buf, rows, offsets, table in ('coils', 'di'))
+                                 for buf, rows, offsets in grouped.values()]
+            return blocks[table]
+
+        # Fontes: índices e parâmetros em arrays por tipo de gerador
+        self.sources = []
+        for kind, defaults in GENERATORS.items():
+            idx = [i for i, signal in enumerate(signals) if signal.kind == kind]
+            if not idx or kind == 'derived':
+                continue
+            params = {name: np.array([signals[i].params[name] for i in idx], dtype=float) for name, _ in defaults}
+            state = np.tile(params['start'], (len(devices), 1)) if kind == 'random_walk' else None
+            self.sources.append((kind, np.array(idx), params, state))
+        self.derived = [(i, compile(signal.params['expr'], signal.name, 'eval'), signal.params['refs'], signal.name)
+                        for i, signal in enumerate(signals) if signal.kind == 'derived']
+        self.failed = set()
+
+        # Registradores lidos pelas expressões: uma leitura em bloco por tabela
+        self.reads = []
+        self.inputs = {}
+        by_table = {}
+        for signal in plan.inputs:
+            by_table.setdefault(signal.table, []).append(signal)
+        for table, members in by_table.items():
+            positions = [pos for signal in members for pos in signal.positions]
+            self.reads.append((table, len(positions), [(block, block.index(positions)) for block in table_blocks(table)]))
+            start = 0
+            for signal in members:
+                part = slice(start, start + len(signal.positions))
+                self.inputs[signal.key] = (table, part, signal, _Codec(signal.codec) if signal.codec else None)
+                start = part.stop
+
+        # Saídas por tabela: colunas + posições de todos os registradores (agrupados por codec)
+        self.outputs = []
+        for table in DRIVEN:
+            members = [(i, signal) for i, signal in enumerate(signals) if signal.table == table]
+            if not members:
+                continue
+            if table == 'di':
+                positions = [signal.positions[0] for _, signal in members]
+                parts = [(np.array([i for i, _ in members]), None, None, None)]
+                writers = [(block, part, _BitWriter(block, block.index(positions)[part]))
+                           for block in table_blocks(table) for part in block.chunks(len(positions))]
+            else:
+                codecs = {}
+                for i, signal in members:
+                    codecs.setdefault(signal.codec, []).append((i, signal))
+                parts = []
+                positions = []
+                for codec, entries in codecs.items():
+                    parts.append((np.array([i for i, _ in entries]), _Codec(codec),
+                                  np.array([signal.scale for _, signal in entries]),
+                                  np.array([signal.offset for _, signal in entries])))
+                    positions.extend(pos for _, signal in entries for pos in signal.positions)
+                writers = [(block, part, block.index(positions)[part])
+                           for block in table_blocks(table) for part in block.chunks(len(positions))]
+            self.outputs.append((table, positions, parts, writers))
+
+        # Só o principal tem ChangeTracker: máscara das posições geradas, marcada por tick
+        primary = next((device for device in devices if device.tracker is not None), None)
+        self.tracker = primary.tracker if primary is not None else None
+        self.masks = {}
+        if self.tracker is not None:
+            self.masks = {table: self.tracker.mask(positions) for table, positions, _, _ in self.outputs}
+
+    def _generate(self, kind, params, state, t, dt):
+        p = params
+        if kind == 'sine':
+            return p['mean'] + p['amp'] * np.sin(2 * np.pi * t / p['period'] + np.radians(p['phase']))
+        if kind == 'ramp':
+            return p['start'] + (p['stop'] - p['start']) * np.mod(t / p['period'], 1.0)
+        if kind == 'step':
+            return np.where(t >= p['at'], p['after'], p['before'])
+        if kind == 'square':
+            return np.where(np.mod(t / p['period'], 1.0) < p['duty'], p['high'], p['low'])
+        if kind == 'noise':
+            return self.rng.normal(p['mean'], np.abs(p['std']), (self.values.shape[0], len(p['mean'])))
+        # random_walk: desvio proporcional a sqrt(dt) - mesma dispersão em qualquer taxa
+        state += self.rng.standard_normal(state.shape) * (p['step'] * math.sqrt(max(dt, 0.0)))
+        np.clip(state, p['min'], p['max'], out=state)
+        return state
+
+    def _read_inputs(self, lock):
+        """{(tabela, base0): valores por dispositivo} dos registradores só lidos (lock por bloco)"""
+        words = {}
+        for table, count, blocks in self.reads:
+            data = np.empty((len(self.devices), count), dtype=np.int64)
+            for block, index in blocks:
+                with lock:
+                    data[block.rows] = block.read(index)
+            words[table] = data
+        values = {}
+        for key, (table, part, signal, codec) in self.inputs.items():
+            data = words[table][:, part]
+            values[key] = data[:, 0].astype(float) if codec is None else codec.decode(data, signal.scale, signal.offset)[:, 0]
+        return values
+
+    def tick(self, t, dt, lock):
+        """Calcula um tick sem lock e grava cada trecho de dispositivos numa seção de escrita própria"""
+        values = self.values
+        for kind, idx, params, state in self.sources:
+            values[:, idx] = self._generate(kind, params, state, t, dt)
+        if self.derived:
+            inputs = self._read_inputs(lock)
+            for i, code, refs, name in self.derived:
+                scope = dict(self.functions, t=t)
+                for ref, key in refs:
+                    column = self.column.get(key)
+                    scope[ref] = values[:, column] if column is not None else inputs[key]
+                try:
+                    values[:, i] = eval(code, {'__builtins__': {}}, scope)
+                except Exception as e:
+                    # Mantém o último valor; avisa uma vez por sinal
+                    if name not in self.failed:
+                        self.failed.add(name)
+                        print(f"[PROCESSO] ⚠️ Sinal derived de {name}: {e}")
+
+        for table, _, parts, writers in self.outputs:
+            if table == 'di':
+                data = (values[:, parts[0][0]] >= 0.5).astype(np.uint8)
+            else:
+                encoded = [codec.encode(values[:, columns], scale, offset) for columns, codec, scale, offset in parts]
+                data = encoded[0] if len(encoded) == 1 else np.concatenate(encoded, axis=1)
+            for block, part, writer in writers:
+                rows = data[block.rows[part]]
+                with lock:
+                    block.open_write(part)
+                    try:
+                        if table == 'di':
+                            writer.write(rows)
+                        else:
+                            block.data[writer] = rows
+                    finally:
+                        block.close_write(part)
+            if self.tracker is not None:
+                with lock:
+                    self.tracker.mark_mask(table, self.masks[table])
+        return self.tracker
+
+
+class SignalEngine:
+    """Aplica os SignalPlan dos dispositivos às tabelas compartilhadas `rate` vezes por segundo
+
+    Dispositivos com o mesmo plano (clones do mesmo mapa, mesmo objeto depois
+    do pickle) formam um grupo: cada gerador é avaliado sobre a matriz
+    dispositivos x registradores numa chamada numpy, fora do lock de escrita,
+    e cada tabela é gravada em trechos de até WRITE_CHUNK valores, cada um
+    numa aquisição curta do lock (escritas Modbus, da GUI e recargas entram
+    entre os trechos). O dispositivo principal marca as posições geradas no
+    ChangeTracker para a GUI repintar.
+
+    Tick que ocupa mais que TICK_BUDGET do período reduz a cadência
+    (`effective_rate`) em vez de emendar um tick no outro; a cadência volta
+    aos poucos para `rate` quando os ticks ficam curtos de novo.
+    """
+
+    def __init__(self, devices, write_lock, rate=10.0):
+        if np is None:
+            raise RuntimeError("numpy não instalado (pip install numpy) - sinais desligados")
+        self.write_lock = write_lock
+        self.rate = min(max(float(rate), MIN_RATE), MAX_RATE)
+        self.rng = np.random.default_rng()
+        self.groups = []
+        self.effective_rate = self.rate
+        self.started = None
+        self.ticks = 0
+        self.overruns = 0
+        self.task = None
+        self.bind(devices)
+
+    @property
+    def count(self):
+        return sum(len(group.devices) * group.values.shape[1] for group in self.groups)
+
+    def bind(self, devices):
+        """Passa para os DeviceTables atuais (recarga do mapa) - antes de as tabelas antigas serem fechadas"""
+        plans = {}
+        for device in devices:
+            plan = getattr(device, 'signals', None)
+            if plan is not None:
+                plans.setdefault(id(plan), (plan, []))[1].append(device)
+        self.groups = [_SignalGroup(plan, members, self.rng) for plan, members in plans.values()]
+
+    def close(self):
+        """Para os ticks e solta as views numpy dos blocos (antes de as tabelas serem fechadas)"""
+        if self.task is not None:
+            self.task.cancel()
+        self.groups = []
+
+    def tick(self, t, dt):
+        trackers = []
+        with np.errstate(all='ignore'):
+            for group in self.groups:
+                tracker = group.tick(t, dt, self.write_lock)
+                if tracker is not None:
+                    trackers.append(tracker)
+        for tracker in trackers:
+            tracker.notify()
+        self.ticks += 1
+
+    def _pace(self, period, busy):
+        """Período do próximo tick dado o tempo `busy` do último (reduz/recupera a cadência)"""
+        nominal = 1.0 / self.rate
+        needed = busy / TICK_BUDGET
+        if needed > period:
+            self.overruns += 1
+            return min(needed * 1.25, 1.0 / MIN_RATE)
+        if period > nominal and needed < period / 2:
+            return max(nominal, period * 0.8)
+        return period
+
+    async def run(self):
+        """Ticks em cadência fixa no event loop do servidor (atrasos não acumulam ticks)"""
+        loop = asyncio.get_running_loop()
+        period = 1.0 / self.rate
+        if self.started is None:
+            self.started = loop.time()
+        last = deadline = loop.time()
+        logged_at = None
+        while True:
+            now = loop.time()
+            self.tick(now - self.started, now - last)
+            last = now
+            busy = loop.time() - now
+            paced = self._pace(period, busy)
+            if paced != period:
+                self.effective_rate = 1.0 / paced
+                if paced > period and (logged_at is None or now - logged_at >= OVERRUN_LOG_INTERVAL):
+                    logged_at = now
+                    print(f"[PROCESSO] ⚠️ Sinais: tick de {busy * 1000:.1f} ms não cabe em "
+                          f"{self.rate:g} Hz - cadência reduzida para {self.effective_rate:.0f} Hz")
+                elif paced == 1.0 / self.rate and logged_at is not None:
+                    logged_at = None
+                    print(f"[PROCESSO] Sinais: cadência de volta a {self.rate:g} Hz")
+                period = paced
+            deadline += period
+            if deadline < loop.time():
+                # Atrasado: recomeça a contar deste tick em vez de emendar os perdidos
+                deadline = now + period
+            await asyncio.sleep(max(0.0, deadline - loop.time()))
@@ -0,0 +1,128 @@
+"""Par serial virtual (pty) para testar/medir o servidor RTU sem hardware - apenas Linux/Unix"""
+import os
+import select
+import sys
+import threading
+import time
+
+# Nome de porta que o servidor troca por um PtyLoopback
+PTY_PORT = "PTY (loopback)"
+
+
+def char_time(baudrate, bytesize=8, parity='N', stopbits=1):
+    """Tempo de fio de um caractere: start + dados + paridade + stop bits"""
+    bits = 1 + bytesize + (0 if parity == 'N' else 1) + stopbits
+    return bits / baudrate
+
+
+class PtyLoopback:
+    """Dois pseudo-terminais ligados por um relé, como um cabo null-modem
+
+    O servidor abre `server_port` e o mestre/benchmark abre `client_port`.
+    Com `baudrate` o relé segura cada bloco pelo tempo que levaria no fio
+    (por sentido, full duplex), para medir vazão e latência reproduzíveis.
+    Sem `baudrate` os bytes passam na velocidade do kernel.
+    """
+
+    def __init__(self, baudrate=None, bytesize=8, parity='N', stopbits=1):
+        if not hasattr(os, 'openpty'):
+            raise RuntimeError("Loopback pty disponível apenas em Linux/Unix")
+        import tty
+
+        self.char_time = char_time(baudrate, bytesize, parity, stopbits) if baudrate else 0.0
+        self.baudrate = baudrate
+        self.stats = {'to_server': 0, 'to_client': 0}
+        self._closed = False
+
+        # Os lados escravos ficam abertos aqui também: o relé nunca recebe EIO
+        # quando servidor ou mestre fecham/reabrem a porta
+        self._server_master, self._server_slave = os.openpty()
+        self._client_master, self._client_slave = os.openpty()
+        for fd in (self._server_slave, self._client_slave):
+            tty.setraw(fd)
+        self.server_port = os.ttyname(self._server_slave)
+        self.client_port = os.ttyname(self._client_slave)
+        # close() escreve aqui para acordar os relés no select, sem esperar timeout
+        self._wake_r, self._wake_w = os.pipe()
+
+        self._threads = [
+            threading.Thread(target=self._pump, args=(self._client_master, self._server_master, 'to_server'),
+                             name="pty-to-server", daemon=True),
+            threading.Thread(target=self._pump, args=(self._server_master, self._client_master, 'to_client'),
+                             name="pty-to-client", daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def set_timing(self, baudrate=None, bytesize=8, parity='N', stopbits=1):
+        """Troca o ritmo do relé sem recriar os ptys (nomes das portas continuam)"""
+        self.char_time = char_time(baudrate, bytesize, parity, stopbits) if baudrate else 0.0
+        self.baudrate = baudrate
+
+    def _pump(self, src, dst, direction):
+        """Copia src -> dst respeitando o tempo de fio (se houver baudrate)"""
+        next_free = 0.0
+        while not self._closed:
+            try:
+                ready, _, _ = select.select([src, self._wake_r], [], [])
+                if self._closed:
+                    return
+                if src not in ready:
+                    continue
+                data = os.read(src, 4096)
+            except (OSError, ValueError):
+                if self._closed:
+                    return
+                time.sleep(0.05)
+                continue
+            if not data:
+                continue
+
+            if self.char_time:
+                # Fila de fio por sentido: o bloco chega ao fim do seu último caractere
+                now = time.perf_counter()
+                next_free = max(now, next_free) + len(data) * self.char_time
+                delay = next_free - now
+                if delay > 0:
+                    time.sleep(delay)
+            try:
+                os.write(dst, data)
+                self.stats[direction] += len(data)
+            except OSError:
+                if self._closed:
+                    return
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        os.write(self._wake_w, b'\0')
+        for thread in self._threads:
+            thread.join(timeout=1)
+        for fd in (self._server_master, self._server_slave, self._client_master, self._client_slave,
+                   self._wake_r, self._wake_w):
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+if __name__ == "__main__":
+    # Uso: python virtual_serial.py [baudrate] - mantém o par aberto até Ctrl+C
+    baud = int(sys.argv[1]) if len(sys.argv) > 1 else None
+    with PtyLoopback(baud) as loop:
+        print(f"🔌 Servidor: {loop.server_port}")
+        print(f"🔌 Mestre:   {loop.client_port}")
+        print(f"⏱️ Ritmo: {f'{baud} bps' if baud else 'sem limite'} - Ctrl+C para sair")
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            pass
+        print(f"📊 {loop.stats['to_server']} B → servidor | {loop.stats['to_client']} B → mestre")
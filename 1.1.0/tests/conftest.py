@@ -0,0 +1,5 @@
+"""Configuração do pytest - módulos do emulador ficam em src/ (imports planos, como no main.py)"""
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
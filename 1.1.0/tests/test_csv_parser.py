@@ -0,0 +1,55 @@
+"""Testes do parser do CSV do mapa de memória"""
+import pytest
+
+from csv_parser import MemoryMapParser, parse_bounds
+
+HEADER = 'Tipo,RegBase0,RegBase1,Objeto,Unidade,Resolucao,Permissao,FCs,Intervalo,ValorInicial,Descricao,Sinal\n'
+
+
+def parse(tmp_path, text):
+    path = tmp_path / 'mapa.csv'
+    path.write_text(text, encoding='utf-8')
+    return MemoryMapParser(str(path)).parse()
+
+
+def test_parse_tables(tmp_path):
+    coils, di, ir, hr = parse(tmp_path, HEADER + (
+        'COIL,0,1,Liga,none,1,R/W,1/5,,ON,,\n'
+        'DISC,3,4,Porta,none,1,R,2,,OFF,,\n'
+        'IREG,10,11,Tensao,V,0.1,R,4,0-300,2200,,\n'
+        'HREG,5,6,Setpoint,V,1,R/W,3/6,,12.5,,\n'
+        ',,,,,,,,,,,\n'
+    ))
+    assert coils[0]['valor_inicial'] == 1
+    assert di[3]['valor_inicial'] == 0
+    assert ir[10]['minimo'] == 0 and ir[10]['maximo'] == 300
+    assert hr[5]['valor_inicial'] == 12.5
+    assert hr[5]['fcs'] == '3/6'
+
+
+def test_semicolon_delimiter(tmp_path):
+    _, _, ir, _ = parse(tmp_path, HEADER.replace(',', ';') + 'IREG;0;1;V;V;1;R;4;;0;;sine(mean=220, amp=5)\n')
+    assert ir[0]['sinal'] == 'sine(mean=220, amp=5)'
+
+
+def test_quoted_signal_with_commas(tmp_path):
+    _, _, ir, _ = parse(tmp_path, HEADER + 'IREG,0,1,V,V,1,R,4,,0,,"sine(mean=220, amp=5)"\n')
+    assert ir[0]['sinal'] == 'sine(mean=220, amp=5)'
+
+
+def test_unquoted_signal_with_commas_is_rejected(tmp_path):
+    with pytest.raises(ValueError, match='linha 3'):
+        parse(tmp_path, HEADER + 'IREG,1,2,X,V,1,R,4,,0,,\nIREG,0,1,V,V,1,R,4,,0,,sine(mean=220, amp=5)\n')
+
+
+def test_unbalanced_signal_is_rejected(tmp_path):
+    text = 'Tipo,RegBase0,RegBase1,Objeto,Sinal,Descricao\nIREG,0,1,V,sine(mean=220, amp=5)\n'
+    with pytest.raises(ValueError, match='linha 2'):
+        parse(tmp_path, text)
+
+
+def test_parse_bounds():
+    assert parse_bounds('-40-85') == (-40, 85)
+    assert parse_bounds('1.5 a 3') == (1.5, 3)
+    assert parse_bounds('', '0', '') == (0, None)
+    assert parse_bounds('livre') == (None, None)
@@ -0,0 +1,111 @@
+"""Testes dos codecs de Tipo_de_Dados (RegisterCodec, BlockCodec, TypedTable)"""
+import struct
+
+import pytest
+
+from data_types import BlockCodec, TypedTable, codec_for, parse_resolution, register_codec
+
+
+@pytest.mark.parametrize('word_order, byte_order, words', [
+    ('big', 'big', [0x4148, 0xF5C3]),       # ABCD
+    ('little', 'little', [0xC3F5, 0x4841]),  # DCBA
+    ('little', 'big', [0xF5C3, 0x4148]),     # CDAB
+    ('big', 'little', [0x4841, 0xC3F5]),     # BADC
+])
+def test_float32_word_and_byte_order(word_order, byte_order, words):
+    codec = codec_for('float32', word_order, byte_order)
+    assert codec.encode(12.56) == words
+    assert codec.decode(words) == pytest.approx(12.56, rel=1e-6)
+
+
+@pytest.mark.parametrize('tipo, value, words', [
+    ('int16', -2, [0xFFFE]),
+    ('uint16', 65535, [0xFFFF]),
+    ('int32', -70000, [0xFFFE, 0xEE90]),
+    ('uint32', 0x12345678, [0x1234, 0x5678]),
+    ('float64', 1.0, [0x3FF0, 0, 0, 0]),
+])
+def test_numeric_codecs_round_trip(tipo, value, words):
+    codec = codec_for(tipo)
+    assert codec.encode(value) == words
+    assert codec.decode(words) == value
+
+
+def test_aliases_and_cache():
+    assert codec_for('REAL').kind == 'float32'
+    assert codec_for('dint').kind == 'int32'
+    assert codec_for(' Float ') is codec_for('float')
+
+
+def test_unknown_type_raises():
+    with pytest.raises(ValueError):
+        codec_for('complex128')
+
+
+def test_out_of_range_value_raises():
+    with pytest.raises(struct.error):
+        codec_for('int16').encode(40000)
+
+
+def test_word_accepts_signed_and_unsigned():
+    codec = codec_for('word')
+    assert codec.encode(-1) == [0xFFFF]
+    assert codec.encode(65535) == [0xFFFF]
+
+
+def test_string_codec():
+    codec = codec_for('STRING[5]')
+    assert codec.count == 3
+    assert codec.encode('ABC') == [0x4142, 0x4300, 0]
+    assert codec.decode([0x4142, 0x4300, 0]) == 'ABC'
+
+
+def test_engineering_conversion():
+    codec = codec_for('int16')
+    assert codec.from_engineering('12,34', 0.01) == 1234
+    assert codec.to_engineering(1234, 0.01, 1.0) == pytest.approx(13.34)
+    assert codec_for('float32').from_engineering('1.5', 0.5) == 3.0
+
+
+def test_parse_resolution():
+    assert parse_resolution('0.01') == (0.01, 2)
+    assert parse_resolution('10') == (10.0, 0)
+    assert parse_resolution('0,5') == (0.5, 1)
+    assert parse_resolution('') == (1.0, 0)
+    assert parse_resolution('0') == (1.0, 0)
+
+
+def test_register_codec_defaults_to_word_or_int16():
+    assert register_codec({'tipo_dados': ''}).kind == 'word'
+    assert register_codec({'tipo_dados': '', 'minimo': -40}).kind == 'int16'
+    assert register_codec({'tipo_dados': 'uint32'}).kind == 'uint32'
+
+
+def test_block_codec_matches_register_codecs():
+    entries = {1: codec_for('int16'), 3: codec_for('float32'), 7: codec_for('string4')}
+    block = BlockCodec(entries)
+    assert block.count == 8
+    encoded = block.encode({1: -3, 3: 2.5, 7: 'OK'})
+    assert sorted(encoded) == [1, 3, 4, 7, 8]
+    assert [encoded[3], encoded[4]] == codec_for('float32').encode(2.5)
+    words = [encoded.get(addr, 0) for addr in range(1, 9)]
+    assert block.decode(words) == {1: -3, 3: 2.5, 7: 'OK'}
+
+
+def test_block_codec_rejects_overlap():
+    with pytest.raises(ValueError):
+        BlockCodec({1: codec_for('int32'), 2: codec_for('int16')})
+
+
+def test_typed_table():
+    reg_map = {
+        0: {'tipo_dados': 'float32', 'resolucao': '1', 'valor_inicial': 1.5},
+        2: {'tipo_dados': 'int16', 'resolucao': '0.1', 'offset': '-10', 'valor_inicial': 250},
+    }
+    table = TypedTable(reg_map)
+    assert table.owner(1) == 0
+    assert table.owner(2) == 2
+    assert table.expand({0: 'R', 2: 'R/W'}) == {1: 'R', 2: 'R', 3: 'R/W'}
+    assert table.initial_words(reg_map) == {1: 0x3FC0, 2: 0, 3: 250}
+    assert table.format(2, 250) == '15.0'
+    assert table.encode_text(2, '15,0') == [250]
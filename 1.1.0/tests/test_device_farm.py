@@ -0,0 +1,27 @@
+"""Testes da especificação de slave IDs da fazenda de dispositivos"""
+import pytest
+
+from device_farm import parse_slave_ids
+
+
+@pytest.mark.parametrize('spec, expected', [
+    ('1-3,7', [1, 2, 3, 7]),
+    (' 5 ', [5]),
+    (5, [5]),
+    ([1, 2, '20-22'], [1, 2, 20, 21, 22]),
+    ('3,1-3,', [1, 2, 3]),
+    ('240-247', list(range(240, 248))),
+])
+def test_parse_slave_ids(spec, expected):
+    assert parse_slave_ids(spec) == expected
+
+
+@pytest.mark.parametrize('spec', ['0', '1-248', '300', [0, 1]])
+def test_parse_slave_ids_out_of_range(spec):
+    with pytest.raises(ValueError, match='1..247'):
+        parse_slave_ids(spec)
+
+
+def test_parse_slave_ids_invalid_text():
+    with pytest.raises(ValueError):
+        parse_slave_ids('a-b')
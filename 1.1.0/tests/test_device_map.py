@@ -0,0 +1,19 @@
+"""Testes da compilação do mapa de memória (DeviceMap)"""
+import logging
+
+from device_map import DeviceMap
+
+HEADER = 'Tipo,RegBase0,RegBase1,Objeto,Unidade,Resolucao,Permissao,FCs,Intervalo,ValorInicial,Descricao,Tipo_de_Dados\n'
+
+
+def test_bounds_only_for_single_word_registers(tmp_path, caplog):
+    path = tmp_path / 'mapa.csv'
+    path.write_text(HEADER + (
+        'HREG,0,1,Setpoint,V,1,R/W,,0-100,10,,int16\n'
+        'HREG,1,2,Livre,V,1,R/W,,,20,,int16\n'
+        'HREG,2,3,Energia,kWh,1,R/W,,0-1000,5,,uint32\n'
+    ), encoding='utf-8')
+    with caplog.at_level(logging.WARNING, logger='device_map'):
+        device = DeviceMap.from_csv(str(path))
+    assert device.hr_bounds == {1: (0, 100)}
+    assert 'RegBase0 2' in caplog.text
@@ -0,0 +1,57 @@
+"""Testes dos histogramas de latência por estágio - servidor real no loopback pty (RTU)"""
+import sys
+import time
+
+import pytest
+from pymodbus.client import ModbusSerialClient
+
+from modbus_server_multiprocess import ModbusServerMultiprocess
+from segmented_store import SegmentedTable
+from virtual_serial import PTY_PORT
+
+pytestmark = pytest.mark.skipif(sys.platform == 'win32', reason="loopback pty só no POSIX")
+
+
+@pytest.fixture
+def rtu_server():
+    server = ModbusServerMultiprocess()
+    server.create_datastore(SegmentedTable.from_values({1: 1}), SegmentedTable.from_values({}),
+                            SegmentedTable.from_values({1: 11}),
+                            SegmentedTable.from_values({addr: addr for addr in range(1, 11)}),
+                            hr_perm={1: 'R'})
+    ok, message = server.start(PTY_PORT, 115200, 8, 'N', 1, 1, pty_pacing=False, turnaround_mode='asap')
+    assert ok, message
+    ok, message = server.wait_ready()
+    assert ok, message
+    client = ModbusSerialClient(port=server.client_port(), baudrate=115200, timeout=1)
+    client.connect()
+    yield server, client
+    client.close()
+    server.stop()
+
+
+def wait_for(fetch, timeout=3.0):
+    """Espera o flush periódico do LatencyRecorder (0.25 s) publicar as amostras"""
+    deadline = time.monotonic() + timeout
+    while True:
+        result = fetch()
+        if result or time.monotonic() > deadline:
+            return result
+        time.sleep(0.05)
+
+
+def test_rtu_requests_are_timed(rtu_server):
+    server, client = rtu_server
+    for _ in range(5):
+        assert not client.read_holding_registers(0, 10, slave=1).isError()
+    assert client.write_register(0, 5, slave=1).isError()  # somente leitura: exceção 02
+
+    rows = wait_for(lambda: server.latency_summary(merge_fcs=True))
+    counts = {row['stage']: row['count'] for row in rows}
+    assert counts['decode'] == 6
+    assert counts['check'] == 6
+    assert counts['write'] == 6
+    assert counts['total'] == 6
+    assert counts['datastore'] == 5  # a escrita recusada não chega ao datastore
+    totals = {row['fc']: row['count'] for row in server.latency_summary() if row['stage'] == 'total'}
+    assert totals == {'FC03': 5, 'FC06': 1}
@@ -0,0 +1,72 @@
+"""Testes da recarga de mapa: diff_maps() e migration_plan()"""
+from device_map import DeviceMap
+from map_reload import diff_maps, migration_plan
+from segmented_store import SegmentLayout
+
+HEADER = 'Tipo,RegBase0,RegBase1,Objeto,Unidade,Resolucao,Permissao,FCs,Intervalo,ValorInicial,Descricao,Tipo_de_Dados\n'
+
+
+def load_map(tmp_path, name, rows):
+    path = tmp_path / name
+    path.write_text(HEADER + ''.join(row + '\n' for row in rows), encoding='utf-8')
+    return DeviceMap.from_csv(str(path))
+
+
+OLD = [
+    'COIL,0,1,Liga,none,1,R/W,,,OFF,,',
+    'HREG,0,1,Setpoint,V,1,R/W,,,10,,int16',
+    'HREG,1,2,Limite,V,1,R/W,,,20,,int16',
+    'HREG,2,3,Energia,kWh,1,R,,,5,,uint32',
+    'IREG,0,1,Tensao,V,1,R,,,220,,',
+]
+
+
+def test_identical_maps_have_no_diff(tmp_path):
+    diff = diff_maps(load_map(tmp_path, 'a.csv', OLD), load_map(tmp_path, 'b.csv', OLD))
+    assert not any(diff.values())
+
+
+def test_diff_maps_classifies_changes(tmp_path):
+    new = [
+        'COIL,0,1,Liga,none,1,R/W,,,OFF,,',
+        'COIL,1,2,Alarme,none,1,R,,,ON,,',
+        'HREG,0,1,Setpoint,V,1,R,,,10,,int16',    # só permissão: mantém o valor
+        'HREG,1,2,Limite,V,1,R/W,,,30,,int16',    # ValorInicial: volta ao inicial
+        'HREG,2,3,Energia,kWh,1,R,,,5,,uint16',   # 2 words -> 1 word
+        'IREG,0,1,Tensao,V,1,R,,,220,,',
+    ]
+    diff = diff_maps(load_map(tmp_path, 'a.csv', OLD), load_map(tmp_path, 'b.csv', new))
+    assert diff['coils'].added == [1]
+    assert diff['coils'].addresses_changed
+    assert diff['coils'].words == [2]
+    assert diff['hr'].added == [] and diff['hr'].removed == []
+    assert diff['hr'].changed == [0, 1, 2]
+    assert diff['hr'].reset == [1, 2]
+    # Words de datastore (base0 + 1), incluindo a segunda word do uint32 antigo
+    assert diff['hr'].words == [2, 3, 4]
+    assert not diff['hr'].addresses_changed
+    assert not diff['ir']
+    assert not diff['di']
+
+
+def test_diff_maps_removed_register(tmp_path):
+    diff = diff_maps(load_map(tmp_path, 'a.csv', OLD), load_map(tmp_path, 'b.csv', OLD[:3] + OLD[4:]))
+    assert diff['hr'].removed == [2]
+    assert diff['hr'].words == [3, 4]
+
+
+def test_migration_plan_same_layout_copies_everything():
+    layout = SegmentLayout([(1, 10), (50, 5)])
+    assert migration_plan(layout, layout) == [(0, 0, 10), (10, 10, 5)]
+
+
+def test_migration_plan_between_layouts():
+    old = SegmentLayout([(1, 10), (50, 5)])
+    new = SegmentLayout([(5, 10), (48, 4)])
+    # Novo [5,15) pega antigo [5,11) ; novo [48,52) pega antigo [50,52)
+    assert migration_plan(old, new) == [(0, 4, 6), (12, 10, 2)]
+
+
+def test_migration_plan_skips_reset_addresses():
+    layout = SegmentLayout([(1, 10)])
+    assert migration_plan(layout, layout, skip=[1, 4, 5, 99]) == [(1, 1, 2), (5, 5, 5)]
@@ -0,0 +1,76 @@
+"""Testes do endpoint /metrics - servidor real no loopback pty (RTU)"""
+import re
+import socket
+import sys
+import time
+import urllib.request
+
+import pytest
+from pymodbus.client import ModbusSerialClient
+
+from modbus_server_multiprocess import ModbusServerMultiprocess
+from segmented_store import SegmentedTable
+from virtual_serial import PTY_PORT
+
+pytestmark = pytest.mark.skipif(sys.platform == 'win32', reason="loopback pty só no POSIX")
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture
+def rtu_metrics():
+    port = free_port()
+    server = ModbusServerMultiprocess()
+    server.create_datastore(SegmentedTable.from_values({1: 1}), SegmentedTable.from_values({}),
+                            SegmentedTable.from_values({1: 11}),
+                            SegmentedTable.from_values({addr: addr for addr in range(1, 11)}),
+                            hr_perm={1: 'R'})
+    ok, message = server.start(PTY_PORT, 115200, 8, 'N', 1, 1, pty_pacing=False, turnaround_mode='asap',
+                               metrics_address=('127.0.0.1', port))
+    assert ok, message
+    ok, message = server.wait_ready()
+    assert ok, message
+    client = ModbusSerialClient(port=server.client_port(), baudrate=115200, timeout=1)
+    client.connect()
+
+    def scrape():
+        with urllib.request.urlopen(f'http://127.0.0.1:{port}/metrics', timeout=2) as response:
+            return response.read().decode()
+
+    yield client, scrape
+    client.close()
+    server.stop()
+
+
+def samples(body, name):
+    """{labels: valor} das linhas da métrica `name`"""
+    pattern = re.compile(rf'^{name}\{{(.*)\}} (\S+)$', re.M)
+    return {labels: float(value) for labels, value in pattern.findall(body)}
+
+
+def test_rtu_latency_series_are_exported(rtu_metrics):
+    client, scrape = rtu_metrics
+    for _ in range(4):
+        assert not client.read_holding_registers(0, 10, slave=1).isError()
+    assert client.write_register(0, 5, slave=1).isError()
+
+    # O LatencyRecorder descarrega a cada 0.25 s
+    deadline = time.monotonic() + 3.0
+    body = scrape()
+    while not samples(body, 'modbus_emu_request_latency_seconds_count') and time.monotonic() < deadline:
+        time.sleep(0.05)
+        body = scrape()
+
+    assert samples(body, 'modbus_emu_request_latency_seconds_count') == {'fc="3"': 4, 'fc="6"': 1}
+    stages = samples(body, 'modbus_emu_stage_latency_seconds_count')
+    assert stages['stage="decode"'] == 5
+    assert stages['stage="write"'] == 5
+    assert stages['stage="total"'] == 5
+    quantiles = samples(body, 'modbus_emu_stage_latency_seconds')
+    assert quantiles['stage="total",quantile="0.5"'] > 0
+    assert samples(body, 'modbus_emu_connection_requests_total') == {'server="RTU"': 5}
+    assert samples(body, 'modbus_emu_exceptions_total')['fc="6"'] == 1
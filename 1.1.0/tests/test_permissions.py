@@ -0,0 +1,142 @@
+"""Testes da validação de requisições: FCs (01), permissões/endereço (02) e limites (03)"""
+import pytest
+from pymodbus.bit_write_message import WriteMultipleCoilsRequest, WriteSingleCoilRequest
+from pymodbus.pdu import ModbusExceptions
+from pymodbus.register_read_message import ReadHoldingRegistersRequest, ReadInputRegistersRequest
+from pymodbus.register_write_message import WriteMultipleRegistersRequest, WriteSingleRegisterRequest
+
+from permissions import (BoundsTable, DeviceRules, FunctionCodeTable, PermissionTable, parse_fcs,
+                         request_span)
+from segmented_store import SegmentLayout
+
+# Endereços de datastore (base0 + 1): HR 1..10 graváveis, 11..12 somente leitura, lacuna em 13..19
+HR = SegmentLayout([(1, 12), (20, 4)])
+
+
+@pytest.fixture
+def rules():
+    layouts = {
+        'coils': SegmentLayout([(1, 8)]),
+        'di': SegmentLayout([(1, 1)]),
+        'ir': SegmentLayout([(1, 4)]),
+        'hr': HR,
+    }
+    perms = {
+        'coils': {addr: 'R/W' if addr <= 4 else 'R' for addr in range(1, 9)},
+        'hr': {addr: 'R/W' if addr <= 10 or addr >= 20 else 'R' for addr in list(range(1, 13)) + list(range(20, 24))},
+    }
+    fcs = {
+        'coils': {addr: '1/5/15' for addr in range(1, 9)},
+        'di': {1: ''},
+        'ir': {addr: '' for addr in range(1, 5)},
+        'hr': {addr: '3/6/16' if addr < 20 else '3' for addr in list(range(1, 13)) + list(range(20, 24))},
+    }
+    bounds = {addr: (0, 100) for addr in range(1, 11)}
+    bounds[20] = (-10, 10)
+    return DeviceRules.compile(layouts, perms, fcs, bounds)
+
+
+def test_parse_fcs():
+    assert parse_fcs('3/6/16') == {3, 6, 16}
+    assert parse_fcs('1, 5;15 x') == {1, 5, 15}
+    assert parse_fcs('') == set()
+    assert parse_fcs(None) == set()
+
+
+def test_request_span_is_datastore_address():
+    assert request_span(ReadHoldingRegistersRequest(0, 10, slave=1)) == (1, 10)
+    assert request_span(WriteMultipleRegistersRequest(4, [1, 2, 3], slave=1)) == (5, 3)
+    assert request_span(WriteSingleRegisterRequest(7, 1, slave=1)) == (8, 1)
+
+
+def test_allowed_requests_pass(rules):
+    assert rules.check(ReadHoldingRegistersRequest(0, 23, slave=1)) is None
+    assert rules.check(WriteMultipleRegistersRequest(0, [50] * 10, slave=1)) is None
+    assert rules.check(WriteSingleCoilRequest(0, True, slave=1)) is None
+    assert rules.check(ReadInputRegistersRequest(0, 4, slave=1)) is None
+
+
+def test_function_code_not_in_map_is_illegal_function(rules):
+    # FC16 só é aceito nos HR 1..12; 20..23 só aceitam FC03
+    assert rules.check(WriteMultipleRegistersRequest(19, [1], slave=1)) == ModbusExceptions.IllegalFunction
+    assert rules.check(WriteSingleRegisterRequest(21, 1, slave=1)) == ModbusExceptions.IllegalFunction
+
+
+def test_device_supports_declared_and_natural_fcs_only(rules):
+    # FCs vazia vale os FCs naturais da tabela (DI -> 02, IR -> 04)
+    assert rules.allowed_fcs.supported == {1, 2, 3, 4, 5, 6, 15, 16}
+    layouts = {name: SegmentLayout([(1, 4)]) for name in ('coils', 'di', 'ir', 'hr')}
+    table = FunctionCodeTable(layouts, {'coils': {1: '1'}, 'hr': {1: '3'}})
+    assert table.check(WriteSingleCoilRequest(0, True, slave=1)) == ModbusExceptions.IllegalFunction
+    assert table.check(ReadInputRegistersRequest(0, 1, slave=1)) == ModbusExceptions.IllegalFunction
+    assert table.check(ReadHoldingRegistersRequest(0, 4, slave=1)) is None
+
+
+def test_function_code_table_without_fcs_column_accepts_everything():
+    table = FunctionCodeTable({name: SegmentLayout([(1, 4)]) for name in ('coils', 'di', 'ir', 'hr')}, {})
+    assert table.supported is None
+    assert table.check(WriteSingleRegisterRequest(0, 1, slave=1)) is None
+
+
+def test_read_only_register_is_illegal_address(rules):
+    assert rules.check(WriteSingleRegisterRequest(10, 1, slave=1)) == ModbusExceptions.IllegalAddress
+    assert rules.check(WriteMultipleRegistersRequest(8, [1, 1, 1], slave=1)) == ModbusExceptions.IllegalAddress
+    assert rules.check(WriteMultipleCoilsRequest(2, [True] * 3, slave=1)) == ModbusExceptions.IllegalAddress
+
+
+def test_unmapped_write_is_illegal_address_when_strict():
+    table = PermissionTable(HR, {addr: 'R/W' for addr in range(1, 24)})
+    assert table.check_write(1, 10) is None
+    assert table.check_write(12, 3) == ModbusExceptions.IllegalAddress
+    assert table.check_write(50, 1) == ModbusExceptions.IllegalAddress
+
+
+def test_unmapped_write_is_accepted_when_not_strict():
+    table = PermissionTable(HR, {addr: 'R/W' if addr <= 10 else 'R' for addr in range(1, 24)}, strict=False)
+    assert table.check_write(50, 1) is None
+    assert table.check_write(13, 7) is None
+    # Registrador do mapa sem W continua recusado
+    assert table.check_write(11, 1) == ModbusExceptions.IllegalAddress
+
+
+def test_empty_permission_uses_table_default():
+    layout = SegmentLayout([(1, 2)])
+    assert PermissionTable(layout, {1: '', 2: 'R'}, default='R/W').check_write(1, 1) is None
+    assert PermissionTable(layout, {1: '', 2: 'R'}, default='R/W').check_write(2, 1) == ModbusExceptions.IllegalAddress
+
+
+def test_value_out_of_bounds_is_illegal_value(rules):
+    assert rules.check(WriteSingleRegisterRequest(0, 101, slave=1)) == ModbusExceptions.IllegalValue
+    assert rules.check(WriteMultipleRegistersRequest(0, [0] * 9 + [101], slave=1)) == ModbusExceptions.IllegalValue
+    assert rules.check(WriteSingleRegisterRequest(0, 100, slave=1)) is None
+
+
+def test_bounds_with_negative_minimum_read_value_as_int16():
+    table = BoundsTable(HR, {20: (-10, 10), 21: (1.5, 2.5)})
+    assert table.check_values(20, [0xFFF6]) is None  # -10
+    assert table.check_values(20, [0xFFF5]) == ModbusExceptions.IllegalValue  # -11
+    assert table.check_values(21, [2]) is None
+    assert table.check_values(21, [1]) == ModbusExceptions.IllegalValue
+    assert table.check_values(21, [3]) == ModbusExceptions.IllegalValue
+
+
+def test_bounds_table_without_limits_is_inactive():
+    table = BoundsTable(HR, {1: (None, None)})
+    assert not table.active
+    assert table.check_values(1, [70000]) is None
+
+
+def test_bounds_runs_and_fragmented_limits_agree():
+    layout = SegmentLayout([(1, 64)])
+    uniform = BoundsTable(layout, {addr: (-10, 10) for addr in range(1, 65)})
+    fragmented = BoundsTable(layout, {addr: (-10, 10 + addr % 2) for addr in range(1, 65)})
+    assert len(uniform.run_starts) == 1
+    assert len(fragmented.run_starts) == 64
+    values = [0, 10, 0xFFF6, 0xFFFF] * 16  # 0, 10, -10, -1
+    for table in (uniform, fragmented):
+        assert table.check_values(1, values) is None
+        assert table.check_values(1, values[:-1] + [11]) == ModbusExceptions.IllegalValue
+        assert table.check_values(1, values[:-1] + [0xFFF5]) == ModbusExceptions.IllegalValue  # -11
+        assert table.check_values(1, values[:-1] + [0x8000]) == ModbusExceptions.IllegalValue
+    # Trecho só com mínimo: valores acima de 0x7FFF são negativos
+    assert BoundsTable(layout, {1: (-5, None)}).check_values(1, [0x7FFF, 0xFFFB]) is None
@@ -0,0 +1,45 @@
+"""Testes do layout segmentado (SegmentLayout / SegmentedTable)"""
+from segmented_store import SegmentLayout, SegmentedTable
+
+
+def test_from_addresses_merges_close_ranges():
+    layout = SegmentLayout.from_addresses([10, 12, 100], guard=2)
+    assert layout.segments() == [(8, 7), (98, 5)]
+    assert layout.size == 12
+
+
+def test_from_addresses_clamps_to_address_space():
+    layout = SegmentLayout.from_addresses([1, 65536], guard=4)
+    assert layout.segments() == [(1, 5), (65532, 5)]
+
+
+def test_index_and_address_of_round_trip():
+    layout = SegmentLayout([(10, 5), (100, 3)])
+    assert layout.index(10) == 0
+    assert layout.index(14) == 4
+    assert layout.index(100) == 5
+    assert layout.index(15) == -1
+    assert layout.index(9) == -1
+    for pos in range(layout.size):
+        assert layout.index(layout.address_of(pos)) == pos
+
+
+def test_pieces_skip_gaps():
+    layout = SegmentLayout([(10, 5), (100, 3)])
+    assert layout.pieces(12, 90) == [(0, 2, 3), (88, 5, 2)]
+    assert layout.pieces(20, 10) == []
+
+
+def test_read_and_write_drop_gap_values():
+    layout = SegmentLayout([(10, 2), (14, 2)])
+    buffer = [0] * layout.size
+    layout.write(buffer, 10, [1, 2, 3, 4, 5, 6])
+    assert buffer == [1, 2, 5, 6]
+    assert layout.read(buffer, 9, 8) == [0, 1, 2, 0, 0, 5, 6, 0]
+
+
+def test_segmented_table_from_values():
+    table = SegmentedTable.from_values({5: 50, 7: 70}, guard=1)
+    assert table.layout.segments() == [(4, 5)]
+    assert table.values == [0, 50, 0, 70, 0]
+    assert len(table) == 5
@@ -0,0 +1,137 @@
+"""Testes das tabelas em shared memory: seqlock, bitset empacotado, arena e ChangeTracker"""
+import time
+
+import pytest
+
+import shared_tables
+from shared_tables import ChangeTracker, SharedArena, SharedBitTable, SharedRegisterTable
+
+
+@pytest.fixture
+def registers():
+    table = SharedRegisterTable(8, [1, 2, 3, 4, 5, 6, 7, 8])
+    yield table
+    table.close()
+
+
+@pytest.fixture
+def bits():
+    table = SharedBitTable(20, [1, 0, 1, 1, 0, 0, 0, 1, 1, 0])
+    yield table
+    table.close()
+
+
+def test_register_table_read_write(registers):
+    assert registers[:] == [1, 2, 3, 4, 5, 6, 7, 8]
+    registers[2] = -5
+    registers[4:6] = [50, 60]
+    assert registers[2] == -5
+    assert registers[:] == [1, 2, -5, 4, 50, 60, 7, 8]
+    assert registers.version == 4
+
+
+def test_read_pieces_and_write_pieces(registers):
+    registers.write_pieces([(0, 1, 2), (3, 6, 1)], [10, 20, 99, 30])
+    assert registers.read_pieces([(0, 1, 2), (2, 6, 1)], 4) == [10, 20, 30, 0]
+
+
+def test_seqlock_reader_retries_after_concurrent_write(registers):
+    calls = []
+
+    def reader():
+        calls.append(registers.load(0, 2))
+        if len(calls) == 1:
+            registers[0] = 100  # escrita no meio da leitura: versão muda
+        return calls[-1]
+
+    assert registers._consistent(reader) == [100, 2]
+    assert len(calls) == 2
+
+
+def test_seqlock_reader_backs_off_and_refuses_unfinished_write(registers, monkeypatch):
+    monkeypatch.setattr(shared_tables, 'SEQLOCK_TIMEOUT', 0.02)
+    delays = []
+    sleep = time.sleep
+    monkeypatch.setattr(time, 'sleep', lambda delay: (delays.append(delay), sleep(delay)))
+    registers.open_write()  # escritor "morto" com o contador ímpar
+    with pytest.raises(TimeoutError):
+        registers[:2]
+    assert delays[:3] == [0.0, shared_tables.SEQLOCK_BACKOFF, 2 * shared_tables.SEQLOCK_BACKOFF]
+    assert max(delays) <= shared_tables.SEQLOCK_MAX_BACKOFF
+    assert len(delays) < 50  # pausas, não espera ocupada
+
+
+def test_repair_makes_counter_even(registers):
+    registers.open_write()
+    assert registers.version & 1
+    registers.repair()
+    assert registers.version == 2
+    registers.repair()
+    assert registers.version == 2
+    assert registers[:2] == [1, 2]
+
+
+def test_bit_table_packs_eight_bits_per_byte(bits):
+    assert SharedBitTable.data_bytes(20) == 3
+    assert bytes(bits._data) == bytes([0b10001101, 0b00000001, 0])
+    assert bits[:10] == [1, 0, 1, 1, 0, 0, 0, 1, 1, 0]
+
+
+def test_bit_table_writes_across_byte_boundary(bits):
+    bits.write_bits(6, [1, 1, 1, 1, 1])
+    assert bits[:12] == [1, 0, 1, 1, 0, 0, 1, 1, 1, 1, 1, 0]
+    bits[0] = False
+    bits[19] = True
+    assert bits[0] == 0
+    assert bits[19] == 1
+    assert bits.read_bits(18, 2) == [0, 1]
+
+
+def test_unpack():
+    data = bytes([0b10100000, 0b00000001])
+    assert SharedBitTable.unpack(data, 5, 4) == [1, 0, 1, 1]
+    assert SharedBitTable.unpack(data, 0, 0) == []
+
+
+def test_arena_tables_share_one_block():
+    sizes = [SharedRegisterTable.data_bytes(5), SharedBitTable.data_bytes(9)]
+    arena = SharedArena(sum(SharedArena.table_size(n) for n in sizes))
+    regs = SharedRegisterTable(5, [1, 2, 3, 4, 5], arena=arena)
+    flags = SharedBitTable(9, [1] * 9, arena=arena)
+    try:
+        assert regs.offset == 0
+        assert flags.offset == SharedArena.table_size(sizes[0])
+        assert flags.offset % 8 == 0
+        assert regs[:] == [1, 2, 3, 4, 5]
+        assert flags[:] == [1] * 9
+        with pytest.raises(MemoryError):
+            arena.allocate(1)
+    finally:
+        regs.close()
+        assert arena.refs == 1
+        flags.close()
+    assert arena.refs == 0
+
+
+def test_change_tracker_marks_and_collects():
+    tracker = ChangeTracker({'coils': 16, 'hr': 40})
+    try:
+        with tracker.lock:
+            tracker.mark('hr', [(0, 3, 2), (2, 30, 1)])
+            tracker.mark('coils', [(0, 0, 1), (1, 15, 1)])
+        assert tracker.sequence == 2
+        assert tracker.collect() == {'coils': [0, 15], 'hr': [3, 4, 30]}
+        assert tracker.collect() == {'coils': [], 'hr': []}
+    finally:
+        tracker.close()
+
+
+def test_change_tracker_marks_signal_mask():
+    tracker = ChangeTracker({'coils': 16, 'ir': 16})
+    try:
+        with tracker.lock:
+            tracker.mark_mask('ir', ChangeTracker.mask([2, 9]))
+        assert tracker.sequence == 1
+        assert tracker.collect() == {'coils': [], 'ir': [2, 9]}
+    finally:
+        tracker.close()
@@ -0,0 +1,105 @@
+"""Testes dos geradores de sinal: parsing, compilação sobre o mapa e codificação numpy"""
+import math
+
+import pytest
+
+from data_types import codec_for
+from device_map import DeviceMap
+from signal_engine import parse_signal
+
+HEADER = 'Tipo,RegBase0,RegBase1,Objeto,Unidade,Resolucao,Permissao,FCs,Intervalo,ValorInicial,Descricao,Tipo_de_Dados,Sinal\n'
+
+
+def load_map(tmp_path, rows):
+    path = tmp_path / 'mapa.csv'
+    path.write_text(HEADER + ''.join(row + '\n' for row in rows), encoding='utf-8')
+    return DeviceMap.from_csv(str(path))
+
+
+def test_parse_signal_named_and_positional():
+    assert parse_signal('sine(mean=220, amp=5)') == ('sine', {'mean': 220.0, 'amp': 5.0, 'period': 10.0, 'phase': 0.0})
+    assert parse_signal('RAMP(0, 50)') == ('ramp', {'start': 0.0, 'stop': 50.0, 'period': 10.0})
+    kind, params = parse_signal('random_walk(step=2, max=inf)')
+    assert kind == 'random_walk'
+    assert params['start'] is None and params['max'] == math.inf
+
+
+def test_parse_signal_from_sidecar_object():
+    assert parse_signal({'tipo': 'noise', 'std': '0,5'}) == ('noise', {'mean': 0.0, 'std': 0.5})
+    assert parse_signal('derived(Tensao * 2)') == ('derived', {'expr': 'Tensao * 2'})
+
+
+@pytest.mark.parametrize('spec', [
+    'sine',
+    'pulse(1)',
+    'sine(amp=1, 2)',
+    'sine(1, 2, 3, 4, 5)',
+    'sine(freq=1)',
+    'sine(amp=x)',
+    'ramp(period=0)',
+    'derived()',
+])
+def test_parse_signal_rejects_invalid(spec):
+    with pytest.raises(ValueError):
+        parse_signal(spec)
+
+
+def test_compile_signals_orders_derived_after_sources(tmp_path):
+    device = load_map(tmp_path, [
+        'IREG,0,1,Potencia,W,1,R,,,0,,int32,derived(Tensao * Corrente)',
+        'IREG,2,3,Tensao,V,0.1,R,,,2200,,,"sine(mean=220, amp=5)"',
+        'IREG,3,4,Corrente,A,1,R,,,0,,,',
+        'DISC,0,1,Alarme,none,1,R,,,OFF,,,derived(IR2 > 225)',
+    ])
+    plan = device.signals
+    order = [signal.name for signal in plan.signals]
+    assert order.index('Tensao') < order.index('Potencia')
+    assert order.index('Tensao') < order.index('Alarme')
+    # Corrente só é lida pela expressão
+    assert [signal.name for signal in plan.inputs] == ['Corrente']
+
+
+@pytest.mark.parametrize('rows, message', [
+    (['HREG,0,1,Setpoint,V,1,R/W,,,0,,,sine()'], 'só IREG e DISC'),
+    (['IREG,0,1,Nome,none,1,R,,,,,string4,sine()'], 'não aceita sinal'),
+    (['IREG,0,1,A,V,1,R,,,0,,,derived(B)', 'IREG,1,2,B,V,1,R,,,0,,,derived(A)'], 'ciclo'),
+])
+def test_compile_signals_errors(tmp_path, rows, message):
+    with pytest.raises(ValueError, match=message):
+        load_map(tmp_path, rows)
+
+
+@pytest.mark.parametrize('tipo, word_order, byte_order', [
+    ('int16', 'big', 'big'),
+    ('uint16', 'big', 'big'),
+    ('word', 'big', 'big'),
+    ('int32', 'little', 'big'),
+    ('uint32', 'big', 'little'),
+    ('float32', 'little', 'little'),
+    ('float64', 'big', 'big'),
+])
+def test_numpy_codec_matches_register_codec(tipo, word_order, byte_order):
+    np = pytest.importorskip('numpy')
+    from signal_engine import _Codec
+
+    reference = codec_for(tipo, word_order, byte_order)
+    codec = _Codec((reference.kind, reference.fmt, reference.count, word_order, byte_order))
+    values = np.array([[-12.34, 0.0, 5.5, 1e12]])
+    words = codec.encode(values.copy(), 0.01, 0.0)
+    for i, value in enumerate(values[0]):
+        raw = value / 0.01
+        if codec.bounds is not None:
+            raw = int(min(max(round(raw), codec.bounds[0]), codec.bounds[1]))
+        expected = reference.encode(raw)
+        assert words[0, i * reference.count:(i + 1) * reference.count].tolist() == expected
+    decoded = codec.decode(words, 0.01, 0.0)
+    assert decoded[0, 2] == pytest.approx(5.5)
+
+
+def test_numpy_codec_saturates_and_zeroes_nan():
+    np = pytest.importorskip('numpy')
+    from signal_engine import _Codec
+
+    codec = _Codec(('int16', 'h', 1, 'big', 'big'))
+    words = codec.encode(np.array([[1e9, -1e9, np.nan, np.inf]]), 1.0, 0.0)
+    assert words[0].tolist() == [0x7FFF, 0x8000, 0, 0x7FFF]
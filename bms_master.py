@@ -4,10 +4,13 @@ from tkinter import ttk
 from pymodbus.client.sync import ModbusSerialClient
 from csv_parser import MemoryMapParser
 from threading import Thread
+import sys
 import time
 
 class MasterModbus:
-    def __init__(self):
+    def __init__(self, port='COM13', baudrate=19200):
+        self.port = port
+        self.baudrate = baudrate
         self.window = tk.Tk()
         self.window.title("🔍 Monitor EmuladorMODBUSRTU - Master Modbus")
         self.window.geometry("900x700")
@@ -58,7 +61,7 @@ class MasterModbus:
         conn_frame = ttk.LabelFrame(self.window, text="Conexão", padding=10)
         conn_frame.pack(fill="x", padx=10, pady=5)
         
-        ttk.Label(conn_frame, text="Porta: COM13 | Baudrate: 19200 | Slave ID: 1").pack()
+        ttk.Label(conn_frame, text=f"Porta: {self.port} | Baudrate: {self.baudrate} | Slave ID: 1").pack()
         
         self.status_label = ttk.Label(conn_frame, text="⚪ Desconectado", foreground="gray")
         self.status_label.pack()
@@ -288,8 +291,8 @@ class MasterModbus:
     def connect(self):
         self.client = ModbusSerialClient(
             method='rtu',
-            port='COM13',
-            baudrate=19200,
+            port=self.port,
+            baudrate=self.baudrate,
             bytesize=8,
             parity='N',
             stopbits=1,
@@ -495,5 +498,8 @@ class MasterModbus:
         self.window.mainloop()
 
 if __name__ == '__main__':
-    app = MasterModbus()
+    # Uso: python bms_master.py [porta] [baudrate] - ex.: a ponta "Mestre" do loopback pty
+    port = sys.argv[1] if len(sys.argv) > 1 else 'COM13'
+    baudrate = int(sys.argv[2]) if len(sys.argv) > 2 else 19200
+    app = MasterModbus(port, baudrate)
     app.run()